@@ -0,0 +1,21 @@
+# core/app_data.py
+
+import os
+
+
+def _data_dir():
+    # Per-user application data, so state and history do not depend on the working directory
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, "driveman")
+
+
+DATA_DIR = _data_dir()
+
+
+def data_path(name):
+    """Path of name in the per-user data directory, creating the directory if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
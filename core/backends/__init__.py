@@ -0,0 +1,30 @@
+# core/backends/__init__.py
+
+import sys
+import threading
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the platform backend, importing only the implementation in use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if sys.platform == 'win32':
+                    from core.backends.windows import WindowsBackend as backend_class
+                elif sys.platform.startswith('linux'):
+                    from core.backends.linux import LinuxBackend as backend_class
+                else:
+                    raise NotImplementedError(f"No drive backend for platform {sys.platform}")
+                _backend = backend_class()
+    return _backend
+
+def set_backend(backend):
+    """Override the platform backend (returns the previous one)."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
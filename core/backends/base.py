@@ -0,0 +1,70 @@
+# core/backends/base.py
+
+
+class DriveBackend:
+    """Platform-specific access to drives, volume stats, SMART and I/O counters.
+
+    Drive details are plain dicts using the keys of
+    core.drive_check.combine_drive_details; "drive_letter" holds the path the
+    volume is reachable at ('E:\\' on Windows, the mountpoint on Linux).
+    """
+
+    name = "base"
+
+    def list_drives(self):
+        """Return details for every removable or external volume."""
+        raise NotImplementedError
+
+    def probe_drive(self, drive):
+        """Return details for a single volume, or None if it is not removable/external."""
+        raise NotImplementedError
+
+    def watch_volumes(self):
+        """Return a volume watch whose changes() blocks until volumes appear or vanish.
+
+        changes() returns a list of (action, drive) tuples, action being
+        core.hotplug.DRIVE_ADDED or DRIVE_REMOVED, and None once close() has
+        been called from another thread.
+        """
+        raise NotImplementedError
+
+    def volume_stats(self, drive):
+        """Return {"total", "used", "free", "percent"} for a volume, or None if inaccessible."""
+        raise NotImplementedError
+
+    def smart_attributes(self, drive):
+        """Return the raw SMART attribute page (bytes) of the disk backing a volume, or None.
+
+        core.smart.decode_smart_page decodes it.
+        """
+        raise NotImplementedError
+
+    def disk_serial(self, drive):
+        """Return the serial number of the disk backing a volume, or None if unknown."""
+        return None
+
+    def temperature(self, drive):
+        """Return the disk temperature in Celsius, or None if unknown."""
+        return None
+
+    def fragmentation(self, drive):
+        """Return the fragmentation percentage, or None if not applicable."""
+        return None
+
+    def raw_device_path(self, drive):
+        """Return the path of the whole physical disk behind a volume (for raw reads), or None."""
+        raise NotImplementedError
+
+    def io_counters(self):
+        """Return cumulative I/O counters keyed by physical disk name.
+
+        Each value is a dict with read_count, write_count, read_bytes,
+        write_bytes, read_time and write_time (ms), plus busy_time and
+        queue_time (ms, time-weighted by queue length) and in_flight where
+        the platform reports them.
+        """
+        raise NotImplementedError
+
+    def disk_for_volume(self, drive):
+        """Return the io_counters() key of the physical disk backing a volume, or None."""
+        raise NotImplementedError
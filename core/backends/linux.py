@@ -0,0 +1,267 @@
+# core/backends/linux.py
+
+import fcntl
+import glob
+import logging
+import os
+import select
+import socket
+import threading
+import time
+
+from core.backends.base import DriveBackend
+from core.history_store import attach_usage_history
+from core.hotplug import DRIVE_ADDED, DRIVE_REMOVED
+from core.topology import build_sysfs_topology, find_mount_entry, read_mount_table
+
+# <linux/hdreg.h>: HDIO_DRIVE_CMD with WIN_SMART / SMART_READ_VALUES
+HDIO_DRIVE_CMD = 0x031f
+ATA_SMART_CMD = 0xB0
+ATA_SMART_READ_VALUES = 0xD0
+SECTOR_SIZE = 512
+NETLINK_KOBJECT_UEVENT = 15
+# Per-drive probes in one health check or benchmark share a single walk of /sys/block
+TOPOLOGY_TTL_S = 2.0
+
+
+class MountTableWatch:
+    """Blocks until the mount table changes or a block device is removed.
+
+    /proc/self/mounts raises POLLPRI whenever the namespace's mount table
+    changes, and a NETLINK_KOBJECT_UEVENT socket reports block devices that
+    are yanked while still mounted. A pipe wakes poll() for close(), so
+    nothing wakes up while no drive changes.
+    """
+
+    def __init__(self):
+        self._closed = False
+        self._mounts = open('/proc/self/mounts')
+        self._wake_r, self._wake_w = os.pipe()
+        self._poll = select.poll()
+        self._poll.register(self._mounts.fileno(), select.POLLPRI | select.POLLERR)
+        self._poll.register(self._wake_r, select.POLLIN)
+
+        self._uevents = None
+        try:
+            self._uevents = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            self._uevents.bind((0, 1))  # multicast group 1: kernel uevents
+            self._poll.register(self._uevents.fileno(), select.POLLIN)
+        except OSError as e:
+            logging.info(f"Netlink uevents unavailable, relying on the mount table only: {e}")
+            self._uevents = None
+
+        self._current = self._snapshot()
+        # Mountpoints whose device vanished but whose (stale) mount is still listed
+        self._gone = set()
+
+    def _snapshot(self):
+        return {mountpoint: block_name for _, mountpoint, _, block_name in read_mount_table()}
+
+    def _removed_block_devices(self):
+        """Drain pending uevents and return the names of removed block devices."""
+        removed = set()
+        while True:
+            try:
+                message = self._uevents.recv(16384, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return removed
+            except OSError as e:
+                logging.warning(f"Error reading uevent: {e}")
+                return removed
+            env = dict(field.split('=', 1) for field in message.decode('utf-8', 'replace').split('\0') if '=' in field)
+            if env.get("SUBSYSTEM") == "block" and env.get("ACTION") == "remove" and "DEVNAME" in env:
+                removed.add(os.path.basename(env["DEVNAME"]))
+
+    def changes(self):
+        while True:
+            events = self._poll.poll()
+            if self._closed:
+                self._cleanup()
+                return None
+
+            removed_blocks = set()
+            if self._uevents is not None and any(fd == self._uevents.fileno() for fd, _ in events):
+                removed_blocks = self._removed_block_devices()
+
+            previous, self._current = self._current, self._snapshot()
+            self._gone &= set(self._current)
+            changes = [(DRIVE_REMOVED, m) for m in previous if m not in self._current and m not in self._gone]
+            for mountpoint, block_name in self._current.items():
+                if block_name in removed_blocks and mountpoint not in self._gone:
+                    self._gone.add(mountpoint)
+                    changes.append((DRIVE_REMOVED, mountpoint))
+            changes += [(DRIVE_ADDED, m) for m in self._current if m not in previous]
+            if changes:
+                return changes
+
+    def close(self):
+        self._closed = True
+        os.write(self._wake_w, b'x')
+
+    def _cleanup(self):
+        self._mounts.close()
+        if self._uevents is not None:
+            self._uevents.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+class LinuxBackend(DriveBackend):
+    """Backend built on /sys/block, /proc/self/mountinfo, /proc/diskstats and ioctls."""
+
+    name = "linux"
+
+    def __init__(self):
+        self._topology = None
+        self._topology_time = 0.0
+        self._topology_lock = threading.Lock()
+
+    def _cached_topology(self):
+        """Return the sysfs topology, rebuilt at most every TOPOLOGY_TTL_S seconds."""
+        with self._topology_lock:
+            if self._topology is None or time.monotonic() - self._topology_time > TOPOLOGY_TTL_S:
+                self._topology = build_sysfs_topology()
+                self._topology_time = time.monotonic()
+            return self._topology
+
+    def list_drives(self):
+        drives_info = []
+        topology = build_sysfs_topology()
+        with self._topology_lock:
+            self._topology, self._topology_time = topology, time.monotonic()
+        labels = self._volume_labels()
+
+        logging.info("Starting drive detection...")
+        for mountpoint, entry in topology.items():
+            if not entry["disk"]["is_external"]:
+                continue
+            try:
+                drives_info.append(self._drive_details(mountpoint, entry, labels))
+            except Exception as e:
+                logging.error(f"Error processing drive {mountpoint}: {e}")
+        logging.info("Drive detection completed.")
+        return drives_info
+
+    def probe_drive(self, drive):
+        mount_table = [entry for entry in read_mount_table() if entry[1] == drive]
+        entry = build_sysfs_topology(mount_table=mount_table).get(drive)
+        if entry is None or not entry["disk"]["is_external"]:
+            return None
+        return self._drive_details(drive, entry, self._volume_labels())
+
+    def watch_volumes(self):
+        return MountTableWatch()
+
+    def _volume_labels(self):
+        """Map partition names to filesystem labels using /dev/disk/by-label."""
+        labels = {}
+        for link in glob.glob('/dev/disk/by-label/*'):
+            label = os.path.basename(link).replace('\\x20', ' ')
+            labels[os.path.basename(os.path.realpath(link))] = label
+        return labels
+
+    def _drive_details(self, mountpoint, entry, labels):
+        """Build a details dict shaped like core.drive_check.combine_drive_details."""
+        disk, logical_disk = entry["disk"], entry["logical_disk"]
+        details = {
+            "drive_letter": mountpoint,
+            "device": logical_disk["device"],
+            "volume_name": labels.get(logical_disk["partition"], "N/A"),
+            "total_gb": "N/A",
+            "free_gb": "N/A",
+            "file_system": logical_disk["file_system"],
+            "drive_type_wmi": "N/A",
+            "volume_serial": "N/A",
+            "usage_history": [],
+        }
+        details.update(disk)
+
+        stats = self.volume_stats(mountpoint)
+        if stats:
+            details.update({
+                "total_gb": stats["total"] / (1024**3),
+                "free_gb": stats["free"] / (1024**3),
+            })
+            attach_usage_history(details)
+        return details
+
+    def volume_stats(self, drive):
+        try:
+            st = os.statvfs(drive)
+        except OSError as e:
+            logging.warning(f"Volume stats unavailable for {drive}: {e}")
+            return None
+        total = st.f_blocks * st.f_frsize
+        free = st.f_bavail * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        # Same definition as psutil.disk_usage: reserved blocks count as neither
+        percent = round(used / (used + free) * 100, 1) if used + free else 0.0
+        return {"total": total, "used": used, "free": free, "percent": percent}
+
+    def _disk_name(self, drive):
+        entry = find_mount_entry(self._cached_topology(), drive)
+        return entry["disk"]["disk_id"] if entry else None
+
+    def smart_attributes(self, drive):
+        disk_name = self._disk_name(drive)
+        if disk_name is None:
+            return None
+        # 4-byte HDIO_DRIVE_CMD header (command, sector, feature, nsector) + one sector of data
+        args = bytearray([ATA_SMART_CMD, 0, ATA_SMART_READ_VALUES, 1]) + bytearray(SECTOR_SIZE)
+        try:
+            with open(f"/dev/{disk_name}", 'rb') as dev:
+                fcntl.ioctl(dev.fileno(), HDIO_DRIVE_CMD, args)
+        except OSError as e:
+            # USB bridges and non-ATA devices commonly reject the command
+            logging.info(f"SMART not available for /dev/{disk_name}: {e}")
+            return None
+        return bytes(args[4:])
+
+    def disk_serial(self, drive):
+        entry = find_mount_entry(self._cached_topology(), drive)
+        serial = entry["disk"]["serial_number"] if entry else None
+        return serial if serial and serial != 'N/A' else None
+
+    def temperature(self, drive):
+        disk_name = self._disk_name(drive)
+        if disk_name is None:
+            return None
+        # drivetemp (SATA) and nvme register a hwmon device under the disk
+        for sensor in glob.glob(f"/sys/block/{disk_name}/device/hwmon/hwmon*/temp1_input") + \
+                glob.glob(f"/sys/block/{disk_name}/device/device/hwmon/hwmon*/temp1_input"):
+            try:
+                with open(sensor) as f:
+                    return int(f.read().strip()) / 1000.0
+            except (OSError, ValueError):
+                continue
+        return None
+
+    def io_counters(self):
+        counters = {}
+        try:
+            with open('/proc/diskstats') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 14:
+                        continue
+                    counters[fields[2]] = {
+                        "read_count": int(fields[3]),
+                        "write_count": int(fields[7]),
+                        "read_bytes": int(fields[5]) * SECTOR_SIZE,
+                        "write_bytes": int(fields[9]) * SECTOR_SIZE,
+                        "read_time": int(fields[6]),
+                        "write_time": int(fields[10]),
+                        "in_flight": int(fields[11]),
+                        "busy_time": int(fields[12]),
+                        "queue_time": int(fields[13]),
+                    }
+        except OSError as e:
+            logging.error(f"Error reading /proc/diskstats: {e}")
+        return counters
+
+    def disk_for_volume(self, drive):
+        return self._disk_name(drive)
+
+    def raw_device_path(self, drive):
+        disk_name = self._disk_name(drive)
+        return f"/dev/{disk_name}" if disk_name else None
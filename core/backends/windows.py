@@ -0,0 +1,140 @@
+# core/backends/windows.py
+
+import logging
+import re
+import psutil
+import pythoncom
+import threading
+import time
+import win32file
+import wmi
+
+from core import drive_check, health
+from core.backends.base import DriveBackend
+from core.hotplug import DRIVE_ADDED, DRIVE_REMOVED
+from core.query_session import get_wmi_sessions
+from core.topology import build_wmi_topology, normalize_drive_key
+
+# Win32_VolumeChangeEvent.EventType values
+VOLUME_ARRIVAL = 2
+VOLUME_REMOVAL = 3
+# How long a single event wait lasts before re-checking for close(); not a drive poll
+STOP_CHECK_MS = 2000
+# Per-drive probes in one health check or benchmark share a single topology query
+TOPOLOGY_TTL_S = 2.0
+
+
+def _query_disk_identities(connect):
+    """Map each drive letter to its disk's DeviceID, PNPDeviceID and SerialNumber (plain strings)."""
+    return {
+        letter: {
+            "device_id": entry["disk"].DeviceID,
+            "pnp_device_id": entry["disk"].PNPDeviceID,
+            "serial_number": (entry["disk"].SerialNumber or '').strip(),
+        }
+        for letter, entry in build_wmi_topology(connect()).items()
+    }
+
+
+class VolumeChangeWatch:
+    """Blocks on a Win32_VolumeChangeEvent WMI event query."""
+
+    def __init__(self):
+        self._closed = threading.Event()
+        self._watcher = None
+
+    def changes(self):
+        if self._watcher is None:
+            # COM objects belong to the thread that created them
+            pythoncom.CoInitialize()
+            self._watcher = wmi.WMI().watch_for(raw_wql="SELECT * FROM Win32_VolumeChangeEvent")
+
+        while not self._closed.is_set():
+            try:
+                event = self._watcher(timeout_ms=STOP_CHECK_MS)
+            except wmi.x_wmi_timed_out:
+                continue
+            drive = event.DriveName.rstrip('\\') + '\\'
+            if event.EventType == VOLUME_ARRIVAL:
+                return [(DRIVE_ADDED, drive)]
+            if event.EventType == VOLUME_REMOVAL:
+                return [(DRIVE_REMOVED, drive)]
+        return None
+
+    def close(self):
+        self._closed.set()
+
+
+class WindowsBackend(DriveBackend):
+    """Backend wrapping the win32api/WMI/PowerShell probes in core.drive_check and core.health."""
+
+    name = "windows"
+
+    def __init__(self):
+        self._identities = None
+        self._identities_time = 0.0
+        self._identities_lock = threading.Lock()
+
+    def _disk_identity(self, drive):
+        """Return {"device_id", "pnp_device_id", "serial_number"} for a volume's disk, or None."""
+        with self._identities_lock:
+            if self._identities is None or time.monotonic() - self._identities_time > TOPOLOGY_TTL_S:
+                self._identities = get_wmi_sessions().call(_query_disk_identities)
+                self._identities_time = time.monotonic()
+            identity = self._identities.get(normalize_drive_key(drive))
+        if identity is None:
+            logging.warning(f"No physical disk found for {drive}")
+        return identity
+
+    def list_drives(self):
+        return drive_check.scan_win32_drives()
+
+    def probe_drive(self, drive):
+        return drive_check.probe_win32_drive(drive)
+
+    def watch_volumes(self):
+        return VolumeChangeWatch()
+
+    def volume_stats(self, drive):
+        if not win32file.GetDriveType(drive):
+            return None
+        usage = psutil.disk_usage(drive)
+        return {
+            "total": usage.total,
+            "used": usage.used,
+            "free": usage.free,
+            "percent": usage.percent
+        }
+
+    def smart_attributes(self, drive):
+        identity = self._disk_identity(drive)
+        if identity is None:
+            return None
+        return health.get_smart_attributes(drive, identity["pnp_device_id"])
+
+    def disk_serial(self, drive):
+        identity = self._disk_identity(drive)
+        return identity["serial_number"] or None if identity else None
+
+    def temperature(self, drive):
+        return health.check_disk_temperature(drive)
+
+    def fragmentation(self, drive):
+        return health.check_fragmentation(drive)
+
+    def io_counters(self):
+        return {name: counters._asdict() for name, counters in psutil.disk_io_counters(perdisk=True).items()}
+
+    def _disk_device_id(self, drive):
+        identity = self._disk_identity(drive)
+        return identity["device_id"] if identity else None
+
+    def disk_for_volume(self, drive):
+        device_id = self._disk_device_id(drive)
+        # psutil names disks 'PhysicalDriveN' where WMI reports '\\.\PHYSICALDRIVEN'
+        match = re.search(r'PHYSICALDRIVE(\d+)', device_id or '', re.IGNORECASE)
+        return f"PhysicalDrive{match.group(1)}" if match else None
+
+    def raw_device_path(self, drive):
+        # '\\.\PHYSICALDRIVEN' opens the whole disk (administrator rights required)
+        return self._disk_device_id(drive)
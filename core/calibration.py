@@ -0,0 +1,226 @@
+# core/calibration.py
+
+import errno
+import logging
+import os
+import shutil
+import time
+
+from core.cancellation import check_cancelled
+from core.io_engine import DEFAULT_BLOCK_SIZE, sequential_read, sequential_write
+from core.metadata_bench import DEFAULT_PHASE_LIMIT_S, OP_MKDIR, PHASES as METADATA_PHASES
+from core.profiles import AUTO, ExecutionPlan, PlanStep, STEP_METADATA, STEP_RANDOM, STEP_SEQUENTIAL_READ, \
+    STEP_SEQUENTIAL_WRITE
+from core.random_io import random_io
+
+CALIBRATION_FILE = "driveman_calibration.bin"
+DEFAULT_BUDGET_S = 60.0
+
+# The probe write grows from PROBE_START_BYTES until one pass takes PROBE_TARGET_S
+PROBE_TARGET_S = 0.5
+PROBE_START_BYTES = 1024 * 1024
+PROBE_MAX_BYTES = 64 * 1024 * 1024
+PROBE_RANDOM_S = 0.25
+PROBE_RANDOM_BLOCK_SIZE = 4096
+
+# Scaled phases are sampled in this many windows, enough for a usable confidence interval
+TARGET_WINDOWS = 20
+MIN_WINDOW_S = 0.01
+MIN_PHASE_S = 0.5
+MIN_AUTO_SIZE_MB = 4
+MAX_AUTO_SIZE_MB = 8192
+# Share of the free space an auto-sized sequential phase may fill
+FREE_SPACE_FRACTION = 0.5
+# A phase that misses its confidence target reruns at up to this multiple of its size or duration,
+# and only if the budget allows at least MIN_EXTENSION_GROWTH
+MAX_EXTENSION_GROWTH = 2.0
+MIN_EXTENSION_GROWTH = 1.25
+_METADATA_TIMED_PHASES = len([op for op in METADATA_PHASES if op != OP_MKDIR])
+
+
+def calibrate(drive, direct=True, cancel_event=None):
+    """Estimate a drive's sequential write/read MB/s and QD1 random read IOPS in about a second.
+
+    The probe file is rewritten, growing up to 8x per pass, until one write
+    takes PROBE_TARGET_S (or reaches PROBE_MAX_BYTES or a quarter of the
+    free space), then read back once and random-read for PROBE_RANDOM_S.
+    Small first passes overstate fast devices less than a fixed-size probe
+    would understate slow ones.
+    """
+    path = os.path.join(drive, CALIBRATION_FILE)
+    limit = min(PROBE_MAX_BYTES, shutil.disk_usage(drive).free // 4)
+    limit -= limit % PROBE_START_BYTES
+    if limit < PROBE_START_BYTES:
+        raise OSError(errno.ENOSPC, "Not enough free space for the calibration probe", drive)
+    started = time.perf_counter()
+    size = PROBE_START_BYTES
+    try:
+        while True:
+            check_cancelled(cancel_event)
+            write = sequential_write(path, size, DEFAULT_BLOCK_SIZE, direct, cancel_event)
+            if write["seconds"] >= PROBE_TARGET_S or size >= limit:
+                break
+            growth = PROBE_TARGET_S / max(write["seconds"], 1e-3)
+            size = min(limit, size * min(8, max(2, int(growth) + 1)))
+        read = sequential_read(path, DEFAULT_BLOCK_SIZE, direct, cancel_event)
+        random_read = random_io(path, PROBE_RANDOM_BLOCK_SIZE, PROBE_RANDOM_S, 1, 1.0, direct, seed=0,
+                                cancel_event=cancel_event)
+    finally:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logging.error(f"Error removing calibration file {path}: {e}")
+    return {
+        "write_mb_s": write["speed_mb_s"],
+        "read_mb_s": read["speed_mb_s"],
+        "random_read_iops": random_read["iops"],
+        "probe_bytes": size,
+        "io_mode": write["io_mode"],
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _size_ceiling_mb(free_bytes):
+    # free_bytes is inf when unknown
+    return int(min(MAX_AUTO_SIZE_MB, free_bytes * FREE_SPACE_FRACTION / (1024 * 1024)))
+
+
+def _auto_size_mb(mb_s, seconds, block_size, free_bytes):
+    floor = max(MIN_AUTO_SIZE_MB, -(-block_size // (1024 * 1024)))
+    return max(floor, min(_size_ceiling_mb(free_bytes), int(mb_s * seconds)))
+
+
+def _speeds(calibration):
+    return (max(calibration["write_mb_s"], 0.01), max(calibration["read_mb_s"], 0.01),
+            max(calibration["random_read_iops"], 1.0))
+
+
+def _step_estimate(step, write_mb_s, read_mb_s, random_iops):
+    """Seconds a step takes at the calibrated speeds, leaving out its "auto" parts; returns (seconds, auto shares)."""
+    params = step.params
+    if step.kind in (STEP_SEQUENTIAL_WRITE, STEP_SEQUENTIAL_READ):
+        if params["size_mb"] == AUTO:
+            return 0.0, 1
+        return params["size_mb"] / (write_mb_s if step.kind == STEP_SEQUENTIAL_WRITE else read_mb_s), 0
+    if step.kind == STEP_RANDOM:
+        # Preparing the test file is a sequential write of its own
+        seconds = params["file_size_mb"] / write_mb_s
+        if params["duration"] == AUTO:
+            return seconds, len(params["workloads"])
+        duration = params["duration"]
+        if params["max_ops"] is not None:
+            duration = min(duration, params["max_ops"] / random_iops)
+        return seconds + duration * len(params["workloads"]), 0
+    if step.kind == STEP_METADATA:
+        if params.get("phase_limit_s") == AUTO:
+            return 0.0, 1
+        return params.get("phase_limit_s", DEFAULT_PHASE_LIMIT_S) * _METADATA_TIMED_PHASES, 0
+    return 0.0, 0
+
+
+def estimate_s(steps, calibration):
+    """Seconds the scaled steps should take at the calibrated speeds (metadata phases at their time limit)."""
+    speeds = _speeds(calibration)
+    return sum(_step_estimate(step, *speeds)[0] for step in steps)
+
+
+def _window_s(seconds):
+    return max(MIN_WINDOW_S, seconds / TARGET_WINDOWS)
+
+
+def scale_plan(plan, calibration, budget_s=DEFAULT_BUDGET_S, free_bytes=None):
+    """Resolve a plan's "auto" sizes and durations from a calibrate() result; returns (plan, allocations).
+
+    Fixed-size phases are estimated from the calibrated speeds and taken
+    out of the budget first (metadata phases at their time limit, so an
+    upper bound); what is left, less the calibration itself, is shared
+    equally by the auto phases, one share per random workload. Each auto
+    phase is sampled in TARGET_WINDOWS windows for its confidence interval;
+    extend_step lengthens one that misses the profile's
+    target_half_width_percent.
+    No phase gets less than MIN_PHASE_S, so a budget that is too small is
+    overrun rather than producing meaningless numbers. allocations maps
+    phase names to the target seconds and the size or duration chosen.
+    """
+    write_mb_s, read_mb_s, random_iops = _speeds(calibration)
+    free_bytes = float('inf') if free_bytes is None else free_bytes
+
+    fixed_s, shares = 0.0, 0
+    for step in plan.steps:
+        seconds, step_shares = _step_estimate(step, write_mb_s, read_mb_s, random_iops)
+        fixed_s += seconds
+        shares += step_shares
+
+    available_s = budget_s - calibration["seconds"] - fixed_s
+    target_s = max(MIN_PHASE_S, available_s / shares) if shares else None
+    if shares and available_s / shares < MIN_PHASE_S:
+        logging.warning(f"A {budget_s:.0f} s budget leaves {max(available_s, 0):.1f} s for {shares} auto phases; "
+                        f"running each for {MIN_PHASE_S} s")
+
+    steps, allocations = [], {}
+    for step in plan.steps:
+        params = dict(step.params)
+        scaled = True
+        if step.kind == STEP_SEQUENTIAL_WRITE and params["size_mb"] == AUTO:
+            params["size_mb"] = _auto_size_mb(write_mb_s, target_s, params["block_size"], free_bytes)
+            params["sample_window_s"] = _window_s(params["size_mb"] / write_mb_s)
+        elif step.kind == STEP_SEQUENTIAL_READ and params["size_mb"] == AUTO:
+            previous = steps[-1] if steps else None
+            if previous is not None and previous.kind == STEP_SEQUENTIAL_WRITE and previous.params["keep_file"]:
+                # Reads the file the write phase left behind, whatever its size
+                params["size_mb"] = previous.params["size_mb"]
+            else:
+                params["size_mb"] = _auto_size_mb(read_mb_s, target_s, params["block_size"], free_bytes)
+            params["sample_window_s"] = _window_s(params["size_mb"] / read_mb_s)
+        elif step.kind == STEP_RANDOM and params["duration"] == AUTO:
+            params["duration"] = target_s
+            params["sample_window_s"] = _window_s(target_s)
+        elif step.kind == STEP_METADATA and params.get("phase_limit_s") == AUTO:
+            params["phase_limit_s"] = target_s / _METADATA_TIMED_PHASES
+        else:
+            scaled = False
+        steps.append(PlanStep(step.kind, list(step.names), params))
+        if not scaled:
+            continue
+        for name in step.names:
+            allocations[name] = {key: params[key] for key in ("size_mb", "duration", "phase_limit_s") if key in params}
+            allocations[name]["target_s"] = target_s
+    return ExecutionPlan(plan.spec, steps), allocations
+
+
+def extend_step(step, calibration, available_s, free_bytes=None):
+    """A longer rerun of a scaled step that missed its confidence target, or None if available_s has no room for one.
+
+    Sequential sizes and random durations grow by up to
+    MAX_EXTENSION_GROWTH and keep their sampling window, so the rerun has
+    more windows. The rerun replaces the first run's result, so it has to
+    fit available_s on its own, test file included; a random step keeps
+    only as many of its leading workloads as fit. free_bytes is the free
+    space with the step's own test file removed.
+    """
+    write_mb_s, read_mb_s, _ = _speeds(calibration)
+    params = dict(step.params)
+    if step.kind == STEP_SEQUENTIAL_WRITE:
+        old = params["size_mb"]
+        # A kept file is read back by the next step, which grows with it
+        read_cost = 1 / read_mb_s if params["keep_file"] else 0.0
+        size_mb = (available_s + old * read_cost) / (1 / write_mb_s + read_cost)
+    elif step.kind == STEP_SEQUENTIAL_READ:
+        old = params["size_mb"]
+        # The first run removed its file, so the rerun writes it again
+        size_mb = available_s / (1 / write_mb_s + 1 / read_mb_s)
+    elif step.kind == STEP_RANDOM:
+        old = params["duration"]
+        workloads_s = available_s - params["file_size_mb"] / write_mb_s
+        count = min(len(params["workloads"]), int(workloads_s // (old * MIN_EXTENSION_GROWTH)))
+        if count < 1:
+            return None
+        params["workloads"] = params["workloads"][:count]
+        params["duration"] = min(old * MAX_EXTENSION_GROWTH, workloads_s / count)
+        return PlanStep(step.kind, [workload[0] for workload in params["workloads"]], params)
+    else:
+        return None
+    ceiling = _size_ceiling_mb(float('inf') if free_bytes is None else free_bytes)
+    params["size_mb"] = int(min(old * MAX_EXTENSION_GROWTH, size_mb, ceiling))
+    return PlanStep(step.kind, list(step.names), params) if params["size_mb"] >= old * MIN_EXTENSION_GROWTH else None
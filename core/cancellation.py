@@ -0,0 +1,11 @@
+# core/cancellation.py
+
+
+class OperationCancelled(Exception):
+    """Raised inside a long-running probe when its cancel_event is set."""
+
+
+def check_cancelled(cancel_event):
+    """Raise OperationCancelled if cancel_event (a threading.Event or None) is set."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise OperationCancelled()
@@ -0,0 +1,432 @@
+# core/capacity_verify.py
+
+import errno
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from core.app_data import data_path
+from core.cancellation import OperationCancelled, check_cancelled
+from core.io_engine import ALIGNMENT, aligned_buffer, drop_cache, open_unbuffered, read_at, write_at, IO_MODE_DIRECT
+from core.surface_scan import device_size
+
+BLOCK_SIZE = 1024 * 1024
+SECTOR_SIZE = 512
+# Test data is written as files of this size so no single file hits FAT32's 4 GiB limit
+FILE_SIZE = 1024 * 1024 * 1024
+# Free space left untouched so the filesystem can still update its own metadata
+RESERVE_BYTES = 4 * 1024 * 1024
+VERIFY_DIR = "driveman_verify"
+# Blocks generated or verified ahead of the I/O thread
+PIPELINE_DEPTH = 8
+STATE_SAVE_INTERVAL_S = 10.0
+
+MODE_FILES = "files"
+MODE_DEVICE = "device"
+
+PHASE_WRITE = "write"
+PHASE_VERIFY = "verify"
+PHASE_DONE = "done"
+
+
+class BlockPattern:
+    """Reproducible contents for every block of a verification run.
+
+    A block is a window into a random pool generated once from the seed,
+    starting at a position derived from the block's offset, with the first
+    8 bytes of every 512-byte sector overwritten by that sector's absolute
+    offset. The pool makes a block a single memcpy instead of a PRNG call
+    (random.randbytes manages ~125 MB/s, well below a USB 3 stick); the
+    stamps make every sector unique, so a fake drive that wraps writes
+    around onto its real capacity is caught and the source offset reported.
+    """
+
+    def __init__(self, seed, block_size=BLOCK_SIZE):
+        self.seed = seed
+        self.block_size = block_size
+        pool = random.Random(seed).randbytes(2 * block_size)
+        self._pool_size = len(pool)
+        self._pool = pool + pool[:block_size]
+        self._stamp_step = SECTOR_SIZE // 8
+
+    def expected(self, offset):
+        """Return a bytearray with the expected contents of the block at offset."""
+        start = (offset // self.block_size * 0x9E3779B97F4A7C15 + self.seed) % self._pool_size
+        block = bytearray(self._pool[start:start + self.block_size])
+        with memoryview(block) as view, view.cast('Q') as words:
+            words[::self._stamp_step] = array('Q', range(offset, offset + self.block_size, SECTOR_SIZE))
+        return block
+
+    def compare(self, data, offset, total_bytes):
+        """Check data read back from offset.
+
+        Returns (bad_sectors, first_bad_offset, aliased_sectors,
+        alias_distance). data is None when the read failed, which counts
+        the whole block bad. A bad sector whose stamp names another valid
+        sector offset was aliased: the drive returned data written
+        somewhere else. alias_distance is the smallest distance between a
+        sector and the offset its stamp names (None without aliasing); on
+        a drive that wraps writes around, that is its real capacity.
+        """
+        sectors = self.block_size // SECTOR_SIZE
+        if data is None:
+            return sectors, offset, 0, None
+        expected = self.expected(offset)
+        if data == expected:
+            return 0, None, 0, None
+        bad = aliased = 0
+        first_bad = alias_distance = None
+        for start in range(0, self.block_size, SECTOR_SIZE):
+            sector = data[start:start + SECTOR_SIZE]
+            if sector == expected[start:start + SECTOR_SIZE]:
+                continue
+            bad += 1
+            if first_bad is None:
+                first_bad = offset + start
+            if len(sector) >= 8:
+                stamp = int.from_bytes(sector[:8], sys.byteorder)
+                if stamp != offset + start and stamp % SECTOR_SIZE == 0 and stamp < total_bytes:
+                    aliased += 1
+                    distance = abs(stamp - (offset + start))
+                    if alias_distance is None or distance < alias_distance:
+                        alias_distance = distance
+        return bad, first_bad, aliased, alias_distance
+
+
+class CapacityVerifier:
+    """h2testw/f3-style check that a drive really stores as much as it reports.
+
+    The target is either a directory (test files fill its free space) or,
+    with destructive=True, a block device or image file written from
+    offset 0. Blocks are written sequentially with direct I/O, then read back
+    and compared; the first offset that does not verify bounds the real
+    capacity. With threads > 0, block generation and comparison run on a
+    pool PIPELINE_DEPTH blocks ahead of the I/O so the device stays busy.
+
+    Progress is saved to state_path periodically and on cancellation, and
+    run() resumes from the saved phase and position.
+    """
+
+    def __init__(self, target, size_bytes=None, block_size=BLOCK_SIZE, file_size=FILE_SIZE, seed=None,
+                 threads=2, direct=True, destructive=False, state_path=None, keep_files=False):
+        if block_size % ALIGNMENT or file_size % block_size:
+            raise ValueError(f"Block size must be a multiple of {ALIGNMENT} and divide the file size")
+        self.target = target
+        self.block_size = block_size
+        self.file_size = file_size
+        self.threads = threads
+        self.direct = direct
+        self.state_path = state_path
+        self.keep_files = keep_files
+
+        self.mode = MODE_FILES if os.path.isdir(target) else MODE_DEVICE
+        if self.mode == MODE_DEVICE and not destructive:
+            raise ValueError(f"{target} is not a directory; pass destructive=True to overwrite it")
+
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.phase = PHASE_WRITE
+        self.position = 0
+        self.used_bytes_before = 0
+        self.write_error = None
+        self.good_bytes = self.bad_bytes = self.aliased_bytes = 0
+        self.first_bad_offset = None
+        self.alias_distance = None
+        self.write_seconds = self.read_seconds = 0.0
+        self.bytes_written = self.bytes_read = 0
+
+        if state_path and os.path.exists(state_path) and self.load_state():
+            self.pattern = BlockPattern(self.seed, self.block_size)
+            return
+
+        if self.mode == MODE_FILES:
+            usage = shutil.disk_usage(target)
+            self.used_bytes_before = usage.used
+            available = usage.free - RESERVE_BYTES
+        else:
+            available = device_size(target)
+        if size_bytes is not None:
+            available = min(available, size_bytes)
+        self.total_bytes = max(0, available - available % block_size)
+        self.pattern = BlockPattern(self.seed, self.block_size)
+
+    _STATE_FIELDS = ("target", "mode", "seed", "block_size", "file_size", "total_bytes", "phase", "position",
+                     "used_bytes_before", "write_error", "good_bytes", "bad_bytes", "aliased_bytes",
+                     "first_bad_offset", "alias_distance", "write_seconds", "read_seconds", "bytes_written",
+                     "bytes_read")
+
+    def load_state(self):
+        """Resume from state_path if it is for the same target and layout; returns True on success."""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable capacity verification state {self.state_path}: {e}")
+            return False
+        layout = (self.target, self.mode, self.block_size, self.file_size)
+        if tuple(state.get(key) for key in ("target", "mode", "block_size", "file_size")) != layout:
+            logging.info(f"Capacity verification state {self.state_path} is for a different target; starting over")
+            return False
+        for key in self._STATE_FIELDS:
+            # Fields added later keep their defaults when resuming an older state
+            setattr(self, key, state.get(key, getattr(self, key, None)))
+        logging.info(f"Resuming capacity verification of {self.target}: {self.phase} at offset {self.position}")
+        return True
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({key: getattr(self, key) for key in self._STATE_FIELDS}, f)
+        os.replace(temp_path, self.state_path)
+
+    def _locate(self, offset):
+        """Map a test offset to (path, offset within that path)."""
+        if self.mode == MODE_DEVICE:
+            return self.target, offset
+        index = offset // self.file_size
+        return os.path.join(self.target, VERIFY_DIR, f"{index:05d}.bin"), offset - index * self.file_size
+
+    def _expected_blocks(self, executor):
+        """Yield (offset, expected block) from the current position on, generated ahead on the executor."""
+        offsets = range(self.position, self.total_bytes, self.block_size)
+        if executor is None:
+            for offset in offsets:
+                yield offset, self.pattern.expected(offset)
+            return
+        pending = deque()
+        for offset in offsets:
+            pending.append((offset, executor.submit(self.pattern.expected, offset)))
+            if len(pending) >= PIPELINE_DEPTH:
+                offset, future = pending.popleft()
+                yield offset, future.result()
+        while pending:
+            offset, future = pending.popleft()
+            yield offset, future.result()
+
+    def write_phase(self, progress_callback=None, cancel_event=None, executor=None):
+        """Write the test pattern from the current position to total_bytes."""
+        if self.mode == MODE_FILES:
+            os.makedirs(os.path.join(self.target, VERIFY_DIR), exist_ok=True)
+        buffer = aligned_buffer(self.block_size)
+        raw = raw_path = None
+        last_saved = last_reported = time.monotonic()
+        start_time = time.perf_counter()
+        start_position = self.position
+
+        def checkpoint():
+            if raw is not None:
+                os.fsync(raw.fileno())
+            self.write_seconds += time.perf_counter() - start_time
+            self.bytes_written += self.position - start_position
+            self.save_state()
+
+        try:
+            for offset, block in self._expected_blocks(executor):
+                check_cancelled(cancel_event)
+                path, file_offset = self._locate(offset)
+                if path != raw_path:
+                    if raw is not None:
+                        os.fsync(raw.fileno())
+                        raw.close()
+                        raw = None
+                    # Resume into a partly written file instead of truncating it
+                    access = 'rw' if self.mode == MODE_DEVICE or os.path.exists(path) else 'w'
+                    raw, _ = open_unbuffered(path, direct=self.direct, access=access)
+                    raw_path = path
+                buffer[:] = block
+                try:
+                    write_at(raw, buffer, file_offset)
+                except OSError as e:
+                    # Whatever was written before the failure is still verified
+                    logging.warning(f"Write to {path} failed at offset {offset}: {e}")
+                    self.write_error = {"offset": offset, "errno": e.errno, "error": str(e)}
+                    self.total_bytes = offset
+                    break
+                self.position = offset + self.block_size
+
+                now = time.monotonic()
+                if progress_callback and now - last_reported >= 0.5:
+                    last_reported = now
+                    progress_callback(0.5 * self.position / self.total_bytes,
+                                      f"Writing test data to {self.target}: {self.position // (1024 * 1024)} MB")
+                if now - last_saved >= STATE_SAVE_INTERVAL_S:
+                    last_saved = now
+                    os.fsync(raw.fileno())
+                    self.save_state()
+            if raw is not None:
+                os.fsync(raw.fileno())
+        except OperationCancelled:
+            checkpoint()
+            raise
+        finally:
+            if raw is not None:
+                raw.close()
+
+        self.write_seconds += time.perf_counter() - start_time
+        self.bytes_written += self.position - start_position
+        self.phase = PHASE_VERIFY
+        self.position = 0
+        self.save_state()
+
+    def _account(self, offset, result):
+        bad_sectors, first_bad, aliased_sectors, alias_distance = result
+        bad = bad_sectors * SECTOR_SIZE
+        self.bad_bytes += bad
+        self.good_bytes += self.block_size - bad
+        self.aliased_bytes += aliased_sectors * SECTOR_SIZE
+        if first_bad is not None and (self.first_bad_offset is None or first_bad < self.first_bad_offset):
+            self.first_bad_offset = first_bad
+        if alias_distance is not None and (self.alias_distance is None or alias_distance < self.alias_distance):
+            self.alias_distance = alias_distance
+        self.position = offset + self.block_size
+
+    def verify_phase(self, progress_callback=None, cancel_event=None, executor=None):
+        """Read back and compare every written block from the current position."""
+        buffer = aligned_buffer(self.block_size)
+        raw = raw_path = None
+        pending = deque()
+        last_saved = last_reported = time.monotonic()
+        start_time = time.perf_counter()
+        start_position = self.position
+        try:
+            for offset in range(self.position, self.total_bytes, self.block_size):
+                check_cancelled(cancel_event)
+                path, file_offset = self._locate(offset)
+                if path != raw_path:
+                    if raw is not None:
+                        raw.close()
+                        raw = None
+                    raw_path = path
+                    try:
+                        raw, io_mode = open_unbuffered(path, direct=self.direct)
+                        if io_mode != IO_MODE_DIRECT:
+                            # Reading back from the page cache would verify nothing
+                            drop_cache(path)
+                    except OSError as e:
+                        logging.warning(f"Cannot open {path} for verification: {e}")
+                try:
+                    if raw is None:
+                        raise OSError(errno.ENOENT, "Test file missing", path)
+                    data = buffer[:read_at(raw, buffer, file_offset)]
+                except OSError as e:
+                    logging.warning(f"Read from {path} failed at offset {offset}: {e}")
+                    data = None
+
+                if executor is None:
+                    self._account(offset, self.pattern.compare(data, offset, self.total_bytes))
+                else:
+                    pending.append((offset, executor.submit(self.pattern.compare, data, offset, self.total_bytes)))
+                    if len(pending) >= PIPELINE_DEPTH:
+                        pending_offset, future = pending.popleft()
+                        self._account(pending_offset, future.result())
+
+                now = time.monotonic()
+                if progress_callback and now - last_reported >= 0.5:
+                    last_reported = now
+                    progress_callback(0.5 + 0.5 * self.position / self.total_bytes,
+                                      f"Verifying {self.target}: {self.position // (1024 * 1024)} MB")
+                if now - last_saved >= STATE_SAVE_INTERVAL_S:
+                    last_saved = now
+                    self.save_state()
+            while pending:
+                pending_offset, future = pending.popleft()
+                self._account(pending_offset, future.result())
+        except OperationCancelled:
+            # Only blocks already accounted for are saved as verified
+            for future in pending:
+                future[1].cancel()
+            self.read_seconds += time.perf_counter() - start_time
+            self.bytes_read += self.position - start_position
+            self.save_state()
+            raise
+        finally:
+            if raw is not None:
+                raw.close()
+
+        self.read_seconds += time.perf_counter() - start_time
+        self.bytes_read += self.position - start_position
+        self.phase = PHASE_DONE
+        self.save_state()
+
+    def remove_test_files(self):
+        if self.mode == MODE_FILES:
+            shutil.rmtree(os.path.join(self.target, VERIFY_DIR), ignore_errors=True)
+
+    def run(self, progress_callback=None, cancel_event=None):
+        """Run (or resume) the write and verify phases and return summary()."""
+        executor = ThreadPoolExecutor(self.threads, thread_name_prefix="driveman-verify") if self.threads else None
+        try:
+            if self.phase == PHASE_WRITE:
+                self.write_phase(progress_callback, cancel_event, executor)
+            if self.phase == PHASE_VERIFY:
+                self.verify_phase(progress_callback, cancel_event, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if not self.keep_files:
+            self.remove_test_files()
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.summary()
+
+    def summary(self):
+        """Results of the run so far.
+
+        usable_bytes is normally the offset of the first bad sector. When
+        writes wrapped around (the usual counterfeit), the low blocks were
+        overwritten by later writes and fail first, so the wrap size
+        (h2testw's "overwritten" figure) is the usable size instead.
+        """
+        if self.alias_distance is not None:
+            usable_bytes = self.alias_distance
+        else:
+            usable_bytes = self.first_bad_offset if self.first_bad_offset is not None else self.good_bytes
+        return {
+            "target": self.target,
+            "mode": self.mode,
+            "seed": self.seed,
+            "block_size": self.block_size,
+            "tested_bytes": self.total_bytes,
+            "verified_bytes": self.good_bytes + self.bad_bytes,
+            "good_bytes": self.good_bytes,
+            "bad_bytes": self.bad_bytes,
+            "aliased_bytes": self.aliased_bytes,
+            "first_bad_offset": self.first_bad_offset,
+            # Distance at which the drive wraps writes around; None if no sector came back from elsewhere
+            "wrap_bytes": self.alias_distance,
+            "usable_bytes": usable_bytes,
+            # Files only cover free space; what was already stored counts towards real capacity
+            "estimated_capacity_bytes": self.used_bytes_before + usable_bytes,
+            "write_error": self.write_error,
+            "write_mb_s": self.bytes_written / (1024 * 1024) / self.write_seconds if self.write_seconds else None,
+            "read_mb_s": self.bytes_read / (1024 * 1024) / self.read_seconds if self.read_seconds else None,
+            "passed": self.bad_bytes == 0 and self.write_error is None,
+        }
+
+
+def verify_drive_capacity(drive, size_bytes=None, threads=2, progress_callback=None, result_callback=None,
+                          cancel_event=None):
+    """Fill a drive's free space with test files and verify them, resuming an interrupted run.
+
+    The summary gets the drive's reported size alongside the estimated real capacity.
+    """
+    drive_letter = drive["drive_letter"]
+    # 'E:' is the current directory on E:, not its root
+    target = drive_letter + os.sep if drive_letter.endswith(':') else drive_letter
+    state_name = ''.join(c if c.isalnum() else '_' for c in drive_letter).strip('_') or "root"
+    verifier = CapacityVerifier(target, size_bytes, threads=threads,
+                                state_path=data_path(f"capacity_verify_{state_name}.json"))
+    summary = verifier.run(progress_callback, cancel_event)
+    summary["reported_size_bytes"] = drive.get("size_bytes")
+    if result_callback:
+        result_callback(drive_letter, summary)
+    return summary
@@ -0,0 +1,484 @@
+# core/cli.py
+
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.cancellation import OperationCancelled
+from core.profiles import DEFAULT_PROFILE, list_profiles
+from core.export import (RECORD_BENCHMARK, RECORD_CAPACITY_VERIFY, RECORD_DRIVE, RECORD_DRIVE_REMOVED, RECORD_HEALTH,
+                         RECORD_MONITOR_SAMPLE, RECORD_SURFACE_SCAN, ReportWriter, report_record)
+
+# Exit codes
+EXIT_OK = 0             # every drive passed
+EXIT_FAILED = 1         # a drive failed its check (unhealthy, benchmark error, bad sectors, fake capacity)
+EXIT_USAGE = 2          # bad command line (argparse's own code)
+EXIT_NO_DRIVES = 3      # no drive matched the filters
+EXIT_ERROR = 4          # the command itself could not run
+EXIT_INTERRUPTED = 130  # cancelled with Ctrl+C
+
+FORMAT_TABLE = "table"
+FORMAT_JSON = "json"
+FORMAT_JSONL = "jsonl"
+
+DEFAULT_CONCURRENCY = 4
+
+
+def _gb(value):
+    return f"{value:.1f} GB" if isinstance(value, (int, float)) else "N/A"
+
+
+def _mb_s(value):
+    return f"{value:.1f} MB/s" if isinstance(value, (int, float)) else "N/A"
+
+
+def _format_drive(data):
+    return (f"{data.get('model', 'N/A')}  serial {data.get('serial_number', 'N/A')}  "
+            f"{_gb(data.get('total_gb'))}, {_gb(data.get('free_gb'))} free  {data.get('file_system', 'N/A')}")
+
+
+def _spread(result):
+    """Half-width of a result's 95% confidence interval as a plus-minus percentage, or "" if it has none."""
+    confidence = result.get("confidence") or {}
+    spread = confidence.get("half_width_percent")
+    return f" \u00b1{spread:.0f}%" if spread is not None else ""
+
+
+def _format_benchmark(data):
+    if "error" in data:
+        return f"error: {data['error']}"
+    sequential = data.get("sequential", {})
+    write, read = sequential.get('write', {}), sequential.get('read', {})
+    parts = [f"seq write {_mb_s(write.get('speed_mb_s'))}{_spread(write)}",
+             f"seq read {_mb_s(read.get('speed_mb_s'))}{_spread(read)}"]
+    for name, workload in (data.get("random") or {}).items():
+        if isinstance(workload, dict) and "iops" in workload:
+            parts.append(f"{name} {workload['iops']:.0f} IOPS{_spread(workload)}")
+    phases = (data.get("file_operations") or {}).get("phases", {})
+    if phases:
+        parts.append("small files " + ", ".join(f"{op} {phase['ops_per_s']:.0f}/s" for op, phase in phases.items()))
+    calibration = data.get("calibration")
+    if calibration:
+        parts.append(f"took {calibration['total_s']:.0f} s of a {calibration['budget_s']:.0f} s budget")
+    return "  ".join(parts)
+
+
+def _format_health(data):
+    temperature = data.get("temperature")
+    text = f"{data['status']}  SMART {data.get('smart_status', 'Unknown')}"
+    if temperature is not None:
+        text += f"  {temperature} C"
+    for issue in data.get("errors", []) + data.get("warnings", []):
+        text += f"\n    {issue}"
+    return text
+
+
+def _format_capacity(data):
+    verdict = "PASSED" if data["passed"] else "FAILED"
+    if data.get("wrap_bytes") is not None:
+        verdict += f" (writes wrap around at {data['wrap_bytes'] / 1024**3:.2f} GB)"
+    return (f"{verdict}  {data['usable_bytes'] / 1024**3:.2f} GB usable of {data['tested_bytes'] / 1024**3:.2f} GB "
+            f"tested, estimated capacity {data['estimated_capacity_bytes'] / 1024**3:.2f} GB  "
+            f"write {_mb_s(data.get('write_mb_s'))}, read {_mb_s(data.get('read_mb_s'))}")
+
+
+def _format_surface(data):
+    if "error" in data:
+        return f"error: {data['error']}"
+    return (f"{data['bad_regions']} bad, {data['slow_regions']} slow, {data['unscanned_regions']} unscanned "
+            f"of {data['regions']} regions  {_mb_s(data.get('mb_s'))}")
+
+
+def _format_monitor_sample(data):
+    sample = data["data"]
+    if data["probe"] == "usage":
+        usage = sample.get("space_usage") or {}
+        return f"usage {usage.get('percent', 'N/A')}% used"
+    return f"health {sample['status']}" + "".join(f"; {issue}" for issue in sample["warnings"] + sample["errors"])
+
+
+_FORMATTERS = {
+    RECORD_DRIVE: _format_drive,
+    RECORD_DRIVE_REMOVED: lambda data: "removed",
+    RECORD_BENCHMARK: _format_benchmark,
+    RECORD_HEALTH: _format_health,
+    RECORD_CAPACITY_VERIFY: _format_capacity,
+    RECORD_SURFACE_SCAN: _format_surface,
+    RECORD_MONITOR_SAMPLE: _format_monitor_sample,
+}
+
+
+class Output:
+    """Emits records as they arrive: one line each (table or jsonl), or one JSON array at the end.
+
+    With a report path the records are also streamed to a core.export
+    report. Safe to call from worker threads.
+    """
+
+    def __init__(self, output_format=FORMAT_TABLE, report_path=None, stream=None):
+        self.format = output_format
+        self.stream = stream or sys.stdout
+        self.records = []
+        self._lock = threading.Lock()
+        self.report = None
+        if report_path:
+            self.report = ReportWriter(report_path, compress=report_path.endswith('.gz'))
+
+    def emit(self, record_type, drive_letter, data):
+        record = report_record(record_type, drive_letter, data)
+        with self._lock:
+            if self.report is not None:
+                self.report.write(record_type, drive_letter, data)
+            if self.format == FORMAT_JSON:
+                self.records.append(record)
+                return
+            if self.format == FORMAT_JSONL:
+                line = json.dumps(record, default=str)
+            else:
+                line = f"{drive_letter:<12} {record_type:<16} {_FORMATTERS[record_type](data)}"
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self.format == FORMAT_JSON:
+            json.dump(self.records, self.stream, indent=4, default=str)
+            self.stream.write("\n")
+        if self.report is not None:
+            self.report.close()
+
+
+class Progress:
+    """progress_callback(fraction, message) writing one updating line to stderr when it is a terminal."""
+
+    def __init__(self, enabled=True, stream=None):
+        self.stream = stream or sys.stderr
+        self.enabled = enabled and self.stream.isatty()
+        self._lock = threading.Lock()
+
+    def __call__(self, fraction, message):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.stream.write(f"\r\x1b[K{fraction:6.1%} {message}")
+            self.stream.flush()
+
+    def clear(self):
+        if self.enabled:
+            self.stream.write("\r\x1b[K")
+            self.stream.flush()
+
+
+def _normalize_drive(value):
+    # 'e', 'E:' and 'E:\\' all name drive E:; mount points lose a trailing separator
+    value = value.strip()
+    if len(value) <= 3 and value[:1].isalpha() and value[1:] in ("", ":", ":\\", ":/"):
+        return value[0].upper() + ":"
+    return value.rstrip("\\/") or value
+
+
+def matches_filters(details, drives=None, serials=None, models=None):
+    """True if a drive details dict passes the --drive/--serial/--model filters (empty filters match all)."""
+    if drives:
+        names = {_normalize_drive(details["drive_letter"]), _normalize_drive(str(details.get("device", "")))}
+        if not names & {_normalize_drive(drive) for drive in drives}:
+            return False
+    if serials and str(details.get("serial_number", "")).strip() not in serials:
+        return False
+    if models and not any(fnmatch.fnmatch(str(details.get("model", "")).lower(), model.lower()) for model in models):
+        return False
+    return True
+
+
+def select_drives(args):
+    """Drives matching the filters; a --drive naming a directory that is not a listed drive is used as is."""
+    from core.registry import get_drives
+
+    selected = [details for details in get_drives() if matches_filters(details, args.drive, args.serial, args.model)]
+    found = {_normalize_drive(details["drive_letter"]) for details in selected}
+    for drive in args.drive or []:
+        if _normalize_drive(drive) not in found and not args.serial and not args.model and os.path.isdir(drive):
+            # Internal disks and plain directories are not in the registry but can still be tested
+            selected.append({"drive_letter": drive + os.sep if drive.endswith(':') else drive})
+    return selected
+
+
+def _run_per_device(drives, task, concurrency, cancel_event):
+    """Run task(drive) for each drive, volumes of one physical disk one after another, up to concurrency disks at once."""
+    from core.scheduler import physical_device_key
+
+    groups = {}
+    for drive in drives:
+        groups.setdefault(physical_device_key(drive), []).append(drive)
+
+    def run_group(group):
+        for drive in group:
+            if cancel_event.is_set():
+                raise OperationCancelled()
+            task(drive)
+
+    with ThreadPoolExecutor(max(1, concurrency), thread_name_prefix="driveman-cli") as pool:
+        for future in [pool.submit(run_group, group) for group in groups.values()]:
+            future.result()
+
+
+def cmd_list(args, output, progress, cancel_event):
+    drives = select_drives(args)
+    for details in drives:
+        output.emit(RECORD_DRIVE, details["drive_letter"], details)
+    return EXIT_OK if drives else EXIT_NO_DRIVES
+
+
+def cmd_watch(args, output, progress, cancel_event):
+    from core.health_monitor import get_health_monitor
+    from core.hotplug import DRIVE_ADDED
+    from core.registry import drive_registry
+
+    def on_drive_event(event):
+        if event.action == DRIVE_ADDED:
+            if matches_filters(event.details, args.drive, args.serial, args.model):
+                output.emit(RECORD_DRIVE, event.drive_letter, event.details)
+        elif not args.drive or matches_filters({"drive_letter": event.drive_letter}, args.drive):
+            output.emit(RECORD_DRIVE_REMOVED, event.drive_letter, None)
+
+    for details in select_drives(args):
+        output.emit(RECORD_DRIVE, details["drive_letter"], details)
+    drive_registry.add_listener(on_drive_event)
+    drive_registry.watch()
+
+    monitor = None
+    if args.health:
+        monitor = get_health_monitor()
+
+        def on_sample(drive_letter, sample):
+            details = drive_registry.get_drive(drive_letter, max_age=float('inf')) or {"drive_letter": drive_letter}
+            if matches_filters(details, args.drive, args.serial, args.model):
+                output.emit(RECORD_MONITOR_SAMPLE, drive_letter, sample)
+
+        monitor.subscribe(on_sample)
+        monitor.follow_registry(drive_registry)
+        monitor.start()
+    try:
+        cancel_event.wait(args.duration)
+    finally:
+        drive_registry.stop_watching()
+        if monitor is not None:
+            monitor.stop()
+    # Ctrl+C is how a watch normally ends
+    return EXIT_OK
+
+
+def _profile(value):
+    """argparse type for --profile: the compiled plan, so a bad job spec is a usage error before any I/O."""
+    from core.profiles import get_plan
+
+    try:
+        return get_plan(value)
+    except (OSError, ValueError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def cmd_bench(args, output, progress, cancel_event):
+    from core.performance import save_results
+    from core.scheduler import schedule_performance_tests
+
+    drives = select_drives(args)
+    if not drives:
+        return EXIT_NO_DRIVES
+    results = schedule_performance_tests(
+        drives, progress_callback=progress, cancel_event=cancel_event,
+        result_callback=lambda drive_letter, result: output.emit(RECORD_BENCHMARK, drive_letter, result),
+        max_concurrent=args.concurrency, max_per_hub=args.per_hub or None, profile=args.profile,
+        budget_s=args.budget)
+    if args.history:
+        save_results(results, drives)
+
+    def failed(result):
+        # Sequential and random results are keyed by phase name one level down
+        phases = [result] + list(result.values()) + [phase for group in ("sequential", "random")
+                                                     for phase in (result.get(group) or {}).values()]
+        return any(isinstance(phase, dict) and "error" in phase for phase in phases)
+    return EXIT_FAILED if any(failed(result) for result in results.values()) else EXIT_OK
+
+
+def cmd_health(args, output, progress, cancel_event):
+    from core.health import check_drives_health
+
+    drives = select_drives(args)
+    if not drives:
+        return EXIT_NO_DRIVES
+    results = check_drives_health(
+        drives, progress_callback=progress, cancel_event=cancel_event,
+        result_callback=lambda drive_letter, health_status: output.emit(RECORD_HEALTH, drive_letter, health_status),
+        max_workers=args.concurrency, probe_timeout=args.timeout)
+    return EXIT_OK if all(result["status"] == "Healthy" for result in results.values()) else EXIT_FAILED
+
+
+def cmd_verify(args, output, progress, cancel_event):
+    from core.capacity_verify import verify_drive_capacity
+
+    drives = select_drives(args)
+    if not drives:
+        return EXIT_NO_DRIVES
+    summaries = {}
+
+    def verify(drive):
+        summaries[drive["drive_letter"]] = verify_drive_capacity(
+            drive, args.size_mb * 1024 * 1024 if args.size_mb else None, threads=args.threads,
+            progress_callback=lambda fraction, message: progress(fraction, f"{drive['drive_letter']}: {message}"),
+            result_callback=lambda drive_letter, summary: output.emit(RECORD_CAPACITY_VERIFY, drive_letter, summary),
+            cancel_event=cancel_event)
+
+    _run_per_device(drives, verify, args.concurrency, cancel_event)
+    return EXIT_OK if all(summary["passed"] for summary in summaries.values()) else EXIT_FAILED
+
+
+def cmd_surface(args, output, progress, cancel_event):
+    from core.surface_scan import scan_drive_surface
+
+    drives = select_drives(args)
+    if not drives:
+        return EXIT_NO_DRIVES
+    summaries = {}
+
+    def scan(drive):
+        drive_letter = drive["drive_letter"]
+        try:
+            summary = scan_drive_surface(
+                drive, sample=args.sample, cancel_event=cancel_event,
+                progress_callback=lambda fraction, message: progress(fraction, f"{drive_letter}: {message}"))
+        except OSError as e:
+            logging.error(f"Surface scan of {drive_letter} failed: {e}")
+            summary = {"error": str(e)}
+        summaries[drive_letter] = summary
+        output.emit(RECORD_SURFACE_SCAN, drive_letter, summary)
+
+    _run_per_device(drives, scan, args.concurrency, cancel_event)
+    return EXIT_OK if all(not summary.get("error") and not summary["bad_regions"]
+                          for summary in summaries.values()) else EXIT_FAILED
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    filters = common.add_argument_group("drive filters (repeatable; default: every removable/external drive)")
+    filters.add_argument("-d", "--drive", action="append",
+                         help="drive letter, mount point or device; an unlisted directory is tested as is")
+    filters.add_argument("-s", "--serial", action="append", help="disk serial number")
+    filters.add_argument("-m", "--model", action="append", help="disk model, shell wildcards allowed")
+    outputs = common.add_argument_group("output")
+    outputs.add_argument("-f", "--format", choices=(FORMAT_TABLE, FORMAT_JSON, FORMAT_JSONL), default=FORMAT_TABLE,
+                         help="stdout format (default: %(default)s)")
+    outputs.add_argument("-o", "--output", metavar="PATH",
+                         help="also stream records to a JSON Lines report (gzipped if PATH ends in .gz)")
+    outputs.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    outputs.add_argument("-v", "--verbose", action="store_true", help="log to stderr as well as driveman.log")
+
+    parser = argparse.ArgumentParser(
+        prog="driveman", description="Inspect, benchmark and verify removable drives without the GUI.",
+        epilog=f"exit codes: {EXIT_OK} ok, {EXIT_FAILED} a drive failed, {EXIT_USAGE} usage error, "
+               f"{EXIT_NO_DRIVES} no matching drive, {EXIT_ERROR} error, {EXIT_INTERRUPTED} interrupted")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    command = commands.add_parser("list", parents=[common], help="list drives")
+    command.set_defaults(handler=cmd_list)
+
+    command = commands.add_parser("watch", parents=[common], help="report drives as they attach and detach")
+    command.add_argument("--health", action="store_true", help="also run the background health monitor")
+    command.add_argument("--duration", type=float, metavar="SECONDS", help="stop after this long (default: Ctrl+C)")
+    command.set_defaults(handler=cmd_watch)
+
+    command = commands.add_parser("bench", parents=[common], help="benchmark drives")
+    command.add_argument("-j", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                         help="physical disks tested at once (default: %(default)s)")
+    command.add_argument("--per-hub", type=int, default=1, help="disks tested at once behind one USB hub, 0 for no limit")
+    command.add_argument("--no-history", dest="history", action="store_false",
+                         help="do not record results in the history store")
+    command.add_argument("-p", "--profile", type=_profile, default=DEFAULT_PROFILE, metavar="NAME|PATH",
+                         help=f"benchmark profile: {', '.join(list_profiles())}, or a JSON/TOML job spec "
+                              f"(default: %(default)s)")
+    command.add_argument("--budget", type=float, metavar="SECONDS",
+                         help="time per drive for a profile with auto-sized phases (default: the profile's)")
+    command.set_defaults(handler=cmd_bench)
+
+    command = commands.add_parser("health", parents=[common], help="check drive health")
+    command.add_argument("-j", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                         help="drives checked at once (default: %(default)s)")
+    command.add_argument("--timeout", type=float, default=15.0, help="seconds per probe (default: %(default)s)")
+    command.set_defaults(handler=cmd_health)
+
+    command = commands.add_parser("verify", parents=[common], help="detect fake-capacity drives (writes test files)")
+    command.add_argument("-j", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                         help="physical disks verified at once (default: %(default)s)")
+    command.add_argument("--size-mb", type=int, help="test only this much free space")
+    command.add_argument("--threads", type=int, default=2, help="I/O threads per drive (default: %(default)s)")
+    command.set_defaults(handler=cmd_verify)
+
+    command = commands.add_parser("surface", parents=[common], help="read-scan the disk surface")
+    command.add_argument("-j", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                         help="physical disks scanned at once (default: %(default)s)")
+    command.add_argument("--sample", action="store_true", help="read one block per region instead of everything")
+    command.set_defaults(handler=cmd_surface)
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the driveman command; returns the exit code."""
+    args = build_parser().parse_args(argv)
+
+    # Configured before any core module's own basicConfig, which then has no effect
+    logging.basicConfig(filename='driveman.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.verbose:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+        logging.getLogger().addHandler(handler)
+
+    progress = Progress(enabled=not args.quiet)
+    cancel_event = threading.Event()
+    outcome = {}
+
+    def run():
+        try:
+            output = Output(args.format, args.output)
+        except OSError as e:
+            outcome["error"] = e
+            return
+        try:
+            outcome["code"] = args.handler(args, output, progress, cancel_event)
+        except OperationCancelled:
+            outcome["code"] = EXIT_INTERRUPTED
+        except Exception as e:
+            logging.exception(f"driveman {args.command} failed")
+            outcome["error"] = e
+        finally:
+            progress.clear()
+            output.close()
+
+    # The command runs on a worker so Ctrl+C here can cancel it cleanly through cancel_event
+    worker = threading.Thread(target=run, name="driveman-cli-command", daemon=True)
+    worker.start()
+    interrupted = False
+    while worker.is_alive():
+        try:
+            worker.join(0.2)
+        except KeyboardInterrupt:
+            if interrupted:
+                # A second Ctrl+C does not wait for the cleanup
+                return EXIT_INTERRUPTED
+            interrupted = True
+            cancel_event.set()
+            print("Cancelling...", file=sys.stderr)
+
+    if "error" in outcome:
+        print(f"driveman {args.command}: {outcome['error']}", file=sys.stderr)
+        return EXIT_ERROR
+    code = outcome.get("code", EXIT_ERROR)
+    if code == EXIT_NO_DRIVES:
+        print(f"driveman {args.command}: no drive matches the filters", file=sys.stderr)
+    if interrupted and args.command != "watch":
+        return EXIT_INTERRUPTED
+    return code
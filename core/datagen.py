@@ -0,0 +1,165 @@
+# core/datagen.py
+
+import os
+import random
+import struct
+import threading
+import time
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PATTERN_RANDOM = "random"
+PATTERN_ZEROS = "zeros"
+PATTERN_COMPRESSIBLE = "compressible"
+PATTERNS = (PATTERN_RANDOM, PATTERN_ZEROS, PATTERN_COMPRESSIBLE)
+
+GENERATOR = "numpy-pcg64" if numpy is not None else "python-mt19937"
+
+# Distinct data a pattern hands out before windows repeat; generated once per pattern
+DEFAULT_POOL_SIZE = 4 * 1024 * 1024
+# Window starts, compressible runs and stamps are aligned to this, the smallest unit a controller
+# compresses or dedups
+SEGMENT_SIZE = 4096
+_STAMP_MASK = 2**64 - 1
+DEFAULT_COMPRESS_RATIO = 2.0
+# Fibonacci hashing spreads consecutive block indexes over the pool
+_INDEX_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def random_bytes(size, seed):
+    """size pseudo-random bytes from seed: NumPy's PCG64 where available (GB/s), else random.Random."""
+    if numpy is not None:
+        return numpy.random.Generator(numpy.random.PCG64(seed)).bytes(size)
+    return random.Random(seed).randbytes(size)
+
+
+class DataPattern:
+    """Reproducible test data: random, zeros, or compressible to about compress_ratio:1.
+
+    The pool is generated once from the seed; fill() copies a window of it
+    chosen by the block index, so filling a buffer costs a memcpy rather
+    than a PRNG call, and the same (pattern, seed, index) always gives the
+    same bytes. The pool alone holds only pool_size / 4 KiB distinct
+    sectors, so fill() also stamps every 4 KiB segment with a counter from
+    the seed, block index and segment number: no sector repeats between
+    blocks, and a deduplicating controller finds nothing to collapse.
+    Zeros stay unstamped. A compressible pool keeps the first
+    1/compress_ratio of every 4 KiB segment random and zeroes the rest.
+    The pool is read-only after construction, so one pattern serves any
+    number of threads.
+    """
+
+    def __init__(self, pattern=PATTERN_RANDOM, seed=None, compress_ratio=DEFAULT_COMPRESS_RATIO,
+                 pool_size=DEFAULT_POOL_SIZE):
+        if pattern not in PATTERNS:
+            raise ValueError(f"Data pattern must be one of {', '.join(PATTERNS)}, not {pattern!r}")
+        if pattern == PATTERN_COMPRESSIBLE and compress_ratio < 1:
+            raise ValueError("compress_ratio must be at least 1")
+        self.pattern = pattern
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.compress_ratio = compress_ratio if pattern == PATTERN_COMPRESSIBLE else None
+        self.pool_size = max(SEGMENT_SIZE, pool_size - pool_size % SEGMENT_SIZE)
+
+        if pattern == PATTERN_ZEROS:
+            pool = bytearray(self.pool_size)
+        else:
+            pool = bytearray(random_bytes(self.pool_size, self.seed))
+            if pattern == PATTERN_COMPRESSIBLE:
+                keep = round(SEGMENT_SIZE / compress_ratio)
+                zeros = bytes(SEGMENT_SIZE - keep)
+                for offset in range(keep, self.pool_size, SEGMENT_SIZE):
+                    pool[offset:offset + len(zeros)] = zeros
+        # Doubled so any window up to pool_size long is one contiguous slice
+        self._pool = memoryview(bytes(pool + pool))
+
+    def fill(self, buffer, index=0):
+        """Fill buffer with block index's data and return it; buffers longer than the pool wrap around.
+
+        Blocks of one size get distinct sectors for distinct indexes.
+        """
+        view = memoryview(buffer).cast('B')
+        start = (index * _INDEX_MULTIPLIER + self.seed) % (self.pool_size // SEGMENT_SIZE) * SEGMENT_SIZE
+        position, size = 0, len(view)
+        while position < size:
+            chunk = min(size - position, self.pool_size)
+            view[position:position + chunk] = self._pool[start:start + chunk]
+            position += chunk
+            start = (start + chunk) % self.pool_size
+        view.release()
+        return self.stamp(buffer, index)
+
+    def stamp(self, buffer, index):
+        """Overwrite the first 8 bytes of every 4 KiB segment of buffer with a counter unique to (index, segment).
+
+        Cheaper than fill() when a buffer is rewritten many times, such as
+        one random 4 KiB write after another.
+        """
+        size = len(buffer)
+        if self.pattern == PATTERN_ZEROS or size < 8:
+            return buffer
+        segments = max(1, size // SEGMENT_SIZE)
+        first = ((self.seed << 24) + index * segments) & _STAMP_MASK
+        if segments == 1:
+            struct.pack_into('<Q', buffer, 0, first)
+            return buffer
+        with memoryview(buffer) as view, view.cast('B')[:segments * SEGMENT_SIZE].cast('Q') as words:
+            words[::SEGMENT_SIZE // 8] = array('Q', (value & _STAMP_MASK for value in range(first, first + segments)))
+        return buffer
+
+    def block(self, index, size):
+        """bytes of block index, e.g. to check data read back against."""
+        return bytes(self.fill(bytearray(size), index))
+
+    def describe(self):
+        """What a result needs to record to regenerate this data."""
+        description = {"pattern": self.pattern, "seed": self.seed, "generator": GENERATOR}
+        if self.compress_ratio is not None:
+            description["compress_ratio"] = self.compress_ratio
+        return description
+
+
+_patterns = {}
+_patterns_lock = threading.Lock()
+
+
+def get_data_pattern(pattern=PATTERN_RANDOM, seed=None, compress_ratio=DEFAULT_COMPRESS_RATIO):
+    """Return the shared DataPattern for these arguments, generating its pool on first use.
+
+    seed=None gives one pattern per process with a random seed.
+    """
+    key = (pattern, seed, compress_ratio if pattern == PATTERN_COMPRESSIBLE else None)
+    with _patterns_lock:
+        data = _patterns.get(key)
+        if data is None:
+            data = _patterns[key] = DataPattern(pattern, seed, compress_ratio)
+        return data
+
+
+def measure_fill_rate(data, block_size=1024 * 1024, seconds=0.5):
+    """MB/s at which data fills block_size buffers, for comparing against the device being tested."""
+    buffer = bytearray(block_size)
+    index = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        data.fill(buffer, index)
+        index += 1
+    return index * block_size / (1024 * 1024) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print(f"Generator: {GENERATOR}")
+    for name in PATTERNS:
+        started = time.perf_counter()
+        data = DataPattern(name, seed=1)
+        print(f"  {name:13} pool {(time.perf_counter() - started) * 1000:6.1f} ms, "
+              f"fill {measure_fill_rate(data):8.0f} MB/s")
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < 0.5:
+        os.urandom(1024 * 1024)
+        count += 1
+    print(f"  os.urandom                       {count / (time.perf_counter() - started):8.0f} MB/s")
@@ -1,7 +1,4 @@
-import win32api
-import win32file
 import os
-import wmi
 import logging
 import datetime
 import json
@@ -9,8 +6,22 @@ import threading
 import time
 import subprocess
 import psutil
-import pythoncom
-from wmi import x_wmi_invalid_query  # Add this import
+from core.backends import get_backend
+from core.export import RECORD_DRIVE, write_report
+from core.history_store import attach_usage_history
+from core.hotplug import DRIVE_ADDED, HotplugWatcher
+from core.topology import build_wmi_topology, normalize_drive_key
+
+try:
+    # Windows-only dependencies; other platforms go through core.backends
+    import win32api
+    import win32file
+    import wmi
+    import pythoncom
+    from wmi import x_wmi_invalid_query  # Add this import
+except ImportError:
+    win32api = win32file = wmi = pythoncom = None
+    x_wmi_invalid_query = Exception
 
 # Configure logging
 logging.basicConfig(
@@ -45,35 +56,41 @@ def is_external_hdd(disk):
         logging.error(f"Error in external drive detection: {e}")
     return False
 
-def get_wmi_drive_details(drive_letter, w):
-    """Fetch detailed information about a drive using WMI."""
+def _wmi_details_from_entry(disk, logical_disk):
+    """Build the details dict for one disk/logical disk pair."""
+    details = {
+        "model": getattr(disk, 'Model', 'N/A'),
+        "interface_type": getattr(disk, 'InterfaceType', 'N/A'),
+        "serial_number": getattr(disk, 'SerialNumber', 'N/A'),
+        "media_type": getattr(disk, 'MediaType', 'N/A'),
+        "file_system": getattr(logical_disk, 'FileSystem', 'N/A'),
+        "drive_type_wmi": getattr(logical_disk, 'DriveType', 'N/A'),
+        "volume_serial": getattr(logical_disk, 'VolumeSerialNumber', 'N/A'),
+        "driver_version": getattr(disk, 'DriverVersion', 'N/A'),
+        "size_bytes": getattr(disk, 'Size', 0),
+        "status": getattr(disk, 'Status', 'Unknown'),
+        "disk_id": getattr(disk, 'DeviceID', 'N/A'),
+    }
+    details["is_external"] = is_external_hdd(disk)
+    return details
+
+def get_wmi_drive_details(drive_letter, w, topology=None):
+    """Fetch detailed information about a drive using WMI.
+
+    When a topology snapshot from build_wmi_topology() is passed the lookup is
+    answered from it; otherwise a snapshot is built for this single call.
+    """
+    if topology is None:
+        topology = build_wmi_topology(w)
+    entry = topology.get(normalize_drive_key(drive_letter))
+    if entry is None:
+        return {}
     try:
-        for disk in w.Win32_DiskDrive():
-            try:
-                # Use associators() method for better performance
-                for partition in disk.associators("Win32_DiskDriveToDiskPartition"):
-                    for logical_disk in partition.associators("Win32_LogicalDiskToPartition"):
-                        if logical_disk.DeviceID == drive_letter:
-                            details = {
-                                "model": getattr(disk, 'Model', 'N/A'),
-                                "interface_type": getattr(disk, 'InterfaceType', 'N/A'),
-                                "serial_number": getattr(disk, 'SerialNumber', 'N/A'),
-                                "media_type": getattr(disk, 'MediaType', 'N/A'),
-                                "file_system": getattr(logical_disk, 'FileSystem', 'N/A'),
-                                "drive_type_wmi": getattr(logical_disk, 'DriveType', 'N/A'),
-                                "volume_serial": getattr(logical_disk, 'VolumeSerialNumber', 'N/A'),
-                                "driver_version": getattr(disk, 'DriverVersion', 'N/A'),
-                                "size_bytes": getattr(disk, 'Size', 0),
-                                "status": getattr(disk, 'Status', 'Unknown'),
-                            }
-                            details["is_external"] = is_external_hdd(disk)
-                            return details
-            except x_wmi_invalid_query as e:
-                logging.warning(f"WMI invalid query for partition: {e}")
-            except Exception as e:
-                logging.warning(f"Error processing disk {disk.DeviceID}: {e}")
+        return _wmi_details_from_entry(entry["disk"], entry["logical_disk"])
+    except x_wmi_invalid_query as e:
+        logging.warning(f"WMI invalid query for {drive_letter}: {e}")
     except Exception as e:
-        logging.error(f"General WMI error: {e}")
+        logging.warning(f"Error processing disk for {drive_letter}: {e}")
     return {}
 
 def get_win32_drive_details(drive):
@@ -146,7 +163,7 @@ def get_psutil_drive_details(drive):
         logging.warning(f"Error fetching details using psutil for {drive}: {e}")
     return drive_info
 
-def combine_drive_details(drive_letter, w):
+def combine_drive_details(drive_letter, w, topology=None):
     """Consolidate drive details from all available methods."""
     details = {
         "drive_letter": drive_letter,
@@ -165,7 +182,7 @@ def combine_drive_details(drive_letter, w):
     }
     
     # WMI details
-    details.update(get_wmi_drive_details(drive_letter, w))
+    details.update(get_wmi_drive_details(drive_letter, w, topology))
     
     # Fallback to win32api if WMI details are not found
     if not details["model"]:
@@ -182,11 +199,17 @@ def combine_drive_details(drive_letter, w):
     # Fallback to psutil if still no details found
     if not details["model"]:
         details.update(get_psutil_drive_details(drive_letter))
-    
+
+    # Prepend the drive's stored history to the fresh sample
+    attach_usage_history(details)
     return details
 
 def get_removable_and_external_drives_details():
     """Detects removable and external drives and consolidates details."""
+    return get_backend().list_drives()
+
+def scan_win32_drives():
+    """Detects removable and external drives through win32api and WMI."""
     drives_info = []
     drive_strings = win32api.GetLogicalDriveStrings()
     
@@ -195,10 +218,12 @@ def get_removable_and_external_drives_details():
     w = wmi.WMI()
 
     logging.info("Starting drive detection...")
+    # One bulk snapshot answers every per-letter lookup below
+    topology = build_wmi_topology(w)
     for drive in drive_strings.split('\x00'):
         if drive and os.path.isdir(drive):
             try:
-                drive_details = combine_drive_details(drive, w)
+                drive_details = combine_drive_details(drive, w, topology)
 
                 # Additional check for external HDDs
                 if drive_details.get("is_external"):
@@ -212,48 +237,46 @@ def get_removable_and_external_drives_details():
     logging.info("Drive detection completed.")
     return drives_info
 
+def probe_win32_drive(drive):
+    """Consolidates details for one drive, or None if it is not removable/external."""
+    pythoncom.CoInitialize()
+    w = wmi.WMI()
+    details = combine_drive_details(drive, w, build_wmi_topology(w))
+    return details if details.get("is_external") else None
+
 def save_drive_data(data, filename=None):
-    """Saves drive data to a JSON file."""
+    """Streams drive data to a report file; usage history is recorded by the health monitor alone."""
     if not filename:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"drive_data_{timestamp}.json"
+        filename = f"drive_data_{timestamp}.jsonl"
 
     try:
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=4)
+        write_report(filename, ((RECORD_DRIVE, details["drive_letter"], details) for details in data),
+                     compress=filename.endswith('.gz'))
         logging.info(f"Drive data saved to {filename}")
     except Exception as e:
         logging.error(f"Error saving drive data: {e}")
 
-def monitor_drive_changes():
-    """Monitors the system for new drive connections and disconnections."""
-    previous_drives = set(win32api.GetLogicalDriveStrings().split('\x00'))
-
-    while True:
-        try:
-            current_drives = set(win32api.GetLogicalDriveStrings().split('\x00'))
-
-            # Detect newly connected drives
-            new_drives = current_drives - previous_drives
-            if new_drives:
-                logging.info(f"New drives connected: {new_drives}")
-                drives_info = get_removable_and_external_drives_details()
-                for drive in drives_info:
-                    if drive["drive_letter"] in new_drives:
-                        print(json.dumps(drive, indent=4))
+def _print_drive_event(event):
+    """Prints a hotplug event; added drives include their probed details."""
+    if event.action == DRIVE_ADDED:
+        print(json.dumps(event.details, indent=4))
+    else:
+        print(f"Drive disconnected: {event.drive_letter}")
 
-            # Detect disconnected drives
-            removed_drives = previous_drives - current_drives
-            if removed_drives:
-                logging.info(f"Drives disconnected: {removed_drives}")
-
-            previous_drives = current_drives
-            time.sleep(10)  # Check every 5 seconds
-        except KeyboardInterrupt:
-            logging.info("Drive monitoring stopped.")
-            break
-        except Exception as e:
-            logging.error(f"Error monitoring drives: {e}")
+def monitor_drive_changes(stop_event=None):
+    """Monitors the system for new drive connections and disconnections."""
+    watcher = HotplugWatcher()
+    watcher.subscribe(_print_drive_event)
+    # Seeded with the drives already attached, so removing an internal volume is not reported
+    known = [details["drive_letter"] for details in get_removable_and_external_drives_details()]
+    watcher.start(known_drives=known)
+    try:
+        # The watcher thread blocks on OS notifications; just wait here until asked to stop
+        (stop_event or threading.Event()).wait()
+    finally:
+        watcher.stop()
+        logging.info("Drive monitoring stopped.")
 
 if __name__ == "__main__":
     threading.Thread(target=monitor_drive_changes, daemon=True).start()
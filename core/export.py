@@ -0,0 +1,211 @@
+# core/export.py
+
+import gzip
+import json
+import os
+import sys
+import threading
+import zlib
+from array import array
+from datetime import datetime
+
+REPORT_FORMAT = "driveman-report"
+REPORT_VERSION = 1
+# Numeric lists at least this long go to the binary sidecar instead of the JSON line
+ARRAY_THRESHOLD = 64
+
+RECORD_DRIVE = "drive"
+RECORD_BENCHMARK = "benchmark"
+RECORD_HEALTH = "health"
+RECORD_SURFACE_SCAN = "surface_scan"
+RECORD_CAPACITY_VERIFY = "capacity_verify"
+RECORD_DRIVE_REMOVED = "drive_removed"
+RECORD_MONITOR_SAMPLE = "monitor_sample"
+
+
+def _column(value):
+    """Return (typecode, shape, flat values) if value is a bulky numeric list/array, else None."""
+    if isinstance(value, array):
+        return (value.typecode, [len(value)], value) if len(value) >= ARRAY_THRESHOLD else None
+    if not isinstance(value, list) or not value:
+        return None
+    first = value[0]
+    if isinstance(first, list):
+        # Fixed-width rows such as histogram [bucket, count] pairs are stored flattened
+        width = len(first)
+        if width == 0 or len(value) * width < ARRAY_THRESHOLD or \
+                any(not isinstance(row, list) or len(row) != width for row in value):
+            return None
+        flat = [item for row in value for item in row]
+        shape = [len(value), width]
+    else:
+        if len(value) < ARRAY_THRESHOLD:
+            return None
+        flat, shape = value, [len(value)]
+    if all(type(item) is int for item in flat):
+        return 'q', shape, flat
+    if all(type(item) in (int, float) for item in flat):
+        return 'd', shape, flat
+    return None
+
+
+def report_record(record_type, drive_letter, data):
+    """The {"type", "drive_letter", "timestamp", "data"} envelope of one report line."""
+    return {
+        "type": record_type,
+        "drive_letter": drive_letter,
+        "timestamp": datetime.now().isoformat(),
+        "data": data,
+    }
+
+
+class ReportWriter:
+    """Streams report records to a JSON Lines file as they complete.
+
+    Each write() is one line ({"type", "drive_letter", "timestamp", "data"})
+    flushed to the OS, so a crash loses at most the record being written
+    and memory does not grow with the run. Bulky numeric lists and arrays
+    (latency histograms, throughput series, surface maps) are stored as
+    little-endian columns in a "<path>.bin" sidecar and replaced in the
+    JSON by {"$array": {...}} references; the column is written before the
+    line that points at it. With compress=True the lines are gzipped
+    (flushed per record) and each column is zlib-compressed.
+
+    An existing report at path is replaced; append=True resumes it
+    instead, adding records after the existing ones without a second
+    header.
+    """
+
+    def __init__(self, path, compress=False, binary_arrays=True, append=False):
+        self.path = path
+        self.compress = compress
+        self.binary_arrays = binary_arrays
+        self._lock = threading.Lock()
+        resuming = append and os.path.exists(path) and os.path.getsize(path) > 0
+        mode = 'a' if append else 'w'
+        if compress:
+            self._lines = gzip.open(path, mode + 't', encoding='utf-8')
+        else:
+            self._lines = open(path, mode, encoding='utf-8')
+        self.sidecar_path = None
+        self._sidecar = None
+        if binary_arrays:
+            self.sidecar_path = path + ".bin"
+            self._sidecar = open(self.sidecar_path, mode + 'b')
+        if resuming:
+            return
+        self.write("header", None, {
+            "format": REPORT_FORMAT,
+            "version": REPORT_VERSION,
+            "arrays": os.path.basename(self.sidecar_path) if self.sidecar_path else None,
+        })
+
+    def _store_column(self, typecode, shape, values):
+        column = values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)
+        if sys.byteorder != 'little':
+            column = array(typecode, column)
+            column.byteswap()
+        payload = column.tobytes()
+        reference = {"typecode": typecode, "shape": shape, "offset": self._sidecar.tell()}
+        if self.compress:
+            payload = zlib.compress(payload, 6)
+            reference["codec"] = "zlib"
+        reference["nbytes"] = len(payload)
+        self._sidecar.write(payload)
+        return {"$array": reference}
+
+    def _externalize(self, value):
+        if self._sidecar is not None:
+            column = _column(value)
+            if column is not None:
+                return self._store_column(*column)
+        if isinstance(value, dict):
+            return {str(key): self._externalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._externalize(item) for item in value]
+        if isinstance(value, array):
+            return value.tolist()
+        return value
+
+    def write(self, record_type, drive_letter, data):
+        """Append one record and flush it (columns first, then the JSON line)."""
+        with self._lock:
+            data = self._externalize(data)
+            if self._sidecar is not None:
+                self._sidecar.flush()
+            record = report_record(record_type, drive_letter, data)
+            self._lines.write(json.dumps(record, default=str) + "\n")
+            self._lines.flush()
+
+    def close(self):
+        with self._lock:
+            self._lines.close()
+            if self._sidecar is not None:
+                self._sidecar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _load_column(sidecar, reference):
+    sidecar.seek(reference["offset"])
+    payload = sidecar.read(reference["nbytes"])
+    if reference.get("codec") == "zlib":
+        payload = zlib.decompress(payload)
+    column = array(reference["typecode"])
+    column.frombytes(payload)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    values = column.tolist()
+    if len(reference["shape"]) == 2:
+        width = reference["shape"][1]
+        return [values[index:index + width] for index in range(0, len(values), width)]
+    return values
+
+
+def _resolve(value, sidecar):
+    if isinstance(value, dict):
+        if "$array" in value and len(value) == 1:
+            return _load_column(sidecar, value["$array"]) if sidecar is not None else value
+        return {key: _resolve(item, sidecar) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, sidecar) for item in value]
+    return value
+
+
+def iter_report(path, load_arrays=True):
+    """Yield the records of a report written by ReportWriter, one at a time.
+
+    A report cut short by a crash yields every complete record; with
+    load_arrays, {"$array"} references are read back from the sidecar.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    sidecar_path = path + ".bin"
+    sidecar = open(sidecar_path, 'rb') if load_arrays and os.path.exists(sidecar_path) else None
+    try:
+        with opener(path, 'rt', encoding='utf-8') as lines:
+            try:
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # The line being written when the run was interrupted
+                        break
+                    yield _resolve(record, sidecar)
+            except EOFError:
+                # A gzip stream that was never closed ends without its trailer
+                return
+    finally:
+        if sidecar is not None:
+            sidecar.close()
+
+
+def write_report(path, records, compress=False, binary_arrays=True):
+    """Write (record_type, drive_letter, data) tuples to a new report at path, replacing any existing one."""
+    with ReportWriter(path, compress, binary_arrays) as writer:
+        for record_type, drive_letter, data in records:
+            writer.write(record_type, drive_letter, data)
+    return path
@@ -1,18 +1,50 @@
 # core/health.py
 
 import logging
-import wmi
-import win32api
-import win32file
-from subprocess import run, PIPE
+from subprocess import run, PIPE, TimeoutExpired
 import os
-import psutil
-import winreg
-from ctypes import *
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from core.backends import get_backend
+from core.cancellation import check_cancelled
+from core.query_session import get_wmi_sessions
+from core.smart import decode_smart_page, smart_cache, smart_page_from_hex, smart_warnings, \
+    temperature_from_attributes
 
-def check_drive_health(drive_letter):
-    """Comprehensive drive health check."""
+DEFAULT_HEALTH_WORKERS = 4
+PROBE_TIMEOUT_S = 15.0
+# defrag /A walks the whole volume bitmap; it gets longer, and is killed when it expires
+DEFRAG_TIMEOUT_S = 60.0
+
+def _run_probe(name, probe, drive_letter, timeout, health_status):
+    """Run one probe on a daemon thread so a hung device or provider cannot stall the check."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["value"] = probe(drive_letter)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name=f"driveman-health-{name}", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        health_status["warnings"].append(f"{name} probe timed out after {timeout:.0f}s")
+        return None
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("value")
+
+def read_smart_snapshot(drive_letter, max_age=None):
+    """Return the drive's decoded SMART snapshot (with deltas), from the per-serial cache when fresh."""
+    backend = get_backend()
+    serial = backend.disk_serial(drive_letter) or drive_letter
+    return smart_cache.get(serial, lambda: backend.smart_attributes(drive_letter), max_age)
+
+def check_drive_health(drive_letter, probe_timeout=PROBE_TIMEOUT_S):
+    """Comprehensive drive health check; each probe gives up after probe_timeout seconds."""
     health_status = {
         "status": "Unknown",
         "smart_status": "Unknown",
@@ -25,32 +57,40 @@ def check_drive_health(drive_letter):
     }
     
     try:
-        # Basic drive checks
-        if not win32file.GetDriveType(drive_letter):
+        backend = get_backend()
+
+        # Basic drive checks and space usage
+        usage = backend.volume_stats(drive_letter)
+        if usage is None:
             health_status["errors"].append("Drive not accessible")
             return health_status
-
-        # Space usage
-        usage = psutil.disk_usage(drive_letter)
-        health_status["space_usage"] = {
-            "total": usage.total,
-            "used": usage.used,
-            "free": usage.free,
-            "percent": usage.percent
-        }
+        health_status["space_usage"] = usage
 
         # SMART status
-        health_status["smart_attributes"] = get_smart_attributes(drive_letter)
+        smart = _run_probe("SMART", read_smart_snapshot, drive_letter, probe_timeout, health_status)
+        health_status["smart_attributes"] = smart
+        if smart is None:
+            health_status["smart_status"] = "Unavailable"
+        else:
+            health_status["smart_deltas"] = smart["deltas"]
+            smart_issues = smart_warnings(smart)
+            health_status["warnings"].extend(smart_issues)
+            health_status["smart_status"] = "Warning" if smart_issues else "OK"
         
         # Temperature
-        health_status["temperature"] = check_disk_temperature(drive_letter)
+        health_status["temperature"] = _run_probe(
+            "Temperature", backend.temperature, drive_letter, probe_timeout, health_status)
+        if health_status["temperature"] is None and smart is not None:
+            health_status["temperature"] = temperature_from_attributes(smart["attributes"])
         
         # Fragmentation
-        health_status["fragmentation"] = check_fragmentation(drive_letter)
+        health_status["fragmentation"] = _run_probe(
+            "Fragmentation", backend.fragmentation, drive_letter, max(probe_timeout, DEFRAG_TIMEOUT_S + 5),
+            health_status)
 
         # Overall status assessment
         if not health_status["errors"]:
-            if usage.percent > 90:
+            if usage["percent"] > 90:
                 health_status["warnings"].append("Low disk space")
             if health_status["temperature"] and health_status["temperature"] > 50:
                 health_status["warnings"].append("High temperature")
@@ -63,48 +103,80 @@ def check_drive_health(drive_letter):
 
     return health_status
 
+def check_drives_health(drives, progress_callback=None, result_callback=None, cancel_event=None,
+                        max_workers=DEFAULT_HEALTH_WORKERS, probe_timeout=PROBE_TIMEOUT_S):
+    """Run check_drive_health on up to max_workers drives at once, reporting results as they complete."""
+    health_results = {}
+    if not drives:
+        return health_results
+    executor = ThreadPoolExecutor(max_workers, thread_name_prefix="driveman-health")
+    try:
+        futures = {executor.submit(check_drive_health, drive['drive_letter'], probe_timeout): drive['drive_letter']
+                   for drive in drives}
+        if progress_callback:
+            progress_callback(0.0, f"Checking health of {len(drives)} drives")
+        for future in as_completed(futures):
+            check_cancelled(cancel_event)
+            drive_letter = futures[future]
+            health_results[drive_letter] = future.result()
+            if progress_callback:
+                progress_callback(len(health_results) / len(drives), f"Checked health of {drive_letter}")
+            if result_callback:
+                result_callback(drive_letter, health_results[drive_letter])
+    finally:
+        # Checks not yet started are dropped on cancel; running ones are bounded by probe_timeout
+        executor.shutdown(wait=False, cancel_futures=True)
+    return health_results
+
 def monitor_drive_health(drive_letter, interval_minutes=60):
-    """Monitor drive health periodically."""
-    # Implementation for periodic health monitoring
-    pass
+    """Monitor drive health periodically on the shared background monitor, which is returned."""
+    from core.health_monitor import get_health_monitor
+
+    monitor = get_health_monitor()
+    monitor.add_drive(drive_letter, health_interval=interval_minutes * 60)
+    monitor.start()
+    return monitor
+
+def _query_smart_data(connect):
+    return [(item.InstanceName, bytes(item.VendorSpecific))
+            for item in connect("root\\wmi").MSStorageDriver_ATAPISmartData()]
 
-def get_smart_attributes(drive_letter):
-    """Get SMART attributes for the drive."""
+def get_smart_attributes(drive_letter, pnp_device_id=None, timeout=PROBE_TIMEOUT_S):
+    """Get the raw SMART attribute page of the disk whose PNPDeviceID is given."""
     try:
-        # Using PowerShell to get SMART data
-        cmd = f"Get-WmiObject -Namespace root\\wmi -Class MSStorageDriver_ATAPISmartData | Select-Object VendorSpecific"
-        result = run(['powershell', '-Command', cmd], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return parse_smart_data(result.stdout)
-        return None
+        # Queried on the shared WMI session instead of a PowerShell process per drive
+        smart_data = get_wmi_sessions().call(_query_smart_data, timeout)
+        # InstanceName is the disk's PNPDeviceID with an instance suffix ("..._0")
+        if pnp_device_id:
+            smart_data = [(name, page) for name, page in smart_data
+                          if name.upper().startswith(pnp_device_id.upper())]
+        if len(smart_data) != 1:
+            logging.info(f"No unique SMART data instance for {drive_letter} ({len(smart_data)} found)")
+            return None
+        return smart_data[0][1]
     except Exception as e:
         logging.error(f"Error getting SMART attributes: {e}")
         return None
 
-def check_disk_temperature(drive_letter):
+def _query_thermal_zones(connect):
+    return [item.CurrentTemperature for item in connect("root\\wmi").MSAcpi_ThermalZoneTemperature()]
+
+def check_disk_temperature(drive_letter, timeout=PROBE_TIMEOUT_S):
     """Check disk temperature using SMART data."""
     try:
-        cmd = f"wmic /namespace:\\\\root\\wmi path MSAcpi_ThermalZoneTemperature get CurrentTemperature"
-        result = run(cmd.split(), capture_output=True, text=True)
-        if result.returncode == 0:
-            temp = float(result.stdout.split('\n')[1])
-            return (temp / 10.0) - 273.15  # Convert to Celsius
+        temperatures = get_wmi_sessions().call(_query_thermal_zones, timeout)
+        if temperatures:
+            return (float(temperatures[0]) / 10.0) - 273.15  # Convert to Celsius
         return None
     except Exception as e:
         logging.error(f"Error checking disk temperature: {e}")
         return None
 
 def parse_smart_data(smart_data):
-    """Parse SMART data from the output."""
-    # Implement the parsing logic here
-    parsed_data = {}
-    # Example parsing logic (to be replaced with actual logic)
-    lines = smart_data.splitlines()
-    for line in lines:
-        if "VendorSpecific" in line:
-            parsed_data["VendorSpecific"] = line.split(":")[1].strip()
-    return parsed_data
+    """Decode a SMART attribute page given as bytes, a list of ints or a captured hex dump."""
+    if isinstance(smart_data, str):
+        smart_data = smart_page_from_hex(smart_data)
+    return decode_smart_page(bytes(smart_data))
 
 def parse_defrag_output(output):
     """Parse defrag command output to extract fragmentation percentage."""
@@ -122,11 +194,14 @@ def check_fragmentation(drive_letter):
     """Check drive fragmentation level."""
     try:
         cmd = f"defrag {drive_letter} /A"
-        result = run(cmd.split(), capture_output=True, text=True)
+        result = run(cmd.split(), capture_output=True, text=True, timeout=DEFRAG_TIMEOUT_S)
         if result.returncode == 0:
             # Parse the output to get fragmentation percentage
             return parse_defrag_output(result.stdout)
         return None
+    except TimeoutExpired:
+        logging.warning(f"defrag /A on {drive_letter} killed after {DEFRAG_TIMEOUT_S:.0f}s")
+        return None
     except Exception as e:
         logging.error(f"Error checking fragmentation: {e}")
         return None
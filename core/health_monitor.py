@@ -0,0 +1,315 @@
+# core/health_monitor.py
+
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from core.backends import get_backend
+from core.health import PROBE_TIMEOUT_S, check_drive_health
+from core.history_store import get_history_store
+from core.hotplug import DRIVE_ADDED
+
+PROBE_USAGE = "usage"      # volume stats and I/O counters: a few cheap syscalls
+PROBE_HEALTH = "health"    # SMART, temperature and fragmentation
+
+# (base, minimum, maximum) seconds between two probes of one drive
+PROBE_INTERVALS = {
+    PROBE_USAGE: (60.0, 15.0, 15 * 60.0),
+    PROBE_HEALTH: (3600.0, 10 * 60.0, 6 * 3600.0),
+}
+# A degraded drive is probed this much more often; an idle healthy one backs off by IDLE_BACKOFF per probe
+DEGRADED_FACTOR = 0.25
+IDLE_BACKOFF = 2.0
+LOW_SPACE_PERCENT = 90
+
+RING_SIZE = 1440            # a day of per-minute samples per drive
+HISTORY_FLUSH_S = 300.0
+# stop() waits this long; a health probe in flight can take its full probe timeouts
+STOP_TIMEOUT_S = 2.0
+
+
+class _MonitoredDrive:
+    def __init__(self, drive_letter, intervals, ring_size):
+        self.drive_letter = drive_letter
+        self.base_intervals = intervals
+        self.intervals = {probe: base for probe, (base, _, _) in intervals.items()}
+        self.samples = deque(maxlen=ring_size)
+        # probe -> (due, sequence) of its live heap entry; older entries are dropped when they come due
+        self.pending = {}
+        self.disk = None
+        self.serial = None
+        self.last_counters = None
+        self.last_usage_time = None
+        self.idle = False
+        self.low_space = False
+        self.unhealthy = False
+
+    @property
+    def degraded(self):
+        return self.low_space or self.unhealthy
+
+
+class HealthMonitor:
+    """Monitors all attached drives from one background thread.
+
+    Probes sit in a heap ordered by due time and the thread sleeps on an
+    Event until the earliest one, so an idle monitor costs one wakeup per
+    due probe and nothing in between. Cheap usage probes run every minute,
+    full health checks hourly; a degraded drive (warnings, errors, low
+    space) is probed DEGRADED_FACTOR times the base interval, and a healthy
+    drive with no I/O since its last probe backs off up to the maximum.
+    Each probe type adapts only its own interval when it runs; a drive
+    that turns degraded has its queued health probe brought forward.
+
+    Samples go to a bounded ring buffer per drive and are appended to the
+    history store (core.history_store, keyed by disk serial) in one
+    transaction every flush_interval seconds; pass record_history=False to
+    keep them in memory only.
+    """
+
+    def __init__(self, backend=None, ring_size=RING_SIZE, record_history=True, history_store=None,
+                 flush_interval=HISTORY_FLUSH_S, probe_timeout=PROBE_TIMEOUT_S):
+        self.backend = backend
+        self.ring_size = ring_size
+        self.record_history = record_history
+        self.history_store = history_store
+        self.flush_interval = flush_interval
+        self.probe_timeout = probe_timeout
+        self._drives = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = None
+        self._thread = None
+        self._subscribers = []
+        self._pending_history = []
+
+    def subscribe(self, callback):
+        """Call callback(drive_letter, sample) from the monitor thread; returns an unsubscribe function."""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def add_drive(self, drive_letter, health_interval=None):
+        """Start monitoring a drive (health_interval overrides the base full-check interval in seconds)."""
+        intervals = dict(PROBE_INTERVALS)
+        if health_interval is not None:
+            _, minimum, maximum = intervals[PROBE_HEALTH]
+            intervals[PROBE_HEALTH] = (health_interval, min(minimum, health_interval), max(maximum, health_interval))
+        with self._lock:
+            if drive_letter in self._drives:
+                return
+            drive = self._drives[drive_letter] = _MonitoredDrive(drive_letter, intervals, self.ring_size)
+            # Usage is sampled right away; the first full check waits a whole interval
+            now = time.monotonic()
+            self._schedule(drive, PROBE_USAGE, now, delay=0.0)
+            self._schedule(drive, PROBE_HEALTH, now)
+        self._wakeup.set()
+
+    def remove_drive(self, drive_letter):
+        """Stop monitoring a drive; its queued probes are discarded when they come due."""
+        with self._lock:
+            self._drives.pop(drive_letter, None)
+
+    def drives(self):
+        with self._lock:
+            return list(self._drives)
+
+    def history(self, drive_letter):
+        """Return the in-memory samples of a drive, oldest first."""
+        with self._lock:
+            drive = self._drives.get(drive_letter)
+            return list(drive.samples) if drive else []
+
+    def follow_registry(self, registry):
+        """Monitor every drive in a core.registry.DriveRegistry, tracking hotplug events."""
+        for details in registry.get_drives():
+            self.add_drive(details["drive_letter"])
+        registry.add_listener(self._on_drive_event)
+
+    def _on_drive_event(self, event):
+        if event.action == DRIVE_ADDED:
+            self.add_drive(event.drive_letter)
+        else:
+            self.remove_drive(event.drive_letter)
+
+    def _schedule(self, drive, probe, now, delay=None):
+        delay = drive.intervals[probe] if delay is None else delay
+        entry = (now + delay, next(self._sequence), probe, drive)
+        drive.pending[probe] = entry[:2]
+        heapq.heappush(self._heap, entry)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        # Each run has its own stop flag, so a thread still finishing a probe after stop() never resumes
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,), name="driveman-health-monitor",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=STOP_TIMEOUT_S):
+        """Stop the monitor thread, waiting at most timeout seconds; it flushes the history as it exits."""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        self._stop_event.set()
+        self._wakeup.set()
+        thread.join(timeout)
+        if thread.is_alive():
+            logging.warning("Health monitor is still finishing a probe; it will stop once the probe returns")
+
+    def _run(self, stop_event):
+        if self.backend is None:
+            self.backend = get_backend()
+        next_flush = time.monotonic() + self.flush_interval
+        while not stop_event.is_set():
+            now = time.monotonic()
+            due = []
+            with self._lock:
+                while self._heap and self._heap[0][0] <= now:
+                    due_at, sequence, probe, drive = heapq.heappop(self._heap)
+                    # Entries of removed drives, and ones superseded by a reschedule, are dropped lazily here
+                    if self._drives.get(drive.drive_letter) is drive and drive.pending.get(probe) == (due_at, sequence):
+                        due.append((probe, drive))
+
+            counters = None
+            for probe, drive in due:
+                if stop_event.is_set():
+                    break
+                was_degraded = drive.degraded
+                if probe == PROBE_USAGE:
+                    if counters is None:
+                        counters = self._io_counters()
+                    data = self._probe_usage(drive, counters)
+                else:
+                    data = self._probe_health(drive)
+                self._adapt(drive, probe)
+                with self._lock:
+                    if self._drives.get(drive.drive_letter) is drive:
+                        now = time.monotonic()
+                        self._schedule(drive, probe, now)
+                        if drive.degraded and not was_degraded and probe != PROBE_HEALTH:
+                            # The health probe queued while the drive was fine may be hours out
+                            self._adapt(drive, PROBE_HEALTH)
+                            if now + drive.intervals[PROBE_HEALTH] < drive.pending[PROBE_HEALTH][0]:
+                                self._schedule(drive, PROBE_HEALTH, now)
+                self._record(drive, probe, data)
+
+            now = time.monotonic()
+            if now >= next_flush:
+                self._flush_history()
+                next_flush = now + self.flush_interval
+            with self._lock:
+                next_due = self._heap[0][0] if self._heap else next_flush
+            self._wakeup.wait(max(0.0, min(next_due, next_flush) - time.monotonic()))
+            self._wakeup.clear()
+        # Flushed here rather than by stop(), which does not wait for a probe in flight
+        self._flush_history()
+
+    def _io_counters(self):
+        try:
+            return self.backend.io_counters()
+        except Exception as e:
+            logging.warning(f"Health monitor could not read I/O counters: {e}")
+            return {}
+
+    def _probe_usage(self, drive, counters):
+        try:
+            usage = self.backend.volume_stats(drive.drive_letter)
+        except Exception as e:
+            logging.warning(f"Health monitor usage probe of {drive.drive_letter} failed: {e}")
+            usage = None
+        if usage is not None:
+            drive.low_space = usage["percent"] > LOW_SPACE_PERCENT
+
+        if drive.disk is None:
+            try:
+                drive.disk = self.backend.disk_for_volume(drive.drive_letter)
+                drive.serial = self.backend.disk_serial(drive.drive_letter)
+            except Exception as e:
+                logging.warning(f"Health monitor could not map {drive.drive_letter} to a disk: {e}")
+        current = counters.get(drive.disk) if drive.disk else None
+        now = time.monotonic()
+        io = None
+        if current is not None and drive.last_counters is not None:
+            elapsed = now - drive.last_usage_time
+            io = {key: (current[key] - drive.last_counters[key]) / elapsed
+                  for key in ("read_bytes", "write_bytes", "read_count", "write_count")}
+            drive.idle = not any(io.values())
+        drive.last_counters, drive.last_usage_time = current, now
+        return {"space_usage": usage, "io_per_s": io}
+
+    def _probe_health(self, drive):
+        health_status = check_drive_health(drive.drive_letter, self.probe_timeout)
+        drive.unhealthy = health_status["status"] != "Healthy" or bool(health_status["warnings"])
+        return health_status
+
+    def _adapt(self, drive, probe):
+        base, minimum, maximum = drive.base_intervals[probe]
+        if drive.degraded:
+            drive.intervals[probe] = max(minimum, base * DEGRADED_FACTOR)
+        elif drive.idle:
+            drive.intervals[probe] = min(maximum, max(base, drive.intervals[probe]) * IDLE_BACKOFF)
+        else:
+            drive.intervals[probe] = base
+
+    def _record(self, drive, probe, data):
+        now = time.time()
+        sample = {
+            "time": now,
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "drive_letter": drive.drive_letter,
+            "probe": probe,
+            "next_in_s": drive.intervals[probe],
+            "data": data,
+        }
+        with self._lock:
+            drive.samples.append(sample)
+            if self.record_history:
+                self._pending_history.append((drive.serial or drive.drive_letter, sample))
+        for callback in list(self._subscribers):
+            try:
+                callback(drive.drive_letter, sample)
+            except Exception as e:
+                logging.error(f"Error in health monitor subscriber {callback}: {e}")
+
+    def _flush_history(self):
+        with self._lock:
+            pending, self._pending_history = self._pending_history, []
+        if not pending:
+            return
+        usage, health = [], []
+        for serial, sample in pending:
+            data = sample["data"]
+            if sample["probe"] == PROBE_USAGE:
+                if data["space_usage"]:
+                    space = data["space_usage"]
+                    usage.append((serial, space["total"], space["used"], space["free"], sample["time"]))
+            else:
+                health.append((serial, sample["drive_letter"], data, sample["time"]))
+        try:
+            if self.history_store is None:
+                self.history_store = get_history_store()
+            self.history_store.record_usage_many(usage)
+            self.history_store.record_health_many(health)
+        except sqlite3.Error as e:
+            logging.error(f"Error writing health history: {e}")
+
+
+_health_monitor = None
+_health_monitor_lock = threading.Lock()
+
+
+def get_health_monitor():
+    """Return the process-wide health monitor, creating it on first use."""
+    global _health_monitor
+    with _health_monitor_lock:
+        if _health_monitor is None:
+            _health_monitor = HealthMonitor()
+        return _health_monitor
@@ -0,0 +1,143 @@
+# core/histogram.py
+
+from array import array
+
+DEFAULT_PRECISION_BITS = 6        # 32-64 sub-buckets per power of two: <= ~1.6% relative error
+DEFAULT_MAX_VALUE_BITS = 44       # ~4.9 hours in nanoseconds
+REPORTED_PERCENTILES = (50, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+    """Fixed-memory, log-bucketed latency histogram in the style of HdrHistogram.
+
+    Values below 2**precision_bits are counted exactly; above that every
+    power of two is split into 2**(precision_bits - 1) linear sub-buckets.
+    Counts live in one preallocated array('Q'), so record() only does integer
+    arithmetic and one array increment. Each thread records into its own
+    histogram and the results are combined with merge().
+    """
+
+    def __init__(self, precision_bits=DEFAULT_PRECISION_BITS, max_value_bits=DEFAULT_MAX_VALUE_BITS):
+        self.precision_bits = precision_bits
+        self.max_value_bits = max_value_bits
+        self._sub_count = 1 << precision_bits
+        self._half = self._sub_count >> 1
+        self.max_value = (1 << max_value_bits) - 1
+        bucket_count = self._sub_count + (max_value_bits - precision_bits) * self._half
+        self.counts = array('Q', bytes(8 * bucket_count))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value):
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return self._sub_count + (shift - 1) * self._half + (value >> shift) - self._half
+
+    def _value_at(self, index):
+        """Lowest value that maps to bucket index."""
+        if index < self._sub_count:
+            return index
+        shift = (index - self._sub_count) // self._half + 1
+        return ((index - self._sub_count) % self._half + self._half) << shift
+
+    def record(self, value):
+        """Record one latency (non-negative int, usually nanoseconds); out-of-range values are clamped."""
+        if value >= self._sub_count:
+            if value > self.max_value:
+                value = self.max_value
+            shift = value.bit_length() - self.precision_bits
+            self.counts[self._sub_count + (shift - 1) * self._half + (value >> shift) - self._half] += 1
+        else:
+            if value < 0:
+                value = 0
+            self.counts[value] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value < self._min:
+            self._min = value
+
+    @property
+    def min(self):
+        return self._min if self.count else None
+
+    @min.setter
+    def min(self, value):
+        self._min = self.max_value + 1 if value is None else value
+
+    def merge(self, other):
+        """Add other's counts into this histogram (both must share the same layout)."""
+        if (other.precision_bits, other.max_value_bits) != (self.precision_bits, self.max_value_bits):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self._min = min(self._min, other._min)
+        return self
+
+    def percentile(self, percentile):
+        """Return the value at the given percentile (0-100), or None when empty."""
+        if not self.count:
+            return None
+        target = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                # Report the bucket's upper edge, never exceeding the largest value recorded
+                return min(self._value_at(index + 1) - 1, self.max)
+        return self.max
+
+    def summary(self, scale=1e6, percentiles=REPORTED_PERCENTILES):
+        """Return {"p50": ..., "mean", "min", "max"} divided by scale (ns -> ms by default)."""
+        if not self.count:
+            return {}
+        result = {f"p{p:g}": self.percentile(p) / scale for p in percentiles}
+        result.update({
+            "mean": self.total / self.count / scale,
+            "min": self.min / scale,
+            "max": self.max / scale,
+        })
+        return result
+
+    def to_dict(self):
+        """Serialize to a JSON-friendly dict with sparse [bucket, count] pairs."""
+        return {
+            "unit": "ns",
+            "precision_bits": self.precision_bits,
+            "max_value_bits": self.max_value_bits,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "buckets": [[index, count] for index, count in enumerate(self.counts) if count],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["precision_bits"], data["max_value_bits"])
+        for index, count in data["buckets"]:
+            histogram.counts[index] = count
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+def merge_histograms(histograms):
+    """Merge an iterable of histograms into a new one."""
+    merged = None
+    for histogram in histograms:
+        if merged is None:
+            merged = LatencyHistogram(histogram.precision_bits, histogram.max_value_bits)
+        merged.merge(histogram)
+    return merged if merged is not None else LatencyHistogram()
@@ -0,0 +1,216 @@
+# core/history_store.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from core.app_data import DATA_DIR
+
+HISTORY_DB_PATH = os.path.join(DATA_DIR, "driveman_history.db")
+
+# Usage samples are kept raw for RAW_USAGE_DAYS, then hourly until HOURLY_USAGE_DAYS, then daily
+RAW_USAGE_DAYS = 7
+HOURLY_USAGE_DAYS = 90
+HEALTH_RETENTION_DAYS = 90
+BENCHMARK_RETENTION_DAYS = 2 * 365
+DEFAULT_USAGE_HISTORY_DAYS = 30
+
+_DAY = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    serial TEXT NOT NULL,
+    ts REAL NOT NULL,
+    total INTEGER,
+    used INTEGER,
+    free INTEGER,
+    resolution INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (serial, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS benchmarks (
+    id INTEGER PRIMARY KEY,
+    serial TEXT NOT NULL,
+    ts REAL NOT NULL,
+    drive_letter TEXT,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS benchmarks_serial_ts ON benchmarks (serial, ts);
+CREATE TABLE IF NOT EXISTS health (
+    id INTEGER PRIMARY KEY,
+    serial TEXT NOT NULL,
+    ts REAL NOT NULL,
+    drive_letter TEXT,
+    status TEXT,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS health_serial_ts ON health (serial, ts);
+"""
+
+
+def drive_key(details):
+    """History key of a drive: its disk serial number, or the drive letter if the disk reports none."""
+    serial = str(details.get("serial_number") or '').strip()
+    return serial if serial and serial != 'N/A' else details["drive_letter"]
+
+
+class HistoryStore:
+    """Append-only drive history in one SQLite database (WAL mode), keyed by disk serial.
+
+    Usage samples are (serial, ts) rows in a WITHOUT ROWID table, so a range
+    query such as "last 30 days of free space" is a single index range
+    scan; benchmark and health results are stored as JSON next to an
+    indexed (serial, ts). compact() downsamples old usage samples and
+    applies retention. Timestamps are Unix epoch seconds. read_only opens an
+    existing database without creating or changing anything.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH, read_only=False):
+        self.path = path
+        self._lock = threading.Lock()
+        if read_only:
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL is crash-safe and avoids an fsync per append
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, parameters=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, parameters).fetchall()
+
+    def record_usage(self, serial, total, used, free, timestamp=None):
+        self.record_usage_many([(serial, total, used, free, timestamp)])
+
+    def record_usage_many(self, rows):
+        """Append (serial, total, used, free, timestamp or None) samples in one transaction."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO usage (serial, ts, total, used, free) VALUES (?, ?, ?, ?, ?)",
+                [(serial, now if ts is None else ts, total, used, free) for serial, total, used, free, ts in rows])
+
+    def usage_range(self, serial, start=None, end=None):
+        """Return usage samples of serial between start and end (epoch seconds), oldest first."""
+        rows = self._execute(
+            "SELECT ts, total, used, free, resolution FROM usage WHERE serial = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (serial, start if start is not None else 0, end if end is not None else time.time() + _DAY))
+        return [{"timestamp": ts, "total": total, "used": used, "free": free, "resolution": resolution}
+                for ts, total, used, free, resolution in rows]
+
+    def record_benchmark(self, serial, drive_letter, result, timestamp=None):
+        self._execute("INSERT INTO benchmarks (serial, ts, drive_letter, result) VALUES (?, ?, ?, ?)",
+                      (serial, time.time() if timestamp is None else timestamp, drive_letter,
+                       json.dumps(result, default=str)))
+
+    def benchmarks(self, serial, start=None, end=None, limit=None):
+        """Return benchmark results of serial, newest first."""
+        rows = self._execute(
+            "SELECT ts, drive_letter, result FROM benchmarks WHERE serial = ? AND ts >= ? AND ts <= ? "
+            "ORDER BY ts DESC LIMIT ?",
+            (serial, start if start is not None else 0, end if end is not None else time.time() + _DAY,
+             -1 if limit is None else limit))
+        return [{"timestamp": ts, "drive_letter": drive_letter, "result": json.loads(result)}
+                for ts, drive_letter, result in rows]
+
+    def record_health_many(self, rows):
+        """Append (serial, drive_letter, health_status, timestamp or None) results in one transaction."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO health (serial, ts, drive_letter, status, result) VALUES (?, ?, ?, ?, ?)",
+                [(serial, now if ts is None else ts, drive_letter, status.get("status"), json.dumps(status, default=str))
+                 for serial, drive_letter, status, ts in rows])
+
+    def health_range(self, serial, start=None, end=None):
+        """Return health check results of serial, oldest first."""
+        rows = self._execute(
+            "SELECT ts, drive_letter, result FROM health WHERE serial = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (serial, start if start is not None else 0, end if end is not None else time.time() + _DAY))
+        return [{"timestamp": ts, "drive_letter": drive_letter, "result": json.loads(result)}
+                for ts, drive_letter, result in rows]
+
+    def serials(self):
+        """Return every serial with recorded history."""
+        rows = self._execute("SELECT serial FROM usage UNION SELECT serial FROM benchmarks UNION SELECT serial FROM health")
+        return [serial for serial, in rows]
+
+    def _downsample_usage(self, older_than, from_resolution, to_resolution):
+        # Cutoffs are bucket-aligned, so a bucket is never half raw and half downsampled
+        cutoff = older_than - older_than % to_resolution
+        self._db.execute(
+            "INSERT OR REPLACE INTO usage (serial, ts, total, used, free, resolution) "
+            "SELECT serial, CAST(ts / :bucket AS INTEGER) * :bucket, MAX(total), CAST(AVG(used) AS INTEGER), "
+            "CAST(AVG(free) AS INTEGER), :bucket FROM usage WHERE ts < :cutoff AND resolution = :source "
+            "GROUP BY serial, CAST(ts / :bucket AS INTEGER)",
+            {"bucket": to_resolution, "cutoff": cutoff, "source": from_resolution})
+        self._db.execute("DELETE FROM usage WHERE ts < ? AND resolution = ?", (cutoff, from_resolution))
+
+    def compact(self, now=None):
+        """Downsample old usage samples (raw -> hourly -> daily) and drop expired results."""
+        now = time.time() if now is None else now
+        with self._lock, self._db:
+            self._downsample_usage(now - RAW_USAGE_DAYS * _DAY, 0, 3600)
+            self._downsample_usage(now - HOURLY_USAGE_DAYS * _DAY, 3600, _DAY)
+            self._db.execute("DELETE FROM health WHERE ts < ?", (now - HEALTH_RETENTION_DAYS * _DAY,))
+            self._db.execute("DELETE FROM benchmarks WHERE ts < ?", (now - BENCHMARK_RETENTION_DAYS * _DAY,))
+        logging.info(f"Compacted drive history in {self.path}")
+
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Return the process-wide history store, opening (and compacting) it on first use."""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            _history_store = HistoryStore()
+            try:
+                _history_store.compact()
+            except sqlite3.Error as e:
+                logging.error(f"Error compacting drive history: {e}")
+        return _history_store
+
+
+def attach_usage_history(details, days=DEFAULT_USAGE_HISTORY_DAYS):
+    """Set details["usage_history"] to the drive's last `days` of stored samples plus its current free_gb.
+
+    Only reads: samples are recorded by the health monitor's usage probe,
+    and a process that has not opened the store reads it read-only, so
+    enumerating drives never creates or writes the database.
+    """
+    if not isinstance(details.get("free_gb"), (int, float)):
+        return
+    samples = []
+    store = _history_store
+    try:
+        if store is None and os.path.exists(HISTORY_DB_PATH):
+            store = HistoryStore(HISTORY_DB_PATH, read_only=True)
+        if store is not None:
+            samples = store.usage_range(drive_key(details), start=time.time() - days * _DAY)
+    except sqlite3.Error as e:
+        logging.error(f"Error reading usage history for {details['drive_letter']}: {e}")
+    finally:
+        if store is not None and store is not _history_store:
+            store.close()
+    history = [{
+        "timestamp": datetime.fromtimestamp(sample["timestamp"]).isoformat(),
+        "free_gb": sample["free"] / (1024**3)
+    } for sample in samples]
+    history.append({"timestamp": datetime.now().isoformat(), "free_gb": details["free_gb"]})
+    details["usage_history"] = history
@@ -0,0 +1,104 @@
+# core/hotplug.py
+
+import logging
+import threading
+from collections import namedtuple
+
+from core.backends import get_backend
+
+DRIVE_ADDED = "add"
+DRIVE_REMOVED = "remove"
+
+# details is the probed drive dict for DRIVE_ADDED and None for DRIVE_REMOVED
+DriveEvent = namedtuple("DriveEvent", ["action", "drive_letter", "details"])
+
+
+class HotplugWatcher:
+    """Publishes DriveEvents for removable/external drives as they attach or detach.
+
+    The backend blocks on OS notifications (mount table and netlink uevents
+    on Linux, Win32_VolumeChangeEvent on Windows), so nothing is polled and
+    only the volume that changed is probed. Subscribers are called on the
+    watcher thread.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watch = None
+        self._known = None
+
+    def subscribe(self, callback):
+        """Register callback(event); returns a function that unsubscribes it."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def start(self, known_drives=None):
+        """Start watching; known_drives seeds the set of drives whose removal is reported.
+
+        Without a seed every removal of a block-backed volume is published.
+        """
+        if self._thread is not None:
+            return
+        if known_drives is not None:
+            self._known = set(known_drives)
+        if self.backend is None:
+            self.backend = get_backend()
+        self._watch = self.backend.watch_volumes()
+        self._thread = threading.Thread(target=self._run, name="driveman-hotplug", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._watch.close()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logging.error(f"Error in hotplug subscriber {callback}: {e}")
+
+    def _run(self):
+        logging.info("Hotplug watcher started.")
+        while True:
+            try:
+                changes = self._watch.changes()
+            except Exception as e:
+                logging.error(f"Error waiting for drive changes: {e}")
+                break
+            if changes is None:
+                break
+
+            for action, drive in changes:
+                if action == DRIVE_ADDED:
+                    try:
+                        details = self.backend.probe_drive(drive)
+                    except Exception as e:
+                        logging.error(f"Error probing connected drive {drive}: {e}")
+                        continue
+                    if details is None:
+                        continue  # internal or unreadable volume
+                    if self._known is not None:
+                        self._known.add(drive)
+                    logging.info(f"Drive connected: {drive}")
+                    self._publish(DriveEvent(DRIVE_ADDED, drive, details))
+                elif self._known is None or drive in self._known:
+                    if self._known is not None:
+                        self._known.discard(drive)
+                    logging.info(f"Drive disconnected: {drive}")
+                    self._publish(DriveEvent(DRIVE_REMOVED, drive, None))
+        logging.info("Hotplug watcher stopped.")
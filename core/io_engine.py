@@ -0,0 +1,240 @@
+# core/io_engine.py
+
+import errno
+import io
+import logging
+import mmap
+import os
+import shutil
+import sys
+import threading
+import time
+
+from core.cancellation import check_cancelled
+from core.datagen import get_data_pattern
+from core.histogram import LatencyHistogram
+from core.sampling import DEFAULT_WINDOW_S, ThroughputSampler, confidence_interval, detect_cache_cliff
+
+# How the page cache was kept out of a measurement
+IO_MODE_DIRECT = "direct"                 # O_DIRECT / FILE_FLAG_NO_BUFFERING
+IO_MODE_FSYNC_DROP = "fsync+drop-cache"   # buffered, fsync'd, cached pages evicted before reads
+IO_MODE_FSYNC = "fsync"                   # buffered and fsync'd, reads may still hit the cache
+
+# Direct I/O needs buffers, offsets and lengths aligned to the logical sector size;
+# 4 KiB covers 512e and 4Kn devices and is the page size mmap hands out.
+ALIGNMENT = 4096
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+def aligned_buffer(size):
+    """Return a page-aligned anonymous buffer of size bytes (a multiple of ALIGNMENT)."""
+    if size % ALIGNMENT:
+        raise ValueError(f"Buffer size {size} is not a multiple of {ALIGNMENT}")
+    return mmap.mmap(-1, size)
+
+_thread_buffers = threading.local()
+
+def get_block_buffer(block_size):
+    """Return this thread's reusable aligned buffer of block_size bytes, filled with pooled random data.
+
+    The buffer is allocated once per thread and size, so repeated phases and
+    multi-GB tests keep memory flat; parallel benchmark workers each get their own.
+    """
+    buffers = getattr(_thread_buffers, "buffers", None)
+    if buffers is None:
+        buffers = _thread_buffers.buffers = {}
+    buffer = buffers.get(block_size)
+    if buffer is None:
+        buffer = aligned_buffer(block_size)
+        get_data_pattern().fill(buffer)
+        buffers[block_size] = buffer
+    return buffer
+
+# FileIO modes for the access strings open_unbuffered() accepts
+_FILE_MODES = {'r': 'rb', 'w': 'wb', 'rw': 'r+b'}
+
+def _open_windows_unbuffered(path, access):
+    """Open path with FILE_FLAG_NO_BUFFERING and wrap the handle in a CRT fd."""
+    import msvcrt
+    import win32file
+
+    flags = win32file.FILE_FLAG_NO_BUFFERING
+    if access == 'r':
+        desired, disposition, crt_flags = win32file.GENERIC_READ, win32file.OPEN_EXISTING, os.O_RDONLY
+    else:
+        flags |= win32file.FILE_FLAG_WRITE_THROUGH
+        if access == 'w':
+            desired, disposition, crt_flags = win32file.GENERIC_WRITE, win32file.CREATE_ALWAYS, os.O_WRONLY
+        else:
+            desired, disposition, crt_flags = (win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                                               win32file.OPEN_EXISTING, os.O_RDWR)
+    handle = win32file.CreateFile(path, desired, win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                                  None, disposition, flags, None)
+    return msvcrt.open_osfhandle(handle.Detach(), crt_flags | os.O_BINARY)
+
+def open_unbuffered(path, write=False, direct=True, access=None):
+    """Open path for benchmark I/O, bypassing the page cache when the platform allows.
+
+    access is 'r', 'w' (create/truncate) or 'rw' (existing file) and defaults
+    from write. Returns (raw_file, io_mode). raw_file is an unbuffered
+    io.FileIO, so readinto()/write() go straight to the OS with the caller's buffer.
+    """
+    if access is None:
+        access = 'w' if write else 'r'
+    if direct:
+        try:
+            if sys.platform == 'win32':
+                fd = _open_windows_unbuffered(path, access)
+                return io.FileIO(fd, _FILE_MODES[access]), IO_MODE_DIRECT
+            if hasattr(os, 'O_DIRECT'):
+                flags = {'r': os.O_RDONLY, 'w': os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 'rw': os.O_RDWR}[access]
+                fd = os.open(path, flags | os.O_DIRECT, 0o644)
+                return io.FileIO(fd, _FILE_MODES[access]), IO_MODE_DIRECT
+        except Exception as e:
+            # tmpfs, some FUSE/exFAT drivers and network shares reject direct I/O
+            logging.info(f"Direct I/O unavailable for {path}, falling back to buffered: {e}")
+
+    mode = IO_MODE_FSYNC_DROP if hasattr(os, 'posix_fadvise') else IO_MODE_FSYNC
+    return io.FileIO(path, _FILE_MODES[access]), mode
+
+if hasattr(os, 'preadv'):
+    def read_at(raw, buffer, offset):
+        """Read len(buffer) bytes at offset into buffer without moving a shared file position."""
+        return os.preadv(raw.fileno(), [buffer], offset)
+
+    def write_at(raw, buffer, offset):
+        """Write buffer at offset without moving a shared file position."""
+        return os.pwritev(raw.fileno(), [buffer], offset)
+else:
+    # Windows has no pread/pwrite; callers give every thread its own file object instead
+    def read_at(raw, buffer, offset):
+        """Read len(buffer) bytes at offset into buffer (file position is per-thread)."""
+        raw.seek(offset)
+        return raw.readinto(buffer)
+
+    def write_at(raw, buffer, offset):
+        """Write buffer at offset (file position is per-thread)."""
+        raw.seek(offset)
+        return raw.write(buffer)
+
+def drop_cache(path):
+    """Flush path to the device and evict its cached pages where the OS supports it."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+def sequential_write(path, size_bytes, block_size=DEFAULT_BLOCK_SIZE, direct=True, cancel_event=None,
+                     sample_window_s=DEFAULT_WINDOW_S, sample_window_bytes=None, data=None):
+    """Write size_bytes to path in aligned blocks, including the final fsync in the timing.
+
+    Every block comes from the same preallocated buffer, so memory use does
+    not depend on size_bytes; it is refilled per block from data (a
+    core.datagen.DataPattern, random by default), whose per-sector stamps
+    keep every 4 KiB sector of the file distinct (zeros excepted).
+    Throughput is sampled per time (or byte) window so an SLC-cache cliff
+    shows up in "throughput_series"/"cache_cliff".
+    """
+    size_bytes -= size_bytes % block_size
+    data = data or get_data_pattern()
+    fill = data.fill
+    buffer = get_block_buffer(block_size)
+    raw, mode = open_unbuffered(path, write=True, direct=direct)
+    try:
+        written = 0
+        block_index = 0
+        latency = LatencyHistogram()
+        record = latency.record
+        perf_counter_ns = time.perf_counter_ns
+        sampler = ThroughputSampler(sample_window_s, sample_window_bytes)
+        start_time = time.perf_counter()
+        sampler.start(start_time)
+        while written < size_bytes:
+            check_cancelled(cancel_event)
+            fill(buffer, block_index)
+            started = perf_counter_ns()
+            n = raw.write(buffer)
+            finished = perf_counter_ns()
+            record(finished - started)
+            sampler.add(n, finished / 1e9)
+            written += n
+            block_index += 1
+        os.fsync(raw.fileno())
+        elapsed = time.perf_counter() - start_time
+        sampler.finish()
+    finally:
+        raw.close()
+    return {
+        "speed_mb_s": (written / (1024 * 1024)) / elapsed if elapsed > 0 else 0,
+        "bytes": written,
+        "seconds": elapsed,
+        "io_mode": mode,
+        "block_size": block_size,
+        "latency_ms": latency.summary(),
+        "latency_histogram": latency.to_dict(),
+        "throughput_series": sampler.to_dict(),
+        "cache_cliff": detect_cache_cliff(sampler),
+        "confidence": confidence_interval(sampler.mb_s),
+        "data": data.describe(),
+    }
+
+def sequential_read(path, block_size=DEFAULT_BLOCK_SIZE, direct=True, cancel_event=None,
+                    sample_window_s=DEFAULT_WINDOW_S, sample_window_bytes=None):
+    """Read path back in aligned blocks with readinto(); in buffered mode its cached pages are dropped first."""
+    buffer = get_block_buffer(block_size)
+    raw, mode = open_unbuffered(path, write=False, direct=direct)
+    try:
+        if mode != IO_MODE_DIRECT:
+            drop_cache(path)
+        total = 0
+        latency = LatencyHistogram()
+        record = latency.record
+        perf_counter_ns = time.perf_counter_ns
+        sampler = ThroughputSampler(sample_window_s, sample_window_bytes)
+        start_time = time.perf_counter()
+        sampler.start(start_time)
+        while True:
+            check_cancelled(cancel_event)
+            started = perf_counter_ns()
+            n = raw.readinto(buffer)
+            if not n:
+                break
+            finished = perf_counter_ns()
+            record(finished - started)
+            sampler.add(n, finished / 1e9)
+            total += n
+        elapsed = time.perf_counter() - start_time
+        sampler.finish()
+    finally:
+        raw.close()
+    return {
+        "speed_mb_s": (total / (1024 * 1024)) / elapsed if elapsed > 0 else 0,
+        "bytes": total,
+        "seconds": elapsed,
+        "io_mode": mode,
+        "block_size": block_size,
+        "latency_ms": latency.summary(),
+        "latency_histogram": latency.to_dict(),
+        "throughput_series": sampler.to_dict(),
+        "cache_cliff": detect_cache_cliff(sampler),
+        "confidence": confidence_interval(sampler.mb_s),
+    }
+
+def prepare_test_file(path, size_bytes, block_size=DEFAULT_BLOCK_SIZE, cancel_event=None, data=None):
+    """Stream a test file of size_bytes to path and flush it, unless one of that size already exists."""
+    size_bytes -= size_bytes % block_size
+    try:
+        if os.path.getsize(path) == size_bytes:
+            return
+    except OSError:
+        pass
+    sequential_write(path, size_bytes, block_size, direct=False, cancel_event=cancel_event, data=data)
+
+def check_free_space(path, size_bytes):
+    """Raise OSError if the volume holding path cannot fit size_bytes."""
+    free = shutil.disk_usage(path).free
+    if free < size_bytes:
+        raise OSError(errno.ENOSPC, f"Test needs {size_bytes / (1024**2):.0f} MB but only {free / (1024**2):.0f} MB is free", path)
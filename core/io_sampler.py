@@ -0,0 +1,301 @@
+# core/io_sampler.py
+
+import logging
+import threading
+import time
+from array import array
+
+from core.backends import get_backend
+from core.hotplug import DRIVE_ADDED
+
+DEFAULT_INTERVAL_S = 0.1
+DEFAULT_RING_SIZE = 3000     # five minutes at the default interval
+# Every COARSE_INTERVAL_S a sample also goes to a coarse ring, so windows over whole benchmark runs stay covered
+COARSE_INTERVAL_S = 10.0
+COARSE_RING_SIZE = 4320      # twelve hours
+DEFAULT_WINDOW_S = 1.0
+
+# Cumulative counters kept per sample; the backends report times in milliseconds
+_COLUMNS = ("read_bytes", "write_bytes", "read_count", "write_count", "read_time", "write_time",
+            "busy_time", "queue_time")
+
+
+class _DiskRing:
+    """Fixed-size ring of cumulative counter samples of one disk, one array('d') column per counter."""
+
+    def __init__(self, size):
+        self.size = size
+        self.times = array('d', bytes(8 * size))
+        self.columns = {name: array('d', bytes(8 * size)) for name in _COLUMNS}
+        self.in_flight = 0
+        self.count = 0
+        self.next = 0
+
+    def append(self, now, counters):
+        index = self.next
+        self.times[index] = now
+        for name, column in self.columns.items():
+            value = counters.get(name)
+            column[index] = float('nan') if value is None else value
+        self.in_flight = counters.get("in_flight")
+        self.next = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    @property
+    def last_time(self):
+        return self.times[self._physical(self.count - 1)] if self.count else float('-inf')
+
+    def _physical(self, position):
+        # position 0 is the oldest sample still in the ring
+        return (self.next - self.count + position) % self.size
+
+    def position_at(self, t):
+        """Position of the last sample taken at or before t (0 if t predates the ring)."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[self._physical(middle)] <= t:
+                low = middle + 1
+            else:
+                high = middle
+        return max(0, low - 1)
+
+    def sample(self, position):
+        index = self._physical(position)
+        return self.times[index], {name: column[index] for name, column in self.columns.items()}
+
+
+def io_rates(before, after):
+    """Rates between two (time, counters) samples of one disk.
+
+    read/write MB/s and IOPS; queue_depth is the time-averaged number of
+    requests in flight (weighted queue time over elapsed time, or the sum
+    of read and write service times where the platform has no queue time);
+    busy_percent is the share of the interval the disk had I/O outstanding,
+    None where the platform does not report it.
+    """
+    (t0, start), (t1, end) = before, after
+    elapsed = t1 - t0
+    if elapsed <= 0:
+        return None
+    delta = {name: end[name] - start[name] for name in _COLUMNS}
+    queue_time = delta["queue_time"]
+    if queue_time != queue_time:  # NaN: no weighted queue time on this platform
+        queue_time = delta["read_time"] + delta["write_time"]
+    busy_time = delta["busy_time"]
+    return {
+        "seconds": elapsed,
+        "read_mb_s": delta["read_bytes"] / (1024 * 1024) / elapsed,
+        "write_mb_s": delta["write_bytes"] / (1024 * 1024) / elapsed,
+        "read_iops": delta["read_count"] / elapsed,
+        "write_iops": delta["write_count"] / elapsed,
+        "queue_depth": queue_time / 1000 / elapsed,
+        "busy_percent": None if busy_time != busy_time else min(100.0, busy_time / 10 / elapsed),
+        "read_bytes": int(delta["read_bytes"]),
+        "write_bytes": int(delta["write_bytes"]),
+        "read_time_ms": delta["read_time"],
+        "write_time_ms": delta["write_time"],
+    }
+
+
+class IoSampler:
+    """Samples the I/O counters of tracked physical disks from one background thread.
+
+    Every interval_s the backend's cumulative counters (/proc/diskstats,
+    or the Windows disk performance counters) are appended to a fixed-size
+    ring per disk, so memory stays constant however long it runs; every
+    coarse_interval_s a sample also goes to a second, coarse ring, which
+    window() falls back to for starts older than the fine ring. Volumes
+    are mapped to their physical disk once, by track(). Readers only copy
+    two samples under a lock: window() and series() never wait for the
+    sampling thread, and the thread sleeps whenever nothing is tracked.
+    """
+
+    def __init__(self, interval_s=DEFAULT_INTERVAL_S, ring_size=DEFAULT_RING_SIZE, backend=None,
+                 coarse_interval_s=COARSE_INTERVAL_S, coarse_ring_size=COARSE_RING_SIZE):
+        self.interval_s = interval_s
+        self.ring_size = ring_size
+        self.coarse_interval_s = coarse_interval_s
+        self.coarse_ring_size = coarse_ring_size
+        self.backend = backend
+        self._rings = {}
+        self._coarse_rings = {}
+        self._volumes = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def track(self, drive):
+        """Start sampling the disk behind a volume; returns its disk name (None if it cannot be mapped)."""
+        with self._lock:
+            if drive in self._volumes:
+                return self._volumes[drive]
+        if self.backend is None:
+            self.backend = get_backend()
+        try:
+            disk = self.backend.disk_for_volume(drive)
+        except Exception as e:
+            logging.error(f"Could not map {drive} to a physical disk: {e}")
+            disk = None
+        with self._lock:
+            self._volumes[drive] = disk
+            if disk is not None and disk not in self._rings:
+                self._rings[disk] = _DiskRing(self.ring_size)
+                self._coarse_rings[disk] = _DiskRing(self.coarse_ring_size)
+        if disk is not None:
+            self.start()
+            self._wakeup.set()
+        return disk
+
+    def untrack(self, drive):
+        """Stop sampling a volume's disk once no other tracked volume lives on it."""
+        with self._lock:
+            disk = self._volumes.pop(drive, None)
+            if disk is not None and disk not in self._volumes.values():
+                self._rings.pop(disk, None)
+                self._coarse_rings.pop(disk, None)
+
+    def follow_registry(self, registry):
+        """Track every drive in a core.registry.DriveRegistry, following hotplug events."""
+        for details in registry.get_drives():
+            self.track(details["drive_letter"])
+        registry.add_listener(self._on_drive_event)
+
+    def _on_drive_event(self, event):
+        if event.action == DRIVE_ADDED:
+            self.track(event.drive_letter)
+        else:
+            self.untrack(event.drive_letter)
+
+    def disk_for(self, drive):
+        with self._lock:
+            return self._volumes.get(drive)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="driveman-io-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        thread.join()
+
+    def _run(self):
+        if self.backend is None:
+            self.backend = get_backend()
+        next_sample = time.monotonic()
+        while not self._stopping:
+            with self._lock:
+                idle = not self._rings
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                next_sample = time.monotonic()
+                continue
+            try:
+                counters = self.backend.io_counters()
+            except Exception as e:
+                logging.warning(f"I/O sampler could not read counters: {e}")
+                counters = {}
+            now = time.monotonic()
+            self._append(now, counters)
+            # Fixed-rate schedule; a slow read skips ahead rather than bursting to catch up
+            next_sample += self.interval_s
+            if next_sample < now:
+                next_sample = now + self.interval_s
+            self._wakeup.wait(next_sample - time.monotonic())
+            self._wakeup.clear()
+
+    def _append(self, now, counters):
+        with self._lock:
+            for disk, ring in self._rings.items():
+                if disk in counters:
+                    ring.append(now, counters[disk])
+                    coarse = self._coarse_rings[disk]
+                    if now - coarse.last_time >= self.coarse_interval_s:
+                        coarse.append(now, counters[disk])
+
+    def _ring(self, drive_or_disk, rings=None):
+        disk = self._volumes.get(drive_or_disk, drive_or_disk)
+        return (self._rings if rings is None else rings).get(disk)
+
+    def window(self, drive_or_disk, seconds=DEFAULT_WINDOW_S, start=None, end=None):
+        """Rates of a volume's (or disk's) I/O over the last `seconds`, or between two time.monotonic() values.
+
+        Uses the nearest samples inside the rings, the coarse one for starts
+        the fine ring no longer holds; returns None until two samples exist.
+        "seconds" is the span actually covered and "requested_s" the span
+        asked for; "truncated" is True when the oldest sample left starts
+        later than asked by more than the ring's sampling interval.
+        """
+        with self._lock:
+            ring = self._ring(drive_or_disk)
+            if ring is None or ring.count < 2:
+                return None
+            last = ring.position_at(end) if end is not None else ring.count - 1
+            after = ring.sample(last)
+            requested_start = start if start is not None else after[0] - seconds
+            first, resolution = ring.position_at(requested_start), self.interval_s
+            if first >= last:
+                first = last - 1
+            before = ring.sample(first)
+            coarse = self._ring(drive_or_disk, self._coarse_rings)
+            if before[0] > requested_start + resolution and coarse is not None and coarse.count:
+                older = coarse.sample(coarse.position_at(requested_start))
+                if older[0] < before[0]:
+                    before, resolution = older, self.coarse_interval_s
+            in_flight = ring.in_flight if end is None else None
+        rates = io_rates(before, after)
+        if rates is not None:
+            rates["in_flight"] = in_flight
+            rates["requested_s"] = after[0] - requested_start
+            rates["truncated"] = before[0] > requested_start + resolution
+        return rates
+
+    def series(self, drive_or_disk, seconds=60.0, step_s=DEFAULT_WINDOW_S):
+        """Rates per step_s over the last `seconds`, oldest first, for plotting."""
+        with self._lock:
+            ring = self._ring(drive_or_disk)
+            if ring is None or ring.count < 2:
+                return []
+            end_time = ring.sample(ring.count - 1)[0]
+            samples = []
+            t = end_time - seconds
+            while t <= end_time:
+                samples.append(ring.sample(ring.position_at(t)))
+                t += step_s
+        series = []
+        for before, after in zip(samples, samples[1:]):
+            rates = io_rates(before, after)
+            if rates is not None:
+                rates["elapsed_s"] = after[0] - end_time
+                series.append(rates)
+        return series
+
+    def rates(self, seconds=DEFAULT_WINDOW_S):
+        """window() of every tracked volume, keyed by drive."""
+        with self._lock:
+            drives = [drive for drive, disk in self._volumes.items() if disk is not None]
+        return {drive: self.window(drive, seconds) for drive in drives}
+
+
+_io_sampler = None
+_io_sampler_lock = threading.Lock()
+
+
+def get_io_sampler():
+    """Return the process-wide I/O sampler, creating it on first use."""
+    global _io_sampler
+    with _io_sampler_lock:
+        if _io_sampler is None:
+            _io_sampler = IoSampler()
+        return _io_sampler
@@ -0,0 +1,276 @@
+# core/metadata_bench.py
+
+import errno
+import logging
+import os
+import random
+import shutil
+import threading
+import time
+
+from core.cancellation import check_cancelled
+from core.datagen import get_data_pattern
+from core.histogram import LatencyHistogram, merge_histograms
+from core.io_engine import drop_cache
+
+TREE_DIR = "driveman_metadata_test"
+
+DEFAULT_FILE_COUNT = 1000
+# (size in bytes, weight): mostly small documents and images, a few larger files
+DEFAULT_SIZE_DISTRIBUTION = [(512, 30), (4 * 1024, 35), (32 * 1024, 25), (256 * 1024, 9), (1024 * 1024, 1)]
+DEFAULT_DEPTH = 2
+DEFAULT_FANOUT = 4
+DEFAULT_THREADS = 4
+# Each phase stops after this long; later phases work on whatever the create phase managed
+DEFAULT_PHASE_LIMIT_S = 10.0
+# The file count is scaled down so the tree never exceeds this many bytes, nor 1/FREE_SPACE_DIVISOR of the free space
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+FREE_SPACE_DIVISOR = 2
+
+OP_MKDIR = "mkdir"
+OP_CREATE = "create"
+OP_FSYNC = "fsync"
+OP_STAT = "stat"
+OP_READ = "read"
+OP_RENAME = "rename"
+OP_UNLINK = "unlink"
+PHASES = [OP_MKDIR, OP_CREATE, OP_FSYNC, OP_STAT, OP_READ, OP_RENAME, OP_UNLINK]
+
+
+def plan_tree(root, file_count, sizes=DEFAULT_SIZE_DISTRIBUTION, depth=DEFAULT_DEPTH, fanout=DEFAULT_FANOUT,
+              seed=0):
+    """Return (directories, [(path, size)]) for a tree of depth levels with fanout subdirectories each.
+
+    Directories are listed parents first; files are spread round-robin over
+    the deepest level and their sizes drawn from the weighted distribution.
+    """
+    directories = []
+    level = [root]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"d{index}") for parent in level for index in range(fanout)]
+        directories.extend(level)
+    rng = random.Random(seed)
+    size_choices = rng.choices([size for size, _ in sizes], weights=[weight for _, weight in sizes], k=file_count)
+    files = [(os.path.join(level[index % len(level)], f"f{index:06d}.bin"), size)
+             for index, size in enumerate(size_choices)]
+    return directories, files
+
+
+def _create(path, size, data):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        view = data[:size]
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _fsync(path, size, data):
+    fd = os.open(path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _stat(path, size, data):
+    os.stat(path)
+
+
+def _read(path, size, data):
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        while os.read(fd, 1024 * 1024):
+            pass
+    finally:
+        os.close(fd)
+
+
+def _rename(path, size, data):
+    target = path[:-len(".bin")] + ".ren"
+    os.rename(path, target)
+    return target
+
+
+def _unlink(path, size, data):
+    os.remove(path)
+
+
+class MetadataBenchmark:
+    """Small-file and metadata workload: mkdir, create, fsync, stat, read, rename and unlink phases.
+
+    Each phase spreads the files over `threads` workers (file i goes to
+    worker i % threads). Workers record into their own LatencyHistogram,
+    merged when the phase ends. Every phase stops after phase_limit_s, so
+    a run on a slow stick has a predictable length. Files the create phase
+    did not reach are skipped by later phases. Results are ops/s and
+    latency percentiles per operation type.
+    """
+
+    def __init__(self, drive, file_count=DEFAULT_FILE_COUNT, sizes=DEFAULT_SIZE_DISTRIBUTION, depth=DEFAULT_DEPTH,
+                 fanout=DEFAULT_FANOUT, threads=DEFAULT_THREADS, phase_limit_s=DEFAULT_PHASE_LIMIT_S,
+                 max_bytes=DEFAULT_MAX_BYTES, seed=None, data=None):
+        self.root = os.path.join(drive, TREE_DIR)
+        self.threads = max(1, threads)
+        self.phase_limit_s = phase_limit_s
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.depth = depth
+        self.fanout = fanout
+        self.directories, files = plan_tree(self.root, file_count, sizes, depth, fanout, self.seed)
+        self.max_bytes = max_bytes
+        self.files = files
+        self.data = data or get_data_pattern()
+
+    def _run_phase(self, op, work, fn, data, cancel_event):
+        """Run fn(path, size, data) over work, a list per worker of [path, size, exists] entries.
+
+        The create phase takes the files that do not exist yet, every other
+        phase the ones that do; a phase is completed only if it reached
+        every file of the tree, so one after a cut-short create phase is
+        not. fn may return a new path (rename). Create
+        workers write from their own copy of data, stamped per file so no
+        two files share a 4 KiB sector.
+        """
+        creating = op == OP_CREATE
+        # Files an earlier phase never created count against completion too
+        eligible = sum(len(entries) for entries in work)
+        deadline = time.perf_counter() + self.phase_limit_s
+        stats = [{"ops": 0, "errors": 0, "error": None, "latency": LatencyHistogram()} for _ in work]
+
+        def worker(index):
+            worker_stats = stats[index]
+            record = worker_stats["latency"].record
+            perf_counter_ns = time.perf_counter_ns
+            worker_data = memoryview(bytearray(data)) if creating else data
+            for entry in work[index]:
+                if entry[2] == creating:
+                    continue
+                if time.perf_counter() >= deadline or (cancel_event is not None and cancel_event.is_set()):
+                    break
+                if creating:
+                    self.data.stamp(worker_data[:entry[1]], worker_stats["ops"] * len(work) + index)
+                started = perf_counter_ns()
+                try:
+                    new_path = fn(entry[0], entry[1], worker_data)
+                except OSError as e:
+                    worker_stats["errors"] += 1
+                    worker_stats["error"] = str(e)
+                    if creating:
+                        # Usually a full volume: this worker's remaining files would fail the same way
+                        break
+                    continue
+                record(perf_counter_ns() - started)
+                worker_stats["ops"] += 1
+                if new_path is not None:
+                    entry[0] = new_path
+                if op in (OP_CREATE, OP_UNLINK):
+                    entry[2] = creating
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(index,), name=f"driveman-meta-{index}", daemon=True)
+                   for index in range(len(work))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        check_cancelled(cancel_event)
+        return self._phase_result(stats, elapsed, eligible)
+
+    def _phase_result(self, stats, elapsed, eligible):
+        ops = sum(worker["ops"] for worker in stats)
+        latency = merge_histograms(worker["latency"] for worker in stats)
+        errors = [worker["error"] for worker in stats if worker["error"]]
+        return {
+            "ops": ops,
+            "ops_per_s": ops / elapsed if elapsed > 0 else 0,
+            "seconds": elapsed,
+            "completed": ops + sum(worker["errors"] for worker in stats) >= eligible,
+            "errors": sum(worker["errors"] for worker in stats),
+            "first_error": errors[0] if errors else None,
+            "latency_ms": latency.summary(),
+            "latency_histogram": latency.to_dict(),
+        }
+
+    def _mkdir_phase(self, cancel_event):
+        # Parents come first in self.directories, so one thread keeps the order. There are few
+        # directories and every file needs its own, so this phase is not time limited.
+        latency = LatencyHistogram()
+        ops, errors, error = 0, 0, None
+        start = time.perf_counter()
+        os.makedirs(self.root)
+        for directory in self.directories:
+            check_cancelled(cancel_event)
+            started = time.perf_counter_ns()
+            try:
+                os.mkdir(directory)
+            except OSError as e:
+                errors, error = errors + 1, str(e)
+                continue
+            latency.record(time.perf_counter_ns() - started)
+            ops += 1
+        elapsed = time.perf_counter() - start
+        stats = [{"ops": ops, "errors": errors, "error": error, "latency": latency}]
+        return self._phase_result(stats, elapsed, len(self.directories))
+
+    def run(self, progress_callback=None, cancel_event=None):
+        """Run every phase and return the results; the tree is always removed afterwards."""
+        # Keep to max_bytes and half the free space by dropping files from the end, preserving the size mix
+        budget = min(self.max_bytes, shutil.disk_usage(os.path.dirname(self.root)).free // FREE_SPACE_DIVISOR)
+        total = 0
+        for index, (_, size) in enumerate(self.files):
+            total += size
+            if total > budget:
+                self.files = self.files[:index]
+                break
+        if not self.files:
+            raise OSError(errno.ENOSPC, "Not enough free space for the metadata benchmark", self.root)
+        if os.path.exists(self.root):
+            # Left behind by an interrupted run
+            shutil.rmtree(self.root)
+        data = memoryview(self.data.fill(bytearray(max(size for _, size in self.files))))
+        # [path, size, exists]: set by the create phase, cleared again by unlink
+        work = [[[path, size, False] for path, size in self.files[index::self.threads]]
+                for index in range(self.threads)]
+        operations = {OP_CREATE: _create, OP_FSYNC: _fsync, OP_STAT: _stat, OP_READ: _read,
+                      OP_RENAME: _rename, OP_UNLINK: _unlink}
+        phases = {}
+        try:
+            for index, op in enumerate(PHASES):
+                check_cancelled(cancel_event)
+                if progress_callback:
+                    progress_callback(index / len(PHASES), f"metadata {op}")
+                if op == OP_MKDIR:
+                    phases[op] = self._mkdir_phase(cancel_event)
+                    continue
+                if op == OP_READ:
+                    # Reads must come from the device, not from the pages the create phase left cached
+                    for entries in work:
+                        for path, _, exists in entries:
+                            if exists:
+                                drop_cache(path)
+                phases[op] = self._run_phase(op, work, operations[op], data, cancel_event)
+        finally:
+            data.release()
+            try:
+                shutil.rmtree(self.root)
+            except OSError as e:
+                logging.error(f"Error cleaning up {self.root}: {e}")
+        return {
+            "files": len(self.files),
+            "bytes": sum(size for _, size in self.files),
+            "directories": len(self.directories),
+            "depth": self.depth,
+            "fanout": self.fanout,
+            "threads": self.threads,
+            "phase_limit_s": self.phase_limit_s,
+            "seed": self.seed,
+            "data": self.data.describe(),
+            "phases": phases,
+        }
+
+
+def run_metadata_benchmark(drive, progress_callback=None, cancel_event=None, **options):
+    """Run a MetadataBenchmark on drive; options are MetadataBenchmark's keyword arguments."""
+    return MetadataBenchmark(drive, **options).run(progress_callback, cancel_event)
@@ -1,162 +1,306 @@
 import time
 import os
 import json
-import psutil
+import shutil
 import logging
-import random
+from core.cancellation import OperationCancelled, check_cancelled
+from core.random_io import DEFAULT_SAMPLE_WINDOW_S, run_random_workloads
+from core.io_sampler import get_io_sampler
+from core.metadata_bench import run_metadata_benchmark
+from core.datagen import get_data_pattern
+from core.profiles import STEP_IO_COUNTERS, STEP_METADATA, STEP_RANDOM, STEP_SEQUENTIAL_READ, STEP_SEQUENTIAL_WRITE, \
+    PlanStep, get_plan, is_adaptive
+from core.calibration import DEFAULT_BUDGET_S, calibrate, estimate_s, extend_step, scale_plan
+from core.sampling import DEFAULT_WINDOW_S
+from core.io_engine import DEFAULT_BLOCK_SIZE, check_free_space, prepare_test_file, sequential_read, sequential_write
 from core.drive_check import get_removable_and_external_drives_details
+from core.export import RECORD_BENCHMARK, write_report
+from core.history_store import drive_key, get_history_store
 
 
 # Configure logging
 logging.basicConfig(filename='driveman.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_performance_tests(drives):
-    """Run basic performance tests (read/write speed) on the provided drives."""
+SEQUENTIAL_TEST_SIZE_MB = 100
+RANDOM_TEST_SIZE_MB = 50
+RANDOM_BLOCK_SIZE = 4096
+RANDOM_DURATION_S = 5.0
+SEQUENTIAL_TEST_FILE = "temp_test_file.bin"
+
+def run_performance_tests(drives, progress_callback=None, result_callback=None, cancel_event=None, profile=None,
+                          budget_s=None):
+    """Run basic performance tests (read/write speed) on the provided drives.
+
+    progress_callback(fraction, message) and result_callback(drive_letter, result)
+    are called from the calling thread as phases and drives complete; setting
+    cancel_event stops before the next phase.
+    """
     results = {}
-    for drive in drives:
+    for index, drive in enumerate(drives):
         drive_letter = drive['drive_letter']  # Access drive letter from the dictionary
+        check_cancelled(cancel_event)
+
+        def drive_progress(fraction, message):
+            if progress_callback:
+                progress_callback((index + fraction) / len(drives), message)
+
         try:
             print(f"Running performance tests on {drive_letter}...")
-            results[drive_letter] = {
-                "sequential": {
-                    "write_speed": test_write_speed(drive_letter),
-                    "read_speed": test_read_speed(drive_letter)
-                },
-                "random": {
-                    "io_speed": test_random_io(drive_letter)
-                },
-                "file_operations": test_file_operations(drive_letter),
-                "benchmark": run_benchmark(drive_letter)
-            }
-            
+            results[drive_letter] = run_drive_tests(drive_letter, drive_progress, cancel_event, profile, budget_s)
+        except OperationCancelled:
+            raise
         except Exception as e:
             logging.error(f"Error running performance tests on {drive_letter}: {e}")
             results[drive_letter] = {"error": str(e)}
 
+        if result_callback:
+            result_callback(drive_letter, results[drive_letter])
+
+    return results
+
+def run_drive_tests(drive_letter, progress_callback=None, cancel_event=None, profile=None, budget_s=None):
+    """Run every phase of a benchmark profile on one drive (the "standard" profile by default).
+
+    profile is a built-in profile name, a job spec path or dict, or a plan
+    from core.profiles.get_plan. The result embeds the normalized spec under
+    "profile", so runs can be compared across machines. A profile with
+    "auto" phases is calibrated on the drive first and scaled to budget_s
+    (default: the profile's budget_s); the probe and the sizes chosen are
+    reported under "calibration". If the profile sets
+    target_half_width_percent, a scaled phase whose confidence interval is
+    wider reruns longer (core.calibration.extend_step) for as long as the
+    budget left after the remaining phases allows; its allocation then
+    records the final size or duration and the number of runs.
+    """
+    plan = get_plan(profile)
+    # Sampled from the start so the I/O counters phase covers the whole run
+    get_io_sampler().track(drive_letter)
+    started = time.monotonic()
+    results = {}
+
+    if is_adaptive(plan):
+        budget_s = budget_s or plan.spec.get("budget_s") or DEFAULT_BUDGET_S
+        if progress_callback:
+            progress_callback(0.0, f"calibrating {drive_letter}")
+        direct = next((step.params["direct"] for step in plan.steps if "direct" in step.params), True)
+        calibration = calibrate(drive_letter, direct, cancel_event)
+        plan, allocations = scale_plan(plan, calibration, budget_s, shutil.disk_usage(drive_letter).free)
+        results["calibration"] = dict(calibration, budget_s=budget_s, phases=allocations)
+
+    target = plan.spec.get("target_half_width_percent") if "calibration" in results else None
+    for index, step in enumerate(plan.steps):
+        check_cancelled(cancel_event)
+        if progress_callback:
+            progress_callback(index / len(plan.steps), f"{', '.join(step.names)} on {drive_letter}")
+        _run_step(drive_letter, step, results, started, cancel_event)
+
+        while target and step.names[0] in allocations:
+            missed = _missed_target(results, step, target)
+            if not missed:
+                break
+            if step.kind == STEP_RANDOM:
+                # Only the workloads that missed run again, the widest first
+                workloads = {workload[0]: workload for workload in step.params["workloads"]}
+                step = PlanStep(step.kind, missed, dict(step.params, workloads=[workloads[name] for name in missed]))
+            available_s = budget_s - (time.monotonic() - started) - estimate_s(plan.steps[index + 1:], calibration)
+            free_bytes = shutil.disk_usage(drive_letter).free
+            keeps_file = step.kind == STEP_SEQUENTIAL_WRITE and step.params["keep_file"]
+            if keeps_file:
+                # The rerun replaces the file kept for the read, so its space is free for the larger one
+                free_bytes += step.params["size_mb"] * 1024 * 1024
+            extended = extend_step(step, calibration, available_s, free_bytes)
+            if extended is None:
+                break
+            logging.info(f"{', '.join(missed)} on {drive_letter} missed the \u00b1{target}% confidence target; "
+                         f"rerunning longer")
+            step = extended
+            if keeps_file:
+                _remove_test_file(os.path.join(drive_letter, SEQUENTIAL_TEST_FILE))
+                following = plan.steps[index + 1]
+                plan.steps[index + 1] = PlanStep(following.kind, list(following.names),
+                                                 dict(following.params, size_mb=step.params["size_mb"]))
+                allocations[following.names[0]]["size_mb"] = step.params["size_mb"]
+            check_cancelled(cancel_event)
+            _run_step(drive_letter, step, results, started, cancel_event)
+            for name in step.names:
+                allocation = allocations[name]
+                allocation.update({key: step.params[key] for key in ("size_mb", "duration") if key in allocation})
+                allocation["runs"] = allocation.get("runs", 1) + 1
+
+    results["profile"] = plan.spec
+    if "calibration" in results:
+        results["calibration"]["total_s"] = time.monotonic() - started
     return results
 
-def test_write_speed(drive):
-    """Test write speed of the given drive."""
-    test_size_mb = 100 # Increased test size
-    temp_file = os.path.join(drive, "temp_test_file.bin") # Use .bin for binary data
+def _missed_target(results, step, target):
+    """Names of a step's phases whose confidence half-width is wider than target percent, widest first.
+
+    Failed phases and phases without an interval are left out: running them longer would not help.
+    """
+    group = results.get("random" if step.kind == STEP_RANDOM else "sequential", {})
+    spreads = {}
+    for name in step.names:
+        spread = ((group.get(name) or {}).get("confidence") or {}).get("half_width_percent")
+        if spread is not None and spread > target:
+            spreads[name] = spread
+    return sorted(spreads, key=spreads.get, reverse=True)
+
+def _run_step(drive_letter, step, results, started, cancel_event=None):
+    """Run one plan step and store its result in results; a rerun replaces the step's earlier result."""
+    params = step.params
+    # Only scaled steps choose their own sampling window
+    window = {"sample_window_s": params["sample_window_s"]} if "sample_window_s" in params else {}
+    if step.kind == STEP_SEQUENTIAL_WRITE:
+        results.setdefault("sequential", {})[step.names[0]] = test_write_speed(
+            drive_letter, params["size_mb"], params["block_size"], params["direct"], params["keep_file"],
+            cancel_event, data=get_data_pattern(**params["data"]), **window)
+    elif step.kind == STEP_SEQUENTIAL_READ:
+        results.setdefault("sequential", {})[step.names[0]] = test_read_speed(
+            drive_letter, params["size_mb"], params["block_size"], params["direct"], cancel_event, **window)
+    elif step.kind == STEP_RANDOM:
+        outcome = test_random_io(
+            drive_letter, params["file_size_mb"], params["block_size"], params["duration"], params["workloads"],
+            params["direct"], cancel_event, seed=params["seed"], max_ops=params["max_ops"],
+            data=get_data_pattern(**params["data"]), **window)
+        # A failure to prepare the test file fails every workload of the step
+        results.setdefault("random", {}).update(
+            outcome if "error" not in outcome else {name: outcome for name in step.names})
+    elif step.kind == STEP_METADATA:
+        options = dict(params, data=get_data_pattern(**params["data"]))
+        results["file_operations"] = test_file_operations(drive_letter, cancel_event=cancel_event, **options)
+    elif step.kind == STEP_IO_COUNTERS:
+        results["benchmark"] = run_benchmark(drive_letter, since=started)
+
+def test_write_speed(drive, test_size_mb=SEQUENTIAL_TEST_SIZE_MB, block_size=DEFAULT_BLOCK_SIZE,
+                     direct=True, keep_file=False, cancel_event=None, data=None, sample_window_s=DEFAULT_WINDOW_S):
+    """Test write speed of the given drive, bypassing the OS write cache.
+
+    With keep_file the test file is left in place for test_read_speed.
+    """
+    temp_file = os.path.join(drive, SEQUENTIAL_TEST_FILE)
+    failed = True
     try:
-        start_time = time.perf_counter() # Use perf_counter for better precision
-        with open(temp_file, 'wb') as f: # Write binary data
-            f.write(os.urandom(test_size_mb * 1024 * 1024)) # Write random data
-        write_speed = test_size_mb / (time.perf_counter() - start_time)  # MB/s
-        return write_speed
+        check_free_space(drive, test_size_mb * 1024 * 1024)
+        result = sequential_write(temp_file, test_size_mb * 1024 * 1024, block_size, direct, cancel_event,
+                                  sample_window_s, data=data)
+        failed = False
+        return result
+    except OperationCancelled:
+        raise
     except Exception as e:
         logging.error(f"Error testing write speed on {drive}: {e}")
-        return f"Error: {str(e)}"
+        return {"error": str(e)}
     finally:
-        try:
-            os.remove(temp_file)
-        except Exception as e:
-            logging.error(f"Error removing temp file on {drive}: {e}")
+        if failed or not keep_file:
+            _remove_test_file(temp_file)
 
-def test_read_speed(drive):
-    """Test read speed of the given drive."""
-    test_size_mb = 100
-    temp_file = os.path.join(drive, "temp_test_file.bin")
+def test_read_speed(drive, test_size_mb=SEQUENTIAL_TEST_SIZE_MB, block_size=DEFAULT_BLOCK_SIZE,
+                    direct=True, cancel_event=None, sample_window_s=DEFAULT_WINDOW_S):
+    """Test read speed of the given drive, bypassing the OS read cache."""
+    temp_file = os.path.join(drive, SEQUENTIAL_TEST_FILE)
     try:
-        with open(temp_file, 'wb') as f:
-            f.write(os.urandom(test_size_mb * 1024 * 1024))
-        start_time = time.perf_counter()
-        with open(temp_file, 'rb') as f:
-            f.read()
-        read_speed = test_size_mb / (time.perf_counter() - start_time)
-        return read_speed
+        if not os.path.exists(temp_file):
+            check_free_space(drive, test_size_mb * 1024 * 1024)
+        prepare_test_file(temp_file, test_size_mb * 1024 * 1024, block_size, cancel_event)
+        return sequential_read(temp_file, block_size, direct, cancel_event, sample_window_s)
+    except OperationCancelled:
+        raise
     except Exception as e:
         logging.error(f"Error testing read speed on {drive}: {e}")
-        return f"Error: {str(e)}"
+        return {"error": str(e)}
     finally:
-        try:
+        _remove_test_file(temp_file)
+
+def _remove_test_file(temp_file):
+    try:
+        if os.path.exists(temp_file):
             os.remove(temp_file)
-        except Exception as e:
-            logging.error(f"Error removing temp file on {drive}: {e}")
+    except Exception as e:
+        logging.error(f"Error removing temp file {temp_file}: {e}")
 
-def test_random_io(drive):
-    """Test random read/write performance."""
-    test_size_mb = 50
-    block_size = 4096  # 4KB blocks
+def test_random_io(drive, test_size_mb=RANDOM_TEST_SIZE_MB, block_size=RANDOM_BLOCK_SIZE,
+                   duration=RANDOM_DURATION_S, workloads=None, direct=True, cancel_event=None, seed=None,
+                   max_ops=None, data=None, sample_window_s=DEFAULT_SAMPLE_WINDOW_S):
+    """Test random read, write and mixed IOPS with latency percentiles at QD1 and QD32."""
     temp_file = os.path.join(drive, "random_test.bin")
     
     try:
         # Create test file
-        with open(temp_file, 'wb') as f:
-            f.write(os.urandom(test_size_mb * 1024 * 1024))
-        
-        # Random read test
-        start_time = time.perf_counter()
-        with open(temp_file, 'rb') as f:
-            for _ in range(1000):
-                pos = random.randrange(0, test_size_mb * 1024 * 1024 - block_size)
-                f.seek(pos)
-                f.read(block_size)
-        
-        random_read_speed = test_size_mb / (time.perf_counter() - start_time)
-        return random_read_speed
+        check_free_space(drive, test_size_mb * 1024 * 1024)
+        prepare_test_file(temp_file, test_size_mb * 1024 * 1024, cancel_event=cancel_event, data=data)
+        return run_random_workloads(temp_file, workloads, block_size, duration, direct, seed, max_ops=max_ops,
+                                    cancel_event=cancel_event, data=data, sample_window_s=sample_window_s)
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        logging.error(f"Error testing random I/O on {drive}: {e}")
+        return {"error": str(e)}
     finally:
-        try:
-            os.remove(temp_file)
-        except Exception as e:
-            logging.error(f"Error removing temp file: {e}")
+        _remove_test_file(temp_file)
 
-def test_file_operations(drive):
-    """Test small file operations performance."""
-    test_dir = os.path.join(drive, "test_dir")
-    num_files = 100
-    results = {}
-    
-    try:
-        # Test directory creation
-        start_time = time.perf_counter()
-        os.makedirs(test_dir, exist_ok=True)
-        results['dir_creation'] = time.perf_counter() - start_time
-
-        # Test small file creation
-        start_time = time.perf_counter()
-        for i in range(num_files):
-            with open(os.path.join(test_dir, f"test_{i}.txt"), 'w') as f:
-                f.write("test" * 100)
-        results['file_creation'] = time.perf_counter() - start_time
-
-        return results
-    finally:
-        try:
-            import shutil
-            shutil.rmtree(test_dir)
-        except Exception as e:
-            logging.error(f"Error cleaning up test directory: {e}")
+def test_file_operations(drive, cancel_event=None, **options):
+    """Test small-file and metadata performance: create, fsync, stat, read, rename and unlink across threads.
 
-def run_benchmark(drive):
-    """Run more comprehensive benchmark using psutil."""
+    options are core.metadata_bench.MetadataBenchmark's (file_count, sizes, depth, threads, phase_limit_s, ...).
+    """
     try:
-        disk_io_before = psutil.disk_io_counters(perdisk=True)[drive]
-        time.sleep(1)  # Short delay to capture changes
-        disk_io_after = psutil.disk_io_counters(perdisk=True)[drive]
-
-        read_bytes = disk_io_after.read_bytes - disk_io_before.read_bytes
-        write_bytes = disk_io_after.write_bytes - disk_io_before.write_bytes
-        read_time = (disk_io_after.read_time - disk_io_before.read_time) / 1000 # convert ms to s
-        write_time = (disk_io_after.write_time - disk_io_before.write_time) / 1000
+        return run_metadata_benchmark(drive, cancel_event=cancel_event, **options)
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        logging.error(f"Error testing file operations on {drive}: {e}")
+        return {"error": str(e)}
 
-        read_speed = (read_bytes / (1024 * 1024)) / read_time if read_time > 0 else 0
-        write_speed = (write_bytes / (1024 * 1024)) / write_time if write_time > 0 else 0
-        return {"read_speed": read_speed, "write_speed": write_speed}
+def run_benchmark(drive, since=None):
+    """Disk-level I/O of the drive's physical disk, as counted by the OS, from the background I/O sampler.
 
-    except KeyError:
-        logging.error(f"Drive {drive} not found by psutil")
-        return None
+    The window covers everything since `since` (a time.monotonic() value,
+    e.g. the start of the test run) or the last second; "seconds" is the
+    span the sampler still held and "truncated" flags a window that starts
+    later than since. Nothing blocks: None is returned if the drive cannot
+    be mapped to a disk or the sampler has no two samples of it yet.
+    """
+    try:
+        sampler = get_io_sampler()
+        if sampler.track(drive) is None:
+            logging.error(f"No I/O counters found for drive {drive}")
+            return None
+        rates = sampler.window(drive, start=since)
+        if rates is None:
+            return None
+        if rates["truncated"]:
+            logging.warning(f"I/O counters of {drive} cover only {rates['seconds']:.0f} s "
+                            f"of the {rates['requested_s']:.0f} s requested")
+        # MB per second of summed request service time, as before
+        read_s, write_s = rates["read_time_ms"] / 1000, rates["write_time_ms"] / 1000
+        rates["read_speed"] = rates["read_bytes"] / (1024 * 1024) / read_s if read_s > 0 else 0
+        rates["write_speed"] = rates["write_bytes"] / (1024 * 1024) / write_s if write_s > 0 else 0
+        return rates
     except Exception as e:
         logging.error(f"Error running benchmark on {drive}: {e}")
         return None
 
-def save_results(results, filename="benchmark_results.json"):
+def save_results(results, drives=None, filename=None):
+    """Appends each drive's results to the history store, and streams them to a report file if filename is given.
+
+    drives (details dicts) map drive letters to disk serials; without them
+    results are keyed by drive letter.
+    """
+    keys = {drive['drive_letter']: drive_key(drive) for drive in drives or []}
+    try:
+        store = get_history_store()
+        for drive_letter, result in results.items():
+            store.record_benchmark(keys.get(drive_letter, drive_letter), drive_letter, result)
+        logging.info(f"Benchmark results of {len(results)} drives recorded in the history store")
+    except Exception as e:
+        logging.error(f"Error recording benchmark results: {e}")
+
+    if not filename:
+        return
     try:
-        with open(filename, "w") as f:
-            json.dump(results, f, indent=4)
+        write_report(filename, ((RECORD_BENCHMARK, drive_letter, result) for drive_letter, result in results.items()),
+                     compress=filename.endswith('.gz'))
         logging.info(f"Benchmark results saved to {filename}")
     except Exception as e:
         logging.error(f"Error saving benchmark results: {e}")
@@ -165,7 +309,9 @@ if __name__ == "__main__":
     drives = get_removable_and_external_drives_details()
     if not drives:
         print("No removable drives found, running tests on local drives")
-        drives = ['C:', 'D:']
+        # Details dicts like the detected ones, so the loops below can index drive['drive_letter']
+        drives = [{"drive_letter": drive} for drive in ('C:\\', 'D:\\') if os.path.isdir(drive)] or \
+            [{"drive_letter": os.getcwd()}]
 
     perf_results = run_performance_tests(drives)
     benchmark_results = {}
@@ -173,7 +319,7 @@ if __name__ == "__main__":
         drive_letter = drive['drive_letter']  # Access drive letter from the dictionary
         benchmark_results[drive_letter] = run_benchmark(drive_letter)  # Use drive letter as key
 
-    save_results({"performance_tests": perf_results, "benchmarks": benchmark_results})
+    save_results(perf_results, drives, filename="benchmark_results.jsonl")
 
     print("Performance Tests Results:")
     print(json.dumps(perf_results, indent=4))
@@ -0,0 +1,282 @@
+# core/profiles.py
+
+import json
+import os
+import re
+from collections import namedtuple
+
+from core.datagen import DEFAULT_COMPRESS_RATIO, PATTERN_COMPRESSIBLE, PATTERN_RANDOM as DATA_RANDOM, PATTERNS as \
+    DATA_PATTERNS
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    tomllib = None
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "profiles")
+DEFAULT_PROFILE = "standard"
+SPEC_VERSION = 1
+# A sequential size, or a random or metadata duration, scaled by core.calibration to fit the per-drive budget
+AUTO = "auto"
+
+PATTERN_SEQUENTIAL = "sequential"
+PATTERN_RANDOM = "random"
+PATTERN_METADATA = "metadata"
+PATTERN_IO_COUNTERS = "io_counters"
+
+# Plan step kinds, run by core.performance.run_drive_tests
+STEP_SEQUENTIAL_WRITE = "sequential_write"
+STEP_SEQUENTIAL_READ = "sequential_read"
+STEP_RANDOM = "random"
+STEP_METADATA = "metadata"
+STEP_IO_COUNTERS = "io_counters"
+
+# Random phases without a size or duration run this long
+DEFAULT_RANDOM_DURATION_S = 5.0
+# Random phases with a size (total bytes to transfer) stop there, or after this long at the latest
+SIZED_RANDOM_DURATION_CAP_S = 600.0
+
+_PHASE_DEFAULTS = {
+    PATTERN_SEQUENTIAL: {"block_size": 1024 * 1024, "size": 100 * 1024 * 1024, "direct": True, "data": DATA_RANDOM},
+    PATTERN_RANDOM: {"block_size": 4096, "queue_depth": 1, "file_size": 50 * 1024 * 1024, "direct": True,
+                     "data": DATA_RANDOM},
+    PATTERN_METADATA: {"data": DATA_RANDOM},
+    PATTERN_IO_COUNTERS: {},
+}
+_PHASE_KEYS = {
+    PATTERN_SEQUENTIAL: {"rw", "block_size", "size", "direct", "seed", "data", "compress_ratio"},
+    PATTERN_RANDOM: {"rw", "read_fraction", "block_size", "queue_depth", "size", "duration", "file_size", "direct",
+                     "seed", "data", "compress_ratio"},
+    PATTERN_METADATA: {"file_count", "sizes", "depth", "fanout", "threads", "duration", "size", "seed", "data",
+                       "compress_ratio"},
+    PATTERN_IO_COUNTERS: set(),
+}
+_AUTO_KEYS = {
+    PATTERN_SEQUENTIAL: {"size"},
+    PATTERN_RANDOM: {"duration"},
+    PATTERN_METADATA: {"duration"},
+    PATTERN_IO_COUNTERS: set(),
+}
+_READ_FRACTIONS = {"read": 1.0, "write": 0.0}
+_SIZE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(i?b)?\s*$', re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+PlanStep = namedtuple("PlanStep", ["kind", "names", "params"])
+# spec is the normalized profile (every default applied, sizes in bytes) and is embedded in results
+ExecutionPlan = namedtuple("ExecutionPlan", ["spec", "steps"])
+
+
+def parse_size(value):
+    """Bytes from an int or a size string such as "4K", "1M", "64MiB" or "2GB" (binary units)."""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid size: {value!r}")
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def list_profiles():
+    """Names of the built-in profiles."""
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(PROFILE_DIR)
+                  if name.endswith((".json", ".toml")))
+
+
+def load_profile(name_or_path=DEFAULT_PROFILE):
+    """Load a job spec from a .json/.toml path, or a built-in profile by name."""
+    path = name_or_path
+    if not os.path.exists(path):
+        for extension in (".json", ".toml"):
+            candidate = os.path.join(PROFILE_DIR, name_or_path + extension)
+            if os.path.exists(candidate):
+                path = candidate
+                break
+        else:
+            raise ValueError(f"No profile named {name_or_path!r} (built-in: {', '.join(list_profiles())})")
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("TOML profiles need Python 3.11 or later; use JSON")
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _normalize_phase(index, phase, defaults):
+    if not isinstance(phase, dict):
+        raise ValueError(f"Phase {index} is not a table/object")
+    pattern = phase.get("pattern")
+    if pattern not in _PHASE_DEFAULTS:
+        raise ValueError(f"Phase {index}: pattern must be one of {', '.join(_PHASE_DEFAULTS)}, not {pattern!r}")
+    name = phase.get("name") or f"{pattern}_{index}"
+    allowed = _PHASE_KEYS[pattern]
+    unknown = set(phase) - allowed - {"name", "pattern"}
+    if unknown:
+        raise ValueError(f"Phase {name}: unknown keys {', '.join(sorted(unknown))}")
+
+    # Profile defaults apply where the pattern takes the key; the phase overrides them
+    normalized = dict(_PHASE_DEFAULTS[pattern])
+    normalized.update({key: value for key, value in defaults.items() if key in allowed})
+    normalized.update({key: value for key, value in phase.items() if key not in ("name", "pattern")})
+    for key in list(normalized):
+        if normalized[key] == AUTO and key not in _AUTO_KEYS[pattern]:
+            raise ValueError(f"Phase {name}: {key} cannot be {AUTO!r}")
+    for key in ("block_size", "size", "file_size"):
+        if key in normalized and normalized[key] != AUTO:
+            normalized[key] = parse_size(normalized[key])
+            if normalized[key] <= 0:
+                raise ValueError(f"Phase {name}: {key} must be positive")
+    if "data" in normalized:
+        if normalized["data"] not in DATA_PATTERNS:
+            raise ValueError(f"Phase {name}: data must be one of {', '.join(DATA_PATTERNS)}")
+        if normalized["data"] == PATTERN_COMPRESSIBLE:
+            normalized["compress_ratio"] = float(normalized.get("compress_ratio", DEFAULT_COMPRESS_RATIO))
+            if normalized["compress_ratio"] < 1:
+                raise ValueError(f"Phase {name}: compress_ratio must be at least 1")
+        else:
+            normalized.pop("compress_ratio", None)
+
+    if pattern == PATTERN_SEQUENTIAL:
+        if normalized.get("rw") not in _READ_FRACTIONS:
+            raise ValueError(f"Phase {name}: sequential rw must be 'read' or 'write'")
+        if normalized["size"] != AUTO:
+            # The sequential tests work in whole MiB
+            normalized["size"] -= normalized["size"] % (1024 * 1024)
+            if normalized["size"] < normalized["block_size"]:
+                raise ValueError(f"Phase {name}: size must be at least 1 MiB and one block")
+    elif pattern == PATTERN_RANDOM:
+        rw = normalized.pop("rw", None)
+        if "read_fraction" not in normalized:
+            if rw not in _READ_FRACTIONS:
+                raise ValueError(f"Phase {name}: random phases need rw ('read'/'write') or read_fraction")
+            normalized["read_fraction"] = _READ_FRACTIONS[rw]
+        if not 0.0 <= float(normalized["read_fraction"]) <= 1.0:
+            raise ValueError(f"Phase {name}: read_fraction must be between 0 and 1")
+        normalized["read_fraction"] = float(normalized["read_fraction"])
+        if int(normalized["queue_depth"]) < 1:
+            raise ValueError(f"Phase {name}: queue_depth must be at least 1")
+        normalized["file_size"] -= normalized["file_size"] % (1024 * 1024)
+        if normalized["file_size"] < normalized["block_size"]:
+            raise ValueError(f"Phase {name}: file_size must be at least 1 MiB and one block")
+        if "size" not in normalized and "duration" not in normalized:
+            normalized["duration"] = DEFAULT_RANDOM_DURATION_S
+    return name, pattern, normalized
+
+
+def compile_profile(spec):
+    """Validate a job spec and compile it into an ExecutionPlan.
+
+    A spec is {"name", "description", "defaults", "phases": [...]}; each
+    phase has a name, a pattern (sequential, random, metadata or
+    io_counters) and that pattern's keys: rw or read_fraction, block_size,
+    queue_depth, size or duration, file_size, seed, direct, and data
+    (random, zeros or compressible, with compress_ratio). "defaults"
+    fill in keys a phase leaves out. A sequential size or a random or
+    metadata duration may be "auto", to be sized by a calibration probe
+    within the spec's "budget_s" per drive (see core.calibration); with a
+    "target_half_width_percent", an auto phase whose 95% confidence
+    interval is wider than that reruns longer while the budget has room.
+    Consecutive random phases sharing a test file, block size, length,
+    mode and seed become one step, so the file is prepared once; a
+    sequential write followed by a read of the same size leaves its file
+    behind for the read.
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get("phases"), list) or not spec["phases"]:
+        raise ValueError("A profile needs a non-empty 'phases' list")
+    defaults = dict(spec.get("defaults", {}))
+    budget_s = spec.get("budget_s")
+    if budget_s is not None and (isinstance(budget_s, bool) or not isinstance(budget_s, (int, float)) or
+                                 budget_s <= 0):
+        raise ValueError("budget_s must be a positive number of seconds")
+    target = spec.get("target_half_width_percent")
+    if target is not None and (isinstance(target, bool) or not isinstance(target, (int, float)) or target <= 0):
+        raise ValueError("target_half_width_percent must be a positive percentage")
+    phases, names = [], set()
+    for index, phase in enumerate(spec["phases"]):
+        name, pattern, normalized = _normalize_phase(index, phase, defaults)
+        if name in names:
+            raise ValueError(f"Phase name {name!r} is used twice")
+        names.add(name)
+        phases.append((name, pattern, normalized))
+    for pattern in (PATTERN_METADATA, PATTERN_IO_COUNTERS):
+        if sum(1 for _, phase_pattern, _ in phases if phase_pattern == pattern) > 1:
+            raise ValueError(f"A profile can have only one {pattern} phase")
+
+    steps = []
+    for position, (name, pattern, params) in enumerate(phases):
+        # core.datagen.get_data_pattern arguments for the data the phase writes
+        data = {"pattern": params.get("data"), "seed": params.get("seed")}
+        if "compress_ratio" in params:
+            data["compress_ratio"] = params["compress_ratio"]
+        if pattern == PATTERN_SEQUENTIAL:
+            size_mb = AUTO if params["size"] == AUTO else params["size"] // (1024 * 1024)
+            if params["rw"] == "write":
+                following = phases[position + 1] if position + 1 < len(phases) else None
+                keep_file = following is not None and following[1] == PATTERN_SEQUENTIAL and \
+                    following[2]["rw"] == "read" and following[2]["size"] == params["size"]
+                steps.append(PlanStep(STEP_SEQUENTIAL_WRITE, [name], {
+                    "size_mb": size_mb, "block_size": params["block_size"],
+                    "direct": params["direct"], "keep_file": keep_file, "data": data}))
+            else:
+                steps.append(PlanStep(STEP_SEQUENTIAL_READ, [name], {
+                    "size_mb": size_mb, "block_size": params["block_size"],
+                    "direct": params["direct"]}))
+        elif pattern == PATTERN_RANDOM:
+            max_ops = None
+            duration = params.get("duration")
+            if "size" in params:
+                # A size is total bytes across the queue; each worker stops at its share
+                max_ops = max(1, -(-params["size"] // params["block_size"] // params["queue_depth"]))
+                duration = duration or SIZED_RANDOM_DURATION_CAP_S
+            step_params = {"file_size_mb": params["file_size"] // (1024 * 1024), "block_size": params["block_size"],
+                           "duration": duration if duration == AUTO else float(duration), "max_ops": max_ops,
+                           "direct": params["direct"], "seed": params.get("seed"), "data": data}
+            workload = (name, params["read_fraction"], int(params["queue_depth"]))
+            previous = steps[-1] if steps else None
+            if previous is not None and previous.kind == STEP_RANDOM and \
+                    {key: value for key, value in previous.params.items() if key != "workloads"} == step_params:
+                previous.names.append(name)
+                previous.params["workloads"].append(workload)
+            else:
+                steps.append(PlanStep(STEP_RANDOM, [name], dict(step_params, workloads=[workload])))
+        elif pattern == PATTERN_METADATA:
+            options = {key: params[key] for key in ("file_count", "depth", "fanout", "threads", "seed")
+                       if key in params}
+            options["data"] = data
+            if "sizes" in params:
+                options["sizes"] = [(parse_size(size), weight) for size, weight in params["sizes"]]
+            if "duration" in params:
+                options["phase_limit_s"] = params["duration"] if params["duration"] == AUTO else \
+                    float(params["duration"])
+            if "size" in params:
+                options["max_bytes"] = params["size"]
+            steps.append(PlanStep(STEP_METADATA, [name], options))
+        else:
+            steps.append(PlanStep(STEP_IO_COUNTERS, [name], {}))
+
+    normalized_spec = {
+        "name": spec.get("name", "custom"),
+        "description": spec.get("description", ""),
+        "version": spec.get("version", SPEC_VERSION),
+        "budget_s": budget_s,
+        "target_half_width_percent": target,
+        "phases": [dict(params, name=name, pattern=pattern) for name, pattern, params in phases],
+    }
+    return ExecutionPlan(normalized_spec, steps)
+
+
+def is_adaptive(plan):
+    """Whether any step of a plan is sized "auto" and needs a calibration probe first."""
+    return any(AUTO in (step.params.get("size_mb"), step.params.get("duration"), step.params.get("phase_limit_s"))
+               for step in plan.steps)
+
+
+def get_plan(profile=None):
+    """ExecutionPlan for a profile given as a built-in name, a file path, a spec dict or a compiled plan."""
+    if isinstance(profile, ExecutionPlan):
+        return profile
+    if isinstance(profile, dict):
+        return compile_profile(profile)
+    return compile_profile(load_profile(profile or DEFAULT_PROFILE))
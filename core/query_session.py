@@ -0,0 +1,114 @@
+# core/query_session.py
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_QUERY_TIMEOUT_S = 15.0
+
+
+class WmiSession:
+    """A long-lived thread owning COM and its WMI connections.
+
+    Connecting to WMI costs hundreds of milliseconds (and a PowerShell or
+    wmic process well over a second), so queries are sent to this thread
+    instead. COM objects cannot leave the thread that created them: call()
+    takes a function that receives connect(namespace) and must return plain
+    Python data.
+    """
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._serve, name="driveman-wmi-session", daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        import pythoncom
+        import wmi
+
+        pythoncom.CoInitialize()
+        connections = {}
+
+        def connect(namespace="root\\cimv2"):
+            if namespace not in connections:
+                connections[namespace] = wmi.WMI(namespace=namespace)
+            return connections[namespace]
+
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    return
+                fn, future = request
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn(connect))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            connections.clear()
+            pythoncom.CoUninitialize()
+
+    def call(self, fn, timeout=DEFAULT_QUERY_TIMEOUT_S):
+        """Run fn(connect) on the session thread; raises TimeoutError if it takes longer than timeout."""
+        future = Future()
+        self._requests.put((fn, future))
+        return future.result(timeout)
+
+    def close(self):
+        self._requests.put(None)
+
+
+class QuerySessionPool:
+    """Hands out up to `size` reusable sessions to concurrent callers.
+
+    A session whose query times out is presumed hung and is dropped (its
+    daemon thread is left to finish or die with the process); the next
+    caller gets a fresh one, so one stuck WMI provider cannot stall every
+    later health check.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, session_factory=WmiSession):
+        self._session_factory = session_factory
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def call(self, fn, timeout=DEFAULT_QUERY_TIMEOUT_S):
+        with self._slots:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                session = self._session_factory()
+            try:
+                result = session.call(fn, timeout)
+            except TimeoutError:
+                logging.warning(f"Query session timed out after {timeout}s; starting a new one")
+                session.close()
+                raise
+            with self._lock:
+                self._idle.append(session)
+            return result
+
+    def close(self):
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            session.close()
+
+
+_wmi_sessions = None
+_wmi_sessions_lock = threading.Lock()
+
+
+def get_wmi_sessions():
+    """Return the process-wide WMI session pool, creating it on first use."""
+    global _wmi_sessions
+    if _wmi_sessions is None:
+        with _wmi_sessions_lock:
+            if _wmi_sessions is None:
+                _wmi_sessions = QuerySessionPool()
+    return _wmi_sessions
@@ -0,0 +1,167 @@
+# core/random_io.py
+
+import logging
+import os
+import random
+import threading
+import time
+
+from core.cancellation import OperationCancelled, check_cancelled
+from core.datagen import get_data_pattern
+from core.histogram import LatencyHistogram, merge_histograms
+from core.sampling import confidence_interval
+from core.io_engine import aligned_buffer, drop_cache, open_unbuffered, read_at, write_at, IO_MODE_DIRECT
+
+DEFAULT_BLOCK_SIZE = 4096
+DEFAULT_DURATION_S = 5.0
+# IOPS is sampled per window for the confidence interval
+DEFAULT_SAMPLE_WINDOW_S = 0.25
+
+# name, read fraction, queue depth
+DEFAULT_WORKLOADS = [
+    ("random_read_qd1", 1.0, 1),
+    ("random_write_qd1", 0.0, 1),
+    ("mixed_70_30_qd1", 0.7, 1),
+    ("random_read_qd32", 1.0, 32),
+]
+
+
+def random_io(path, block_size=DEFAULT_BLOCK_SIZE, duration=DEFAULT_DURATION_S, queue_depth=1,
+              read_fraction=1.0, direct=True, seed=None, max_ops=None, cancel_event=None, data=None,
+              sample_window_s=DEFAULT_SAMPLE_WINDOW_S):
+    """Run random block_size I/O against an existing file at the given queue depth.
+
+    Queue depth N is N worker threads each keeping one request outstanding
+    with positional reads/writes (which release the GIL). Offsets are block
+    aligned so the file can be opened for direct I/O. Each write is stamped
+    per 4 KiB sector by data first, so no two writes carry the same
+    sectors (nor repeat ones just read). The run stops after
+    duration seconds, or max_ops operations per worker if given. IOPS is
+    also counted per sample_window_s, for the "confidence" interval.
+    """
+    file_size = os.path.getsize(path)
+    block_count = file_size // block_size
+    if block_count < 1:
+        raise ValueError(f"{path} is smaller than one {block_size}-byte block")
+
+    access = 'r' if read_fraction >= 1.0 else 'rw'
+    data = data or get_data_pattern()
+    base_seed = random.randrange(2**32) if seed is None else seed
+    stop = threading.Event()
+    workers = []
+    io_modes = set()
+    errors = []
+
+    def worker(index):
+        rng = random.Random(base_seed + index)
+        buffer = aligned_buffer(-(-block_size // 4096) * 4096)
+        data.fill(buffer, index)
+        view = memoryview(buffer)[:block_size]
+        stamp = data.stamp
+        stats = workers[index]
+        record = stats["latency"].record
+        perf_counter_ns = time.perf_counter_ns
+        raw = None
+        try:
+            raw, mode = open_unbuffered(path, direct=direct, access=access)
+            io_modes.add(mode)
+            while not stop.is_set():
+                offset = rng.randrange(block_count) * block_size
+                is_read = read_fraction >= 1.0 or rng.random() < read_fraction
+                if not is_read:
+                    stamp(view, stats["writes"] * queue_depth + index)
+                started = perf_counter_ns()
+                if is_read:
+                    read_at(raw, view, offset)
+                else:
+                    write_at(raw, view, offset)
+                record(perf_counter_ns() - started)
+                stats["reads" if is_read else "writes"] += 1
+                if max_ops is not None and stats["reads"] + stats["writes"] >= max_ops:
+                    break
+            if access == 'rw':
+                os.fsync(raw.fileno())
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            view.release()
+            if raw is not None:
+                raw.close()
+
+    # Nothing from preparing the file may still be cached or awaiting writeback
+    drop_cache(path)
+
+    threads = []
+    for index in range(queue_depth):
+        workers.append({"reads": 0, "writes": 0, "latency": LatencyHistogram()})
+        threads.append(threading.Thread(target=worker, args=(index,), name=f"driveman-randio-{index}", daemon=True))
+
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    deadline = start_time + duration
+    iops_series = []
+    window_start, window_ops = start_time, 0
+    try:
+        while not stop.is_set() and any(thread.is_alive() for thread in threads):
+            now = time.perf_counter()
+            if now - window_start >= sample_window_s:
+                # Unlocked reads of the workers' counters: a window may be off by an op in flight
+                ops = sum(stats["reads"] + stats["writes"] for stats in workers)
+                iops_series.append((ops - window_ops) / (now - window_start))
+                window_start, window_ops = now, ops
+            remaining = deadline - now
+            if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+                break
+            stop.wait(min(remaining, sample_window_s - (now - window_start), 0.1))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    check_cancelled(cancel_event)
+    if errors:
+        raise errors[0]
+
+    reads = sum(stats["reads"] for stats in workers)
+    writes = sum(stats["writes"] for stats in workers)
+    # Each worker recorded into its own histogram; merge them once at the end
+    latency = merge_histograms(stats["latency"] for stats in workers)
+    ops = reads + writes
+    return {
+        "iops": ops / elapsed if elapsed > 0 else 0,
+        "read_iops": reads / elapsed if elapsed > 0 else 0,
+        "write_iops": writes / elapsed if elapsed > 0 else 0,
+        "mb_s": ops * block_size / (1024 * 1024) / elapsed if elapsed > 0 else 0,
+        "latency_ms": latency.summary(),
+        "latency_histogram": latency.to_dict(),
+        "confidence": confidence_interval(iops_series),
+        "ops": ops,
+        "seconds": elapsed,
+        "block_size": block_size,
+        "queue_depth": queue_depth,
+        "read_fraction": read_fraction,
+        "io_mode": IO_MODE_DIRECT if io_modes == {IO_MODE_DIRECT} else next(iter(io_modes - {IO_MODE_DIRECT}), None),
+        "seed": base_seed,
+        "data": data.describe(),
+    }
+
+def run_random_workloads(path, workloads=None, block_size=DEFAULT_BLOCK_SIZE, duration=DEFAULT_DURATION_S,
+                         direct=True, seed=None, max_ops=None, cancel_event=None, data=None,
+                         sample_window_s=DEFAULT_SAMPLE_WINDOW_S):
+    """Run each (name, read_fraction, queue_depth) workload against path and return {name: result}."""
+    results = {}
+    for name, read_fraction, queue_depth in (workloads or DEFAULT_WORKLOADS):
+        check_cancelled(cancel_event)
+        try:
+            results[name] = random_io(path, block_size, duration, queue_depth, read_fraction,
+                                      direct, seed, max_ops, cancel_event=cancel_event, data=data,
+                                      sample_window_s=sample_window_s)
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            logging.error(f"Error running random workload {name} on {path}: {e}")
+            results[name] = {"error": str(e)}
+    return results
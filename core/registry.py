@@ -0,0 +1,133 @@
+# core/registry.py
+
+import logging
+import threading
+import time
+
+from core.backends import get_backend
+from core.hotplug import DRIVE_ADDED, HotplugWatcher
+
+DEFAULT_TTL_SECONDS = 30
+
+
+class DriveRegistry:
+    """Shared, TTL-bounded snapshot of removable/external drive details.
+
+    Concurrent callers of get_drives() share a single in-flight scan, and
+    hotplug events patch the snapshot in place so attaching a stick never
+    triggers a full rescan.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, backend=None):
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._cond = threading.Condition()
+        self._drives = None           # {drive_letter: details}
+        self._scanned_at = 0.0
+        self._scanning = False
+        self._scan_error = None
+        self._generation = 0          # bumped by events and invalidate()
+        self._watcher = None
+        self._listeners = []
+
+    def _is_fresh(self, max_age):
+        max_age = self.ttl_seconds if max_age is None else max_age
+        return self._drives is not None and time.monotonic() - self._scanned_at <= max_age
+
+    def _snapshot(self):
+        return [dict(details) for details in self._drives.values()]
+
+    def get_drives(self, max_age=None, force=False):
+        """Return the latest drive details, scanning only if the snapshot is older than max_age (default: TTL)."""
+        with self._cond:
+            if not force and self._is_fresh(max_age):
+                return self._snapshot()
+
+            if self._scanning:
+                # Someone else is already scanning; share their result
+                while self._scanning:
+                    self._cond.wait()
+                if self._scan_error is not None:
+                    raise self._scan_error
+                return self._snapshot()
+
+            self._scanning = True
+            self._scan_error = None
+            generation = self._generation
+
+        drives, error = None, None
+        try:
+            if self.backend is None:
+                self.backend = get_backend()
+            drives = self.backend.list_drives()
+        except Exception as e:
+            logging.error(f"Error scanning drives: {e}")
+            error = e
+
+        with self._cond:
+            self._scanning = False
+            self._scan_error = error
+            if error is None:
+                self._drives = {details["drive_letter"]: details for details in drives}
+                # An event raced with the scan: keep the result but let the next caller rescan
+                self._scanned_at = time.monotonic() if generation == self._generation else 0.0
+            self._cond.notify_all()
+            if error is not None:
+                raise error
+            return self._snapshot()
+
+    def get_drive(self, drive_letter, max_age=None):
+        """Return the details of one drive, or None if it is not attached."""
+        for details in self.get_drives(max_age):
+            if details["drive_letter"] == drive_letter:
+                return details
+        return None
+
+    def invalidate(self):
+        """Force the next get_drives() call to rescan."""
+        with self._cond:
+            self._scanned_at = 0.0
+            self._generation += 1
+
+    def add_listener(self, callback):
+        """Call callback(event) after a hotplug event has been applied to the snapshot."""
+        self._listeners.append(callback)
+
+    def _on_drive_event(self, event):
+        with self._cond:
+            self._generation += 1
+            if self._drives is not None:
+                if event.action == DRIVE_ADDED:
+                    self._drives[event.drive_letter] = event.details
+                else:
+                    self._drives.pop(event.drive_letter, None)
+            else:
+                self._scanned_at = 0.0
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                logging.error(f"Error in drive registry listener {callback}: {e}")
+
+    def watch(self):
+        """Start a hotplug watcher that keeps this registry current."""
+        if self._watcher is not None:
+            return self._watcher
+        known = [details["drive_letter"] for details in self.get_drives()]
+        self._watcher = HotplugWatcher(self.backend)
+        self._watcher.subscribe(self._on_drive_event)
+        self._watcher.start(known_drives=known)
+        return self._watcher
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+
+drive_registry = DriveRegistry()
+
+
+def get_drives(max_age=None, force=False):
+    """Return drive details from the shared registry."""
+    return drive_registry.get_drives(max_age, force)
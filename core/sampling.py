@@ -0,0 +1,145 @@
+# core/sampling.py
+
+import statistics
+import time
+from array import array
+
+DEFAULT_WINDOW_S = 0.5
+# A cliff is a sustained drop below this fraction of the initial plateau
+CLIFF_DROP_RATIO = 0.5
+CLIFF_MIN_WINDOWS = 4
+CONFIDENCE_LEVEL = 0.95
+# Two-sided 95% Student's t critical values by degrees of freedom; beyond the table the normal value is close enough
+_T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+         2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+_Z_95 = 1.960
+
+
+class ThroughputSampler:
+    """Records MB/s over fixed time windows (or fixed byte windows) during a transfer.
+
+    Samples go into array('f') columns (4 bytes per value): MB/s for each
+    window, plus the elapsed seconds and MB transferred when it closed, so
+    the curve can be plotted against time or against position on the drive.
+    """
+
+    def __init__(self, window_s=DEFAULT_WINDOW_S, window_bytes=None):
+        self.window_s = window_s
+        self.window_bytes = window_bytes
+        self.mb_s = array('f')
+        self.elapsed_s = array('f')
+        self.position_mb = array('f')
+        self._start = None
+        self._window_start = None
+        self._window_bytes = 0
+        self._total_bytes = 0
+
+    def start(self, now=None):
+        self._start = self._window_start = time.perf_counter() if now is None else now
+
+    def add(self, nbytes, now=None):
+        """Account nbytes transferred; closes the current window when it is full."""
+        if now is None:
+            now = time.perf_counter()
+        if self._start is None:
+            self.start(now)
+        self._window_bytes += nbytes
+        self._total_bytes += nbytes
+        if self.window_bytes is not None:
+            if self._window_bytes >= self.window_bytes:
+                self._close_window(now)
+        elif now - self._window_start >= self.window_s:
+            self._close_window(now)
+
+    def finish(self, now=None):
+        """Close the last, partial window."""
+        if self._window_bytes and self._start is not None:
+            self._close_window(time.perf_counter() if now is None else now)
+
+    def _close_window(self, now):
+        duration = now - self._window_start
+        if duration > 0:
+            self.mb_s.append(self._window_bytes / (1024 * 1024) / duration)
+            self.elapsed_s.append(now - self._start)
+            self.position_mb.append(self._total_bytes / (1024 * 1024))
+        self._window_start = now
+        self._window_bytes = 0
+
+    def to_dict(self):
+        """Serialize the series, rounded to 0.01, for the results JSON."""
+        return {
+            "window_s": self.window_s if self.window_bytes is None else None,
+            "window_bytes": self.window_bytes,
+            "mb_s": [round(value, 2) for value in self.mb_s],
+            "elapsed_s": [round(value, 2) for value in self.elapsed_s],
+            "position_mb": [round(value, 2) for value in self.position_mb],
+        }
+
+
+def detect_cache_cliff(sampler, drop_ratio=CLIFF_DROP_RATIO, min_windows=CLIFF_MIN_WINDOWS):
+    """Find where throughput falls off the initial plateau and stays down.
+
+    Every split point is scored by mean throughput before vs. after it
+    (prefix sums keep this linear in the number of windows); the best split
+    is a cliff if the first window after it, the median of the next
+    min_windows windows and the median of the whole tail are all below
+    drop_ratio times the median before it.
+    Returns None if there is no cliff.
+    """
+    series = list(sampler.mb_s)
+    count = len(series)
+    if count < min_windows + 2:
+        return None
+
+    prefix = [0.0]
+    for value in series:
+        prefix.append(prefix[-1] + value)
+
+    best_index, best_ratio = None, 0.0
+    for index in range(2, count - min_windows + 1):
+        before = prefix[index] / index
+        after = (prefix[count] - prefix[index]) / (count - index)
+        ratio = before / after if after > 0 else float('inf')
+        if ratio > best_ratio:
+            best_index, best_ratio = index, ratio
+
+    if best_index is None:
+        return None
+    before = statistics.median(series[:best_index])
+    after = statistics.median(series[best_index:])
+    threshold = before * drop_ratio
+    # The drop has to hold right after the split too, not just on average over the tail
+    if before <= 0 or after >= threshold or series[best_index] >= threshold or \
+            statistics.median(series[best_index:best_index + min_windows]) >= threshold:
+        return None
+    return {
+        "window": best_index,
+        "position_mb": round(sampler.position_mb[best_index - 1], 2),
+        "elapsed_s": round(sampler.elapsed_s[best_index - 1], 2),
+        "before_mb_s": round(before, 2),
+        "after_mb_s": round(after, 2),
+    }
+
+
+def confidence_interval(samples):
+    """95% confidence interval of the mean of per-window samples (MB/s, IOPS).
+
+    Returns None with fewer than two samples. Windows of one run are not
+    fully independent (caches, thermal throttling), so treat the interval
+    as a measure of how steady the run was rather than a strict bound.
+    """
+    samples = list(samples)
+    count = len(samples)
+    if count < 2:
+        return None
+    mean = statistics.fmean(samples)
+    critical = _T_95[count - 2] if count - 2 < len(_T_95) else _Z_95
+    half_width = critical * statistics.stdev(samples) / count ** 0.5
+    return {
+        "level": CONFIDENCE_LEVEL,
+        "samples": count,
+        "mean": round(mean, 2),
+        "low": round(mean - half_width, 2),
+        "high": round(mean + half_width, 2),
+        "half_width_percent": round(100 * half_width / mean, 2) if mean > 0 else None,
+    }
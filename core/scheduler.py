@@ -0,0 +1,129 @@
+# core/scheduler.py
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from core.cancellation import OperationCancelled
+from core.performance import run_drive_tests
+from core.profiles import get_plan
+
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_MAX_PER_HUB = 1
+
+
+def physical_device_key(drive):
+    """Volumes sharing this key live on the same physical disk and are tested one after another."""
+    disk_id = drive.get("disk_id")
+    return disk_id if disk_id and disk_id != "N/A" else drive["drive_letter"]
+
+
+class BenchmarkScheduler:
+    """Benchmarks independent physical devices in parallel.
+
+    Volumes of one physical disk always run serially, at most max_per_hub
+    disks behind the same external USB hub run at once (None for no limit),
+    and no more than max_concurrent disks run overall. Each drive's result is
+    passed to result_callback as soon as it finishes, from the worker thread.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, max_per_hub=DEFAULT_MAX_PER_HUB,
+                 drive_test=run_drive_tests):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_hub = max_per_hub
+        self.drive_test = drive_test
+
+    def _group_by_device(self, drives):
+        groups = OrderedDict()
+        for drive in drives:
+            groups.setdefault(physical_device_key(drive), []).append(drive)
+        return list(groups.values())
+
+    def run(self, drives, progress_callback=None, result_callback=None, cancel_event=None):
+        """Benchmark drives and return {drive_letter: result}."""
+        results = {}
+        if not drives:
+            return results
+
+        lock = threading.Lock()
+        drive_progress = {drive['drive_letter']: 0.0 for drive in drives}
+
+        def report_progress(drive_letter, fraction, message):
+            if progress_callback is None:
+                return
+            with lock:
+                drive_progress[drive_letter] = fraction
+                overall = sum(drive_progress.values()) / len(drive_progress)
+            progress_callback(overall, message)
+
+        def run_group(group):
+            for drive in group:
+                drive_letter = drive['drive_letter']
+                try:
+                    logging.info(f"Running performance tests on {drive_letter}...")
+                    result = self.drive_test(
+                        drive_letter,
+                        lambda fraction, message, drive_letter=drive_letter: report_progress(drive_letter, fraction, message),
+                        cancel_event
+                    )
+                except OperationCancelled:
+                    raise
+                except Exception as e:
+                    logging.error(f"Error running performance tests on {drive_letter}: {e}")
+                    result = {"error": str(e)}
+                with lock:
+                    results[drive_letter] = result
+                report_progress(drive_letter, 1.0, f"Finished {drive_letter}")
+                if result_callback:
+                    try:
+                        result_callback(drive_letter, result)
+                    except Exception as e:
+                        logging.error(f"Error in benchmark result callback for {drive_letter}: {e}")
+
+        pending = self._group_by_device(drives)
+        hub_load = {}
+        running = {}
+        cancelled = False
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="driveman-bench") as pool:
+            while pending or running:
+                # Launch every group whose hub still has room, up to the global limit
+                for group in list(pending):
+                    if cancelled or len(running) >= self.max_concurrent:
+                        break
+                    hub = group[0].get("usb_hub")
+                    if hub and self.max_per_hub is not None and hub_load.get(hub, 0) >= self.max_per_hub:
+                        continue
+                    pending.remove(group)
+                    if hub:
+                        hub_load[hub] = hub_load.get(hub, 0) + 1
+                    running[pool.submit(run_group, group)] = hub
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    hub = running.pop(future)
+                    if hub:
+                        hub_load[hub] -= 1
+                    try:
+                        future.result()
+                    except OperationCancelled:
+                        cancelled = True
+                        pending.clear()
+
+        if cancelled:
+            raise OperationCancelled()
+        return results
+
+
+def schedule_performance_tests(drives, progress_callback=None, result_callback=None, cancel_event=None,
+                               max_concurrent=DEFAULT_MAX_CONCURRENT, max_per_hub=DEFAULT_MAX_PER_HUB, profile=None,
+                               budget_s=None):
+    """Drop-in parallel replacement for core.performance.run_performance_tests."""
+    # Compiled once, so every drive runs the same plan and a bad spec fails before any drive starts
+    scheduler = BenchmarkScheduler(max_concurrent, max_per_hub,
+                                   partial(run_drive_tests, profile=get_plan(profile), budget_s=budget_s))
+    return scheduler.run(drives, progress_callback, result_callback, cancel_event)
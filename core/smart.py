@@ -0,0 +1,237 @@
+# core/smart.py
+
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+
+# ATA SMART READ DATA page: 2-byte revision, then 30 12-byte attribute entries
+# (id, flags, current, worst, 48-bit raw value, reserved)
+SMART_TABLE_OFFSET = 2
+SMART_ATTRIBUTE_COUNT = 30
+_ATTRIBUTE = struct.Struct('<BHBBIHx')
+SMART_TABLE_END = SMART_TABLE_OFFSET + SMART_ATTRIBUTE_COUNT * _ATTRIBUTE.size
+SMART_PAGE_SIZE = 512
+
+# Hex dump parsing: an "offset:" (xxd) or a 6-8 digit offset followed by data (hexdump -C, od),
+# and the |...| (hexdump -C) or >...< (od -t x1z) ASCII columns
+_OFFSET = re.compile(r'^\s*([0-9a-fA-F]{4,}(?=:)|[0-9a-fA-F]{6,8}(?=\s))(:\s*|\s+)')
+_OFFSET_ONLY = re.compile(r'^\s*[0-9a-fA-F]{6,8}$')
+_ASCII_COLUMN = re.compile(r'\s+(\|.*\||>.*<)$')
+
+DEFAULT_CACHE_TTL_S = 300.0
+
+ATTRIBUTE_NAMES = {
+    1: "Raw_Read_Error_Rate",
+    3: "Spin_Up_Time",
+    4: "Start_Stop_Count",
+    5: "Reallocated_Sector_Ct",
+    7: "Seek_Error_Rate",
+    9: "Power_On_Hours",
+    10: "Spin_Retry_Count",
+    12: "Power_Cycle_Count",
+    173: "Wear_Leveling_Count",
+    177: "Wear_Leveling_Count",
+    181: "Program_Fail_Cnt_Total",
+    182: "Erase_Fail_Count_Total",
+    187: "Reported_Uncorrect",
+    188: "Command_Timeout",
+    190: "Airflow_Temperature_Cel",
+    192: "Power-Off_Retract_Count",
+    194: "Temperature_Celsius",
+    196: "Reallocated_Event_Count",
+    197: "Current_Pending_Sector",
+    198: "Offline_Uncorrectable",
+    199: "UDMA_CRC_Error_Count",
+    202: "Percent_Lifetime_Remain",
+    231: "SSD_Life_Left",
+    233: "Media_Wearout_Indicator",
+    241: "Total_LBAs_Written",
+    242: "Total_LBAs_Read",
+}
+
+# Counters whose raw value should stay at zero
+REALLOCATED_SECTORS = 5
+PENDING_SECTORS = 197
+OFFLINE_UNCORRECTABLE = 198
+SECTOR_ERROR_ATTRIBUTES = (REALLOCATED_SECTORS, PENDING_SECTORS, OFFLINE_UNCORRECTABLE)
+# Wear indicators count down from 100 in their normalized value
+WEAR_ATTRIBUTES = (173, 177, 202, 231, 233)
+TEMPERATURE_ATTRIBUTES = (194, 190)
+
+FLAG_PREFAILURE = 0x0001
+
+
+def decode_smart_page(page):
+    """Decode a SMART attribute page (bytes-like, at least 362 bytes) into {"revision", "attributes"}.
+
+    attributes maps attribute id to {"name", "flags", "prefailure", "current",
+    "worst", "raw"}; empty slots (id 0) are skipped. Windows'
+    MSStorageDriver_ATAPISmartData.VendorSpecific (362 bytes) and the
+    512-byte page from the Linux HDIO_DRIVE_CMD ioctl share this layout.
+    """
+    page = bytes(page)
+    if len(page) < SMART_TABLE_END:
+        raise ValueError(f"SMART page is {len(page)} bytes, expected at least {SMART_TABLE_END}")
+    attributes = {}
+    for attribute_id, flags, current, worst, raw_low, raw_high in \
+            _ATTRIBUTE.iter_unpack(page[SMART_TABLE_OFFSET:SMART_TABLE_END]):
+        if attribute_id == 0:
+            continue
+        attributes[attribute_id] = {
+            "name": ATTRIBUTE_NAMES.get(attribute_id, f"Unknown_Attribute_{attribute_id}"),
+            "flags": flags,
+            "prefailure": bool(flags & FLAG_PREFAILURE),
+            "current": current,
+            "worst": worst,
+            "raw": raw_low | (raw_high << 32),
+        }
+    return {"revision": struct.unpack_from('<H', page)[0], "attributes": attributes}
+
+
+def _repeat_until(data, previous, offset_text):
+    """Expand a "*" line: repeat the previous line until the dump reaches offset_text."""
+    offset = int(offset_text, 8 if len(offset_text) == 7 else 16)
+    if not previous or offset < len(data):
+        raise ValueError(f"Hex dump repeats a line but the next offset is {offset_text}")
+    while len(data) < offset:
+        data.extend(previous[:offset - len(data)])
+
+
+def smart_page_from_hex(text, size=SMART_PAGE_SIZE):
+    """Parse a captured hex dump of a SMART page into bytes; raises ValueError unless it holds size bytes.
+
+    Accepts xxd (default and -p), hexdump -C, od -t x1 (with or without
+    -A x and z) and bare hex. The ASCII column is cut off by position: the
+    trailing |...| or >...< pair, or everything after the first double
+    space in xxd's grouped output. A "*" line (hexdump/od without -v)
+    repeats the previous line up to the next offset; 7-digit offsets are
+    od's octal, all others hex. hexdump's default 16-bit word output is
+    byte-swapped and not accepted; capture with -C.
+    """
+    data = bytearray()
+    previous = b''
+    repeating = has_offsets = False
+    for line in text.splitlines():
+        line = _ASCII_COLUMN.sub('', line.rstrip())
+        if not line.strip():
+            continue
+        if line.strip() == '*':
+            repeating = True
+            continue
+        match = _OFFSET.match(line)
+        if has_offsets and not match and _OFFSET_ONLY.match(line):
+            # The closing offset line of hexdump/od
+            if repeating:
+                _repeat_until(data, previous, line.strip())
+                repeating = False
+            continue
+        if match:
+            has_offsets = True
+            line = line[match.end():]
+            if match.group(2).startswith(':'):
+                # xxd: the hex groups never contain a double space, its ASCII column follows one
+                line = line.split('  ')[0]
+            if repeating:
+                _repeat_until(data, previous, match.group(1))
+                repeating = False
+        try:
+            line_bytes = bytes.fromhex(''.join(line.split()))
+        except ValueError:
+            raise ValueError(f"Not a hex dump line: {line!r}") from None
+        previous = line_bytes or previous
+        data.extend(line_bytes)
+    if len(data) != size:
+        raise ValueError(f"Hex dump holds {len(data)} bytes, expected a {size}-byte SMART page")
+    return bytes(data)
+
+
+def temperature_from_attributes(attributes):
+    """Return the drive temperature in Celsius from attribute 194/190 (lowest raw byte), or None."""
+    for attribute_id in TEMPERATURE_ATTRIBUTES:
+        if attribute_id in attributes:
+            return attributes[attribute_id]["raw"] & 0xFF
+    return None
+
+
+def smart_deltas(previous, current):
+    """Changes in sector-error counters (raw) and wear indicators (normalized) between two decodes."""
+    deltas = {}
+    for attribute_id in SECTOR_ERROR_ATTRIBUTES + WEAR_ATTRIBUTES:
+        before = previous["attributes"].get(attribute_id)
+        after = current["attributes"].get(attribute_id)
+        if before is None or after is None:
+            continue
+        field = "raw" if attribute_id in SECTOR_ERROR_ATTRIBUTES else "current"
+        deltas[after["name"]] = {
+            "id": attribute_id,
+            "previous": before[field],
+            "current": after[field],
+            "delta": after[field] - before[field],
+        }
+    return deltas
+
+
+def smart_warnings(snapshot):
+    """Human-readable warnings for non-zero sector error counters and any growth since the last read."""
+    warnings = []
+    attributes = snapshot["attributes"]
+    for attribute_id in SECTOR_ERROR_ATTRIBUTES:
+        attribute = attributes.get(attribute_id)
+        if attribute and attribute["raw"]:
+            warnings.append(f"{attribute['name']}: {attribute['raw']}")
+    for name, change in snapshot.get("deltas", {}).items():
+        if change["id"] in SECTOR_ERROR_ATTRIBUTES and change["delta"] > 0:
+            warnings.append(f"{name} increased by {change['delta']} since the last check")
+        elif change["id"] in WEAR_ATTRIBUTES and change["delta"] < 0:
+            warnings.append(f"{name} dropped by {-change['delta']} since the last check")
+    return warnings
+
+
+class SmartCache:
+    """Decoded SMART snapshots per device serial, refreshed at most every ttl_seconds.
+
+    Repeat health checks within the TTL reuse the last snapshot instead of
+    issuing another query; a refresh keeps the previous snapshot so the new
+    one carries "deltas" against it. Drives that returned no SMART data are
+    cached too, so USB bridges that reject the command are not re-queried.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_CACHE_TTL_S):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, serial, read_page, max_age=None):
+        """Return the snapshot for serial, calling read_page() for raw page bytes when stale."""
+        max_age = self.ttl_seconds if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(serial)
+        if entry is not None and time.monotonic() - entry["time"] <= max_age:
+            return entry["snapshot"]
+
+        page = read_page()
+        snapshot = None
+        if page:
+            snapshot = decode_smart_page(page)
+            snapshot["serial"] = serial
+            snapshot["read_at"] = datetime.now().isoformat()
+            previous = entry["snapshot"] if entry is not None else None
+            snapshot["deltas"] = smart_deltas(previous, snapshot) if previous else {}
+        elif entry is not None:
+            # A transient failure keeps the last good snapshot (and its deltas)
+            snapshot = entry["snapshot"]
+        with self._lock:
+            self._entries[serial] = {"time": time.monotonic(), "snapshot": snapshot}
+        return snapshot
+
+    def invalidate(self, serial=None):
+        with self._lock:
+            if serial is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(serial, None)
+
+
+smart_cache = SmartCache()
@@ -0,0 +1,266 @@
+# core/surface_scan.py
+
+import base64
+import json
+import logging
+import math
+import os
+import statistics
+import time
+from array import array
+
+from core.app_data import data_path
+from core.backends import get_backend
+from core.cancellation import OperationCancelled, check_cancelled
+from core.io_engine import ALIGNMENT, aligned_buffer, open_unbuffered, read_at
+
+DEFAULT_REGIONS = 4096
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+# Regions whose latency exceeds this multiple of the median are reported as slow
+SLOW_FACTOR = 5.0
+STATE_SAVE_INTERVAL_S = 10.0
+# Bumped when the region layout changes, so older saved scans start over instead of resuming misaligned
+STATE_VERSION = 2
+
+REGION_UNSCANNED = "unscanned"
+REGION_GOOD = "good"
+REGION_SLOW = "slow"
+REGION_BAD = "bad"
+
+_SEVERITY = {REGION_UNSCANNED: 0, REGION_GOOD: 1, REGION_SLOW: 2, REGION_BAD: 3}
+
+
+def device_size(path):
+    """Return the size of a block device or image file by seeking to its end."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.lseek(fd, 0, os.SEEK_END)
+    finally:
+        os.close(fd)
+
+
+class SurfaceScan:
+    """Read scan of a whole device, summarized as a fixed-size per-region map.
+
+    The device is split into `regions` regions of whole chunks, region r
+    covering chunks r*chunks//regions up to (r+1)*chunks//regions, so they
+    differ by at most one chunk and together cover every byte, including a
+    final partial chunk. Each region stores the
+    worst read latency of its chunks (array('f'), NaN until scanned) and a
+    count of failed chunks (bytearray), so the map costs 5 bytes per region
+    whatever the device size. With sample=True only the first chunk of each
+    region is read, which turns a full pass into a quick survey.
+
+    Progress is saved to state_path periodically and on cancellation, and
+    run() resumes from the saved position.
+    """
+
+    def __init__(self, device_path, size_bytes=None, regions=DEFAULT_REGIONS,
+                 chunk_size=DEFAULT_CHUNK_SIZE, sample=False, state_path=None):
+        if chunk_size % ALIGNMENT:
+            raise ValueError(f"Chunk size must be a multiple of {ALIGNMENT}")
+        self.device_path = device_path
+        self.size_bytes = size_bytes if size_bytes is not None else device_size(device_path)
+        self.chunk_size = chunk_size
+        self.sample = sample
+        self.state_path = state_path
+
+        # Regions are whole chunks; small devices get fewer regions
+        self.chunks = max(1, -(-self.size_bytes // chunk_size))
+        self.regions = min(regions, self.chunks)
+
+        self.latency_ms = array('f', [math.nan]) * self.regions
+        self.errors = bytearray(self.regions)
+        self.next_region = 0
+        self.bytes_read = 0
+
+        if state_path and os.path.exists(state_path):
+            self.load_state()
+
+    def load_state(self):
+        """Resume from state_path if it describes the same device and layout."""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable surface scan state {self.state_path}: {e}")
+            return
+        layout = (STATE_VERSION, self.device_path, self.size_bytes, self.regions, self.chunk_size, self.sample)
+        keys = ("version", "device", "size_bytes", "regions", "chunk_size", "sample")
+        if tuple(state.get(key) for key in keys) != layout:
+            logging.info(f"Surface scan state {self.state_path} is for a different device or layout; starting over")
+            return
+        self.latency_ms = array('f', base64.b64decode(state["latency_ms"]))
+        self.errors = bytearray(base64.b64decode(state["errors"]))
+        self.next_region = state["next_region"]
+        self.bytes_read = state.get("bytes_read", 0)
+        logging.info(f"Resuming surface scan of {self.device_path} at region {self.next_region}/{self.regions}")
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        state = {
+            "version": STATE_VERSION,
+            "device": self.device_path,
+            "size_bytes": self.size_bytes,
+            "regions": self.regions,
+            "chunk_size": self.chunk_size,
+            "sample": self.sample,
+            "next_region": self.next_region,
+            "bytes_read": self.bytes_read,
+            "latency_ms": base64.b64encode(self.latency_ms.tobytes()).decode('ascii'),
+            "errors": base64.b64encode(bytes(self.errors)).decode('ascii'),
+        }
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def region_chunks(self, region):
+        """range of the chunk indexes in region."""
+        return range(region * self.chunks // self.regions, (region + 1) * self.chunks // self.regions)
+
+    @property
+    def complete(self):
+        return self.next_region >= self.regions
+
+    def run(self, progress_callback=None, map_callback=None, map_cells=100, cancel_event=None):
+        """Scan from next_region to the end; map_callback(cells) receives the downsampled map as it fills."""
+        buffer = aligned_buffer(self.chunk_size)
+        view = memoryview(buffer)
+        raw, io_mode = open_unbuffered(self.device_path, direct=True)
+        last_saved = last_reported = time.monotonic()
+        perf_counter_ns = time.perf_counter_ns
+        start_time = time.perf_counter()
+        try:
+            while self.next_region < self.regions:
+                check_cancelled(cancel_event)
+                region = self.next_region
+                chunks = self.region_chunks(region)
+                worst_ns = 0
+                for chunk in (chunks[:1] if self.sample else chunks):
+                    offset = chunk * self.chunk_size
+                    # The last chunk may be partial; direct I/O still needs an aligned length
+                    remaining = self.size_bytes - offset
+                    length = min(self.chunk_size, -(-remaining // ALIGNMENT) * ALIGNMENT)
+                    started = perf_counter_ns()
+                    try:
+                        read = read_at(raw, view[:length], offset)
+                        self.bytes_read += min(read, remaining)
+                    except OSError as e:
+                        logging.warning(f"Read error on {self.device_path} at offset {offset}: {e}")
+                        if self.errors[region] < 255:
+                            self.errors[region] += 1
+                    worst_ns = max(worst_ns, perf_counter_ns() - started)
+                self.latency_ms[region] = worst_ns / 1e6
+                self.next_region += 1
+
+                now = time.monotonic()
+                if now - last_reported >= 0.5 or self.complete:
+                    last_reported = now
+                    if progress_callback:
+                        progress_callback(self.next_region / self.regions,
+                                          f"Surface scan of {self.device_path}: region {self.next_region}/{self.regions}")
+                    if map_callback:
+                        map_callback(self.downsample(map_cells))
+                if now - last_saved >= STATE_SAVE_INTERVAL_S:
+                    last_saved = now
+                    self.save_state()
+        except OperationCancelled:
+            self.save_state()
+            raise
+        finally:
+            view.release()
+            raw.close()
+
+        elapsed = time.perf_counter() - start_time
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.summary(io_mode, elapsed)
+
+    def region_status(self, region, slow_threshold_ms):
+        if self.errors[region]:
+            return REGION_BAD
+        latency = self.latency_ms[region]
+        if math.isnan(latency):
+            return REGION_UNSCANNED
+        return REGION_SLOW if latency > slow_threshold_ms else REGION_GOOD
+
+    def slow_threshold_ms(self):
+        scanned = [latency for latency in self.latency_ms if not math.isnan(latency)]
+        return statistics.median(scanned) * SLOW_FACTOR if scanned else math.inf
+
+    def downsample(self, cells):
+        """Fold the region map into `cells` entries of {"status", "latency_ms", "errors"} (worst wins)."""
+        cells = max(1, min(cells, self.regions))
+        threshold = self.slow_threshold_ms()
+        result = []
+        for cell in range(cells):
+            first = cell * self.regions // cells
+            last = (cell + 1) * self.regions // cells
+            status, worst_latency, errors = REGION_UNSCANNED, math.nan, 0
+            for region in range(first, last):
+                region_status = self.region_status(region, threshold)
+                if _SEVERITY[region_status] > _SEVERITY[status]:
+                    status = region_status
+                latency = self.latency_ms[region]
+                if not math.isnan(latency) and not (latency <= worst_latency):
+                    worst_latency = latency
+                errors += self.errors[region]
+            result.append({
+                "status": status,
+                "latency_ms": None if math.isnan(worst_latency) else round(worst_latency, 3),
+                "errors": errors,
+            })
+        return result
+
+    def summary(self, io_mode=None, elapsed=None):
+        threshold = self.slow_threshold_ms()
+        statuses = [self.region_status(region, threshold) for region in range(self.regions)]
+        return {
+            "device": self.device_path,
+            "size_bytes": self.size_bytes,
+            "regions": self.regions,
+            "chunk_size": self.chunk_size,
+            "chunks": self.chunks,
+            "sample": self.sample,
+            "io_mode": io_mode,
+            "bytes_read": self.bytes_read,
+            "seconds": elapsed,
+            "mb_s": self.bytes_read / (1024 * 1024) / elapsed if elapsed else None,
+            "bad_regions": statuses.count(REGION_BAD),
+            "slow_regions": statuses.count(REGION_SLOW),
+            "unscanned_regions": statuses.count(REGION_UNSCANNED),
+            "latency_ms": base64.b64encode(self.latency_ms.tobytes()).decode('ascii'),
+            "errors": base64.b64encode(bytes(self.errors)).decode('ascii'),
+        }
+
+
+def scan_drive_surface(drive, sample=False, regions=DEFAULT_REGIONS, map_cells=100,
+                       progress_callback=None, result_callback=None, cancel_event=None):
+    """Surface-scan the physical disk behind a drive details dict, resuming an interrupted scan.
+
+    result_callback(drive_letter, cells) receives the downsampled map while
+    the scan runs; the summary (with the full region map) is returned.
+    """
+    drive_letter = drive["drive_letter"]
+    device_path = get_backend().raw_device_path(drive_letter)
+    if device_path is None:
+        raise OSError(f"No raw device found for {drive_letter}")
+    size_bytes = drive.get("size_bytes")
+    try:
+        size_bytes = int(size_bytes) or None
+    except (TypeError, ValueError):
+        size_bytes = None
+
+    state_name = ''.join(c if c.isalnum() else '_' for c in device_path).strip('_')
+    scan = SurfaceScan(device_path, size_bytes, regions, sample=sample,
+                       state_path=data_path(f"surface_scan_{state_name}.json"))
+
+    def publish_map(cells):
+        if result_callback:
+            result_callback(drive_letter, cells)
+
+    summary = scan.run(progress_callback, publish_map, map_cells, cancel_event)
+    summary["cells"] = scan.downsample(map_cells)
+    return summary
@@ -0,0 +1,197 @@
+# core/topology.py
+
+import os
+import logging
+
+
+def normalize_drive_key(drive):
+    """Normalize a drive letter ('E:', 'E:\\', 'e') to the 'E:' form WMI uses."""
+    drive = drive.strip()
+    if len(drive) >= 1 and drive[0].isalpha() and drive[1:].strip(':\\/') == '':
+        return drive[0].upper() + ':'
+    return drive
+
+def _reference_device_id(wmi_obj, prop):
+    """Extract the DeviceID from an association reference without resolving it.
+
+    Reading ``assoc.Antecedent`` through the wmi wrapper fetches the referenced
+    object (one COM round-trip each), so read the raw object path instead, e.g.
+    ``\\\\HOST\\root\\cimv2:Win32_DiskPartition.DeviceID="Disk #1, Partition #0"``.
+    """
+    path = wmi_obj.ole_object.Properties_(prop).Value
+    device_id = path.split('DeviceID=', 1)[1].strip('"')
+    return device_id.replace('\\\\', '\\')
+
+def build_wmi_topology(w):
+    """Fetch disks, partitions and logical disks in bulk and index them by letter.
+
+    Four WMI queries are issued regardless of how many drives are attached,
+    instead of walking every disk's associators once per drive letter.
+    Returns {"E:": {"disk": <Win32_DiskDrive>, "logical_disk": <Win32_LogicalDisk>}}.
+    """
+    topology = {}
+    try:
+        disks = {disk.DeviceID: disk for disk in w.Win32_DiskDrive()}
+        logical_disks = {ld.DeviceID: ld for ld in w.Win32_LogicalDisk()}
+
+        partition_to_disk = {}
+        for link in w.Win32_DiskDriveToDiskPartition():
+            try:
+                partition_to_disk[_reference_device_id(link, 'Dependent')] = \
+                    _reference_device_id(link, 'Antecedent')
+            except Exception as e:
+                logging.warning(f"Skipping malformed disk/partition link: {e}")
+
+        for link in w.Win32_LogicalDiskToPartition():
+            try:
+                partition_id = _reference_device_id(link, 'Antecedent')
+                letter = _reference_device_id(link, 'Dependent')
+            except Exception as e:
+                logging.warning(f"Skipping malformed partition/volume link: {e}")
+                continue
+
+            disk = disks.get(partition_to_disk.get(partition_id))
+            logical_disk = logical_disks.get(letter)
+            if disk is not None and logical_disk is not None:
+                topology[normalize_drive_key(letter)] = {
+                    "disk": disk,
+                    "logical_disk": logical_disk,
+                }
+    except Exception as e:
+        logging.error(f"Error building WMI topology: {e}")
+    return topology
+
+def _read_sysfs(path, default=None):
+    """Read and strip a single sysfs attribute."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+def _unescape_mount_field(field):
+    """Undo the octal escaping /proc/mounts applies to spaces, tabs and newlines."""
+    return field.replace('\\040', ' ').replace('\\011', '\t').replace('\\012', '\n').replace('\\134', '\\')
+
+def _sysfs_disk_info(disk_name, sys_block='/sys/block'):
+    """Collect the static attributes of a whole disk from sysfs."""
+    disk_path = os.path.join(sys_block, disk_name)
+    device_path = os.path.realpath(disk_path)
+    sectors = _read_sysfs(os.path.join(disk_path, 'size'), '0')
+    vendor = _read_sysfs(os.path.join(disk_path, 'device', 'vendor'), '')
+    model = _read_sysfs(os.path.join(disk_path, 'device', 'model'), '')
+    is_usb = '/usb' in device_path
+    removable = _read_sysfs(os.path.join(disk_path, 'removable'), '0') == '1'
+
+    serial = _read_sysfs(os.path.join(disk_path, 'device', 'serial'))
+    usb_hub = None
+    if is_usb:
+        # The USB device is the nearest ancestor with a devpath; its parent is the hub it is plugged into
+        usb_device = os.path.realpath(os.path.join(disk_path, 'device'))
+        while usb_device != '/' and not os.path.exists(os.path.join(usb_device, 'devpath')):
+            usb_device = os.path.dirname(usb_device)
+        if usb_device != '/':
+            if serial is None:
+                # USB mass storage exposes the serial on the USB device
+                serial = _read_sysfs(os.path.join(usb_device, 'serial'))
+            hub = os.path.basename(os.path.dirname(usb_device))
+            # Ports on the root hub are independent controller ports, not a shared hub
+            if not hub.startswith('usb'):
+                usb_hub = hub
+
+    return {
+        "disk_id": disk_name,
+        "model": ' '.join(part for part in (vendor, model) if part) or 'N/A',
+        "interface_type": 'USB' if is_usb else 'N/A',
+        "serial_number": serial or 'N/A',
+        "media_type": 'Removable Media' if removable else 'Fixed hard disk media',
+        "size_bytes": int(sectors) * 512 if sectors.isdigit() else 0,
+        "is_external": is_usb or removable,
+        "usb_hub": usb_hub,
+    }
+
+def read_mount_table(mountinfo='/proc/self/mountinfo', mounts='/proc/mounts'):
+    """Return (device, mountpoint, file_system, block_name) for every block-backed mount.
+
+    /proc/self/mountinfo is preferred because its major:minor field resolves
+    the backing block device even for /dev/mapper and by-uuid sources;
+    /proc/mounts is the fallback for kernels or sandboxes without it.
+    """
+    entries = []
+    try:
+        with open(mountinfo) as f:
+            for line in f:
+                fields = line.split()
+                if '-' not in fields:
+                    continue
+                sep = fields.index('-')
+                if len(fields) < sep + 3:
+                    continue
+                block_name = os.path.basename(os.path.realpath(f"/sys/dev/block/{fields[2]}"))
+                if block_name == fields[2]:
+                    continue  # not a block device (proc, tmpfs, fuse...)
+                entries.append((fields[sep + 2], _unescape_mount_field(fields[4]), fields[sep + 1], block_name))
+        return entries
+    except OSError as e:
+        logging.debug(f"{mountinfo} unavailable, falling back to {mounts}: {e}")
+
+    try:
+        with open(mounts) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3 or not fields[0].startswith('/dev/'):
+                    continue
+                block_name = os.path.basename(os.path.realpath(fields[0]))
+                entries.append((fields[0], _unescape_mount_field(fields[1]), fields[2], block_name))
+    except OSError as e:
+        logging.error(f"Error reading {mounts}: {e}")
+    return entries
+
+def build_sysfs_topology(sys_block='/sys/block', mount_table=None):
+    """Index mounted volumes by mountpoint using /sys/block and the mount table.
+
+    Each disk is read from sysfs once, however many of its partitions are
+    mounted. Returns {"/media/usb": {"disk": {...}, "logical_disk": {...}}}.
+    """
+    topology = {}
+    partition_to_disk = {}
+    disk_info = {}
+    try:
+        for disk_name in os.listdir(sys_block):
+            partition_to_disk[disk_name] = disk_name
+            for entry in os.listdir(os.path.join(sys_block, disk_name)):
+                if os.path.exists(os.path.join(sys_block, disk_name, entry, 'partition')):
+                    partition_to_disk[entry] = disk_name
+    except OSError as e:
+        logging.error(f"Error reading {sys_block}: {e}")
+        return topology
+
+    if mount_table is None:
+        mount_table = read_mount_table()
+
+    for device, mountpoint, file_system, block_name in mount_table:
+        disk_name = partition_to_disk.get(block_name)
+        if disk_name is None:
+            continue
+        if disk_name not in disk_info:
+            disk_info[disk_name] = _sysfs_disk_info(disk_name, sys_block)
+
+        topology.setdefault(mountpoint, {
+            "disk": disk_info[disk_name],
+            "logical_disk": {
+                "device": device,
+                "partition": block_name,
+                "file_system": file_system,
+            },
+        })
+    return topology
+
+def find_mount_entry(topology, path):
+    """Return the topology entry of the mount containing path (longest prefix wins)."""
+    path = os.path.abspath(path)
+    best = None
+    for mountpoint in topology:
+        if path == mountpoint or path.startswith(mountpoint.rstrip('/') + '/'):
+            if best is None or len(mountpoint) > len(best):
+                best = mountpoint
+    return topology.get(best) if best is not None else None
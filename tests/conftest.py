@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# The tests import core and ui from the repository root, as main.py and driveman.py do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
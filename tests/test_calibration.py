@@ -0,0 +1,52 @@
+# tests/test_calibration.py
+
+import pytest
+
+from core.calibration import MAX_EXTENSION_GROWTH, MIN_EXTENSION_GROWTH, extend_step, scale_plan
+from core.profiles import STEP_RANDOM, STEP_SEQUENTIAL_WRITE, compile_profile, load_profile
+
+CALIBRATION = {"write_mb_s": 100.0, "read_mb_s": 200.0, "random_read_iops": 1000.0, "seconds": 1.0}
+
+
+def _scaled(budget_s=60):
+    plan, _ = scale_plan(compile_profile(load_profile("auto")), CALIBRATION, budget_s)
+    return {step.kind: step for step in plan.steps}
+
+
+def test_target_is_validated():
+    spec = dict(load_profile("auto"), target_half_width_percent=0)
+    with pytest.raises(ValueError):
+        compile_profile(spec)
+    assert compile_profile(load_profile("auto")).spec["target_half_width_percent"] == 5
+
+
+def test_extension_grows_up_to_the_limit():
+    write = _scaled()[STEP_SEQUENTIAL_WRITE]
+    extended = extend_step(write, CALIBRATION, available_s=1000.0)
+    assert extended.params["size_mb"] == int(write.params["size_mb"] * MAX_EXTENSION_GROWTH)
+
+
+def test_kept_write_pays_for_the_larger_read():
+    write = _scaled()[STEP_SEQUENTIAL_WRITE]
+    assert write.params["keep_file"]
+    size_mb = write.params["size_mb"]
+    available_s = 1.5 * size_mb / 100.0 + 0.5 * size_mb / 200.0
+    assert extend_step(write, CALIBRATION, available_s).params["size_mb"] == int(1.5 * size_mb)
+
+
+def test_random_extension_keeps_the_workloads_that_fit():
+    random = _scaled()[STEP_RANDOM]
+    duration = random.params["duration"]
+    prepare_s = random.params["file_size_mb"] / 100.0
+    # Room for three workloads at the minimum growth, not for the fourth
+    workloads_s = 3.5 * duration * MIN_EXTENSION_GROWTH
+    extended = extend_step(random, CALIBRATION, prepare_s + workloads_s)
+    assert extended.names == random.names[:3]
+    assert extended.params["duration"] == pytest.approx(workloads_s / 3)
+    assert extend_step(random, CALIBRATION, prepare_s + duration) is None
+
+
+def test_no_room_no_extension():
+    steps = _scaled()
+    assert extend_step(steps[STEP_SEQUENTIAL_WRITE], CALIBRATION, 0.0) is None
+    assert extend_step(steps[STEP_SEQUENTIAL_WRITE], CALIBRATION, 1000.0, free_bytes=0) is None
@@ -0,0 +1,46 @@
+# tests/test_capacity_verify.py
+
+import pytest
+
+import core.capacity_verify as capacity_verify
+from core.capacity_verify import CapacityVerifier
+
+MIB = 1024 * 1024
+IMAGE_SIZE = 16 * MIB
+REAL_CAPACITY = 6 * MIB
+
+
+def _image(tmp_path):
+    path = tmp_path / "stick.img"
+    with open(path, 'wb') as f:
+        f.truncate(IMAGE_SIZE)
+    return str(path)
+
+
+def _verify(path, threads):
+    return CapacityVerifier(path, threads=threads, direct=False, destructive=True, seed=1).run()
+
+
+@pytest.mark.parametrize("threads", [0, 2])
+def test_genuine_image_passes(tmp_path, threads):
+    summary = _verify(_image(tmp_path), threads)
+    assert summary["passed"]
+    assert summary["usable_bytes"] == summary["estimated_capacity_bytes"] == IMAGE_SIZE
+    assert summary["wrap_bytes"] is None
+
+
+@pytest.mark.parametrize("threads", [0, 2])
+def test_wrap_around_image_reports_real_capacity(tmp_path, monkeypatch, threads):
+    # A counterfeit controller: every offset lands modulo the real flash size
+    write_at, read_at = capacity_verify.write_at, capacity_verify.read_at
+    monkeypatch.setattr(capacity_verify, "write_at",
+                        lambda raw, buffer, offset: write_at(raw, buffer, offset % REAL_CAPACITY))
+    monkeypatch.setattr(capacity_verify, "read_at",
+                        lambda raw, buffer, offset: read_at(raw, buffer, offset % REAL_CAPACITY))
+    summary = _verify(_image(tmp_path), threads)
+    assert not summary["passed"]
+    assert summary["first_bad_offset"] == 0
+    assert summary["wrap_bytes"] == REAL_CAPACITY
+    assert summary["usable_bytes"] == summary["estimated_capacity_bytes"] == REAL_CAPACITY
+    assert summary["good_bytes"] == REAL_CAPACITY
+    assert summary["aliased_bytes"] == IMAGE_SIZE - REAL_CAPACITY
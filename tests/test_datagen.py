@@ -0,0 +1,42 @@
+# tests/test_datagen.py
+
+import zlib
+
+from core.datagen import PATTERN_COMPRESSIBLE, PATTERN_RANDOM, PATTERN_ZEROS, SEGMENT_SIZE, DataPattern
+from core.io_engine import sequential_write
+
+MIB = 1024 * 1024
+
+
+def _sectors(data):
+    return [bytes(data[offset:offset + SEGMENT_SIZE]) for offset in range(0, len(data), SEGMENT_SIZE)]
+
+
+def test_blocks_have_distinct_sectors_beyond_the_pool():
+    data = DataPattern(PATTERN_RANDOM, seed=1)
+    # Twice the pool: without stamps half of these sectors would repeat
+    sectors = [sector for index in range(2 * data.pool_size // MIB) for sector in _sectors(data.block(index, MIB))]
+    assert len(set(sectors)) == len(sectors)
+
+
+def test_same_seed_and_index_give_the_same_block():
+    assert DataPattern(PATTERN_RANDOM, seed=7).block(3, MIB) == DataPattern(PATTERN_RANDOM, seed=7).block(3, MIB)
+    assert DataPattern(PATTERN_RANDOM, seed=7).block(3, MIB) != DataPattern(PATTERN_RANDOM, seed=8).block(3, MIB)
+
+
+def test_compressible_pattern_compresses_to_about_its_ratio():
+    block = DataPattern(PATTERN_COMPRESSIBLE, seed=1, compress_ratio=4).block(0, MIB)
+    assert 3.5 < len(block) / len(zlib.compress(block)) < 4.5
+
+
+def test_zeros_stay_zero():
+    assert DataPattern(PATTERN_ZEROS).block(5, MIB) == bytes(MIB)
+
+
+def test_sequential_write_repeats_no_sector(tmp_path):
+    path = tmp_path / "write.bin"
+    size = 4 * DataPattern(PATTERN_RANDOM, seed=1).pool_size
+    sequential_write(str(path), size, direct=False, data=DataPattern(PATTERN_RANDOM, seed=1))
+    sectors = _sectors(path.read_bytes())
+    assert len(sectors) == size // SEGMENT_SIZE
+    assert len(set(sectors)) == len(sectors)
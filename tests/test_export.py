@@ -0,0 +1,65 @@
+# tests/test_export.py
+
+import os
+from array import array
+
+import pytest
+
+from core.export import ARRAY_THRESHOLD, RECORD_BENCHMARK, RECORD_DRIVE, ReportWriter, iter_report, write_report
+
+SERIES = [float(index) / 4 for index in range(ARRAY_THRESHOLD * 2)]
+HISTOGRAM = [[bucket, bucket * 3] for bucket in range(ARRAY_THRESHOLD)]
+
+
+def _records():
+    return [
+        (RECORD_DRIVE, "E:\\", {"model": "Stick", "total_gb": 14.9}),
+        (RECORD_BENCHMARK, "E:\\", {"mb_s": SERIES, "histogram": HISTOGRAM, "map": array('f', [0.5] * 100)}),
+    ]
+
+
+def _bodies(path):
+    return [(record["type"], record["drive_letter"], record["data"]) for record in iter_report(path)]
+
+
+@pytest.mark.parametrize("name", ["report.jsonl", "report.jsonl.gz"])
+def test_round_trip_with_sidecar_columns(tmp_path, name):
+    path = str(tmp_path / name)
+    write_report(path, _records(), compress=name.endswith(".gz"))
+    header, drive, benchmark = _bodies(path)
+    assert header[0] == "header" and header[2]["arrays"] == name + ".bin"
+    assert drive == _records()[0]
+    assert benchmark[2]["mb_s"] == SERIES
+    assert benchmark[2]["histogram"] == HISTOGRAM
+    assert benchmark[2]["map"] == [0.5] * 100
+    # The columns live in the sidecar, not in the JSON lines
+    assert os.path.getsize(path + ".bin") > 0
+    if not name.endswith(".gz"):
+        with open(path) as f:
+            assert "$array" in f.read()
+
+
+def test_truncated_last_line_yields_the_complete_records(tmp_path):
+    path = str(tmp_path / "report.jsonl")
+    write_report(path, _records())
+    with open(path, 'rb+') as f:
+        f.truncate(os.path.getsize(path) - 20)
+    assert [record[0] for record in _bodies(path)] == ["header", RECORD_DRIVE]
+
+
+def test_rewriting_a_path_replaces_the_report(tmp_path):
+    path = str(tmp_path / "report.jsonl")
+    write_report(path, _records())
+    write_report(path, [(RECORD_DRIVE, "G:\\", {"model": "Other"})])
+    assert [(record[0], record[1]) for record in _bodies(path)] == [("header", None), (RECORD_DRIVE, "G:\\")]
+
+
+def test_append_resumes_without_a_second_header(tmp_path):
+    path = str(tmp_path / "report.jsonl")
+    write_report(path, _records())
+    with ReportWriter(path, append=True) as writer:
+        writer.write(RECORD_BENCHMARK, "G:\\", {"mb_s": SERIES})
+    bodies = _bodies(path)
+    assert [record[0] for record in bodies] == ["header", RECORD_DRIVE, RECORD_BENCHMARK, RECORD_BENCHMARK]
+    assert bodies[2][2]["histogram"] == HISTOGRAM
+    assert bodies[3][2]["mb_s"] == SERIES
@@ -0,0 +1,58 @@
+# tests/test_health_monitor.py
+
+import time
+
+import core.health_monitor as health_monitor
+from core.health_monitor import PROBE_HEALTH, PROBE_USAGE, HealthMonitor
+
+
+class _Backend:
+    def __init__(self, percent):
+        self.percent = percent
+
+    def volume_stats(self, drive):
+        return {"total": 100, "used": self.percent, "free": 100 - self.percent, "percent": self.percent}
+
+    def disk_for_volume(self, drive):
+        return "sdb"
+
+    def disk_serial(self, drive):
+        return "S1"
+
+    def io_counters(self):
+        # Nothing changes, so the drive looks idle after its first usage probe
+        return {"sdb": {"read_bytes": 0, "write_bytes": 0, "read_count": 0, "write_count": 0}}
+
+
+def _run(monkeypatch, percent, intervals, seconds):
+    health_checks = []
+    monkeypatch.setattr(health_monitor, "PROBE_INTERVALS", intervals)
+    monkeypatch.setattr(health_monitor, "check_drive_health",
+                        lambda drive, timeout: health_checks.append(time.monotonic()) or
+                        {"status": "Healthy", "warnings": []})
+    monitor = HealthMonitor(_Backend(percent), record_history=False)
+    started = time.monotonic()
+    monitor.add_drive("E:\\")
+    monitor.start()
+    time.sleep(seconds)
+    monitor.stop()
+    return monitor, monitor._drives["E:\\"], [at - started for at in health_checks]
+
+
+def test_idle_usage_probes_do_not_back_off_the_health_probe(monkeypatch):
+    intervals = {PROBE_USAGE: (0.02, 0.01, 0.08), PROBE_HEALTH: (100.0, 50.0, 400.0)}
+    monitor, drive, health_checks = _run(monkeypatch, 10, intervals, 0.5)
+    usage = [sample for sample in monitor.history("E:\\") if sample["probe"] == PROBE_USAGE]
+    assert len(usage) >= 4
+    assert drive.intervals[PROBE_USAGE] == 0.08
+    assert drive.intervals[PROBE_HEALTH] == 100.0
+    assert health_checks == []
+
+
+def test_low_space_brings_the_queued_health_probe_forward(monkeypatch):
+    monkeypatch.setattr(health_monitor, "DEGRADED_FACTOR", 0.02)
+    intervals = {PROBE_USAGE: (60.0, 15.0, 900.0), PROBE_HEALTH: (10.0, 0.01, 20.0)}
+    _, drive, health_checks = _run(monkeypatch, 95, intervals, 0.6)
+    assert drive.low_space
+    # Degraded: 10 s * 0.02, instead of the 10 s entry queued when the drive was added
+    assert health_checks and health_checks[0] < 0.5
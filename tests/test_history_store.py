@@ -0,0 +1,36 @@
+# tests/test_history_store.py
+
+import os
+
+import core.history_store as history_store
+from core.history_store import HistoryStore, attach_usage_history
+
+GIB = 1024**3
+
+
+def _details():
+    return {"drive_letter": "E:\\", "serial_number": "S123", "total_gb": 64.0, "free_gb": 16.0}
+
+
+def test_enumeration_does_not_create_the_database(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.db")
+    monkeypatch.setattr(history_store, "HISTORY_DB_PATH", path)
+    details = _details()
+    attach_usage_history(details)
+    assert not os.path.exists(path)
+    assert [sample["free_gb"] for sample in details["usage_history"]] == [16.0]
+
+
+def test_enumeration_reads_without_writing(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.db")
+    monkeypatch.setattr(history_store, "HISTORY_DB_PATH", path)
+    store = HistoryStore(path)
+    store.record_usage("S123", 64 * GIB, 32 * GIB, 32 * GIB, timestamp=history_store.time.time() - 3600)
+    store.close()
+    for _ in range(3):
+        details = _details()
+        attach_usage_history(details)
+    assert [sample["free_gb"] for sample in details["usage_history"]] == [32.0, 16.0]
+    store = HistoryStore(path, read_only=True)
+    assert len(store.usage_range("S123")) == 1
+    store.close()
@@ -0,0 +1,51 @@
+# tests/test_hotplug.py
+
+import queue
+
+from core.hotplug import DRIVE_ADDED, DRIVE_REMOVED, HotplugWatcher
+
+
+class _Watch:
+    def __init__(self, batches):
+        self._batches = queue.Queue()
+        for batch in batches:
+            self._batches.put(batch)
+        self._batches.put(None)
+
+    def changes(self):
+        return self._batches.get()
+
+    def close(self):
+        self._batches.put(None)
+
+
+class _Backend:
+    def __init__(self, batches):
+        self.batches = batches
+
+    def watch_volumes(self):
+        return _Watch(self.batches)
+
+    def probe_drive(self, drive):
+        if drive == "F:\\":
+            raise OSError("device not ready")
+        return {"drive_letter": drive}
+
+
+def _events(batches, known_drives=None):
+    watcher = HotplugWatcher(_Backend(batches))
+    events = []
+    watcher.subscribe(events.append)
+    watcher.start(known_drives=known_drives)
+    watcher._thread.join(timeout=5)
+    return [(event.action, event.drive_letter) for event in events]
+
+
+def test_failed_probe_does_not_stop_the_watcher():
+    events = _events([[(DRIVE_ADDED, "F:\\"), (DRIVE_ADDED, "G:\\")], [(DRIVE_REMOVED, "G:\\")]], known_drives=[])
+    assert events == [(DRIVE_ADDED, "G:\\"), (DRIVE_REMOVED, "G:\\")]
+
+
+def test_seeded_watcher_reports_only_known_removals():
+    events = _events([[(DRIVE_REMOVED, "C:\\"), (DRIVE_REMOVED, "E:\\")]], known_drives=["E:\\"])
+    assert events == [(DRIVE_REMOVED, "E:\\")]
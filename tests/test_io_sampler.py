@@ -0,0 +1,43 @@
+# tests/test_io_sampler.py
+
+import pytest
+
+from core.io_sampler import IoSampler
+
+MIB = 1024 * 1024
+
+
+class _Backend:
+    def disk_for_volume(self, drive):
+        return "sdb"
+
+
+def _sampler(seconds):
+    """A sampler fed one sample per second for `seconds`, writing 1 MiB/s; the fine ring holds 10 s."""
+    sampler = IoSampler(interval_s=1.0, ring_size=10, backend=_Backend(), coarse_interval_s=5.0, coarse_ring_size=8)
+    sampler.start = lambda: None
+    sampler.track("E:\\")
+    for t in range(seconds + 1):
+        sampler._append(float(t), {"sdb": {"write_bytes": t * MIB, "write_count": t, "read_bytes": 0, "read_count": 0}})
+    return sampler
+
+
+def test_window_inside_the_fine_ring():
+    rates = _sampler(60).window("E:\\", start=55.0)
+    assert rates["seconds"] == rates["requested_s"] == 5.0
+    assert not rates["truncated"]
+
+
+def test_window_older_than_the_fine_ring_uses_the_coarse_ring():
+    rates = _sampler(30).window("E:\\", start=0.0)
+    assert rates["seconds"] == rates["requested_s"] == 30.0
+    assert rates["write_mb_s"] == pytest.approx(1.0)
+    assert not rates["truncated"]
+
+
+def test_window_older_than_both_rings_is_flagged():
+    # The coarse ring holds 8 samples 5 s apart: 25..60
+    rates = _sampler(60).window("E:\\", start=0.0)
+    assert rates["requested_s"] == 60.0
+    assert rates["seconds"] == 35.0
+    assert rates["truncated"]
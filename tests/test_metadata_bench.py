@@ -0,0 +1,54 @@
+# tests/test_metadata_bench.py
+
+import os
+import threading
+
+import pytest
+
+from core.cancellation import OperationCancelled
+from core.metadata_bench import OP_MKDIR, PHASES, TREE_DIR, MetadataBenchmark
+
+SIZES = [(512, 1), (4096, 1)]
+
+
+def _benchmark(tmp_path, **options):
+    options = dict({"file_count": 40, "sizes": SIZES, "depth": 1, "fanout": 2, "threads": 2, "seed": 1}, **options)
+    return MetadataBenchmark(str(tmp_path), **options)
+
+
+def test_every_phase_completes(tmp_path):
+    result = _benchmark(tmp_path).run()
+    assert list(result["phases"]) == PHASES
+    for op, phase in result["phases"].items():
+        assert phase["completed"] and phase["errors"] == 0, op
+    assert result["phases"]["create"]["ops"] == result["files"] == 40
+    assert not os.path.exists(tmp_path / TREE_DIR)
+
+
+def test_max_bytes_trims_the_tree(tmp_path):
+    result = _benchmark(tmp_path, max_bytes=8192).run()
+    assert 0 < result["files"] < 40
+    assert result["bytes"] <= 8192
+    assert result["phases"]["unlink"]["ops"] == result["files"]
+
+
+def test_zero_phase_limit_leaves_phases_incomplete(tmp_path):
+    result = _benchmark(tmp_path, phase_limit_s=0).run()
+    phases = result["phases"]
+    # mkdir is not time limited; every later phase stops before its first file
+    assert phases[OP_MKDIR]["completed"]
+    for op in PHASES[1:]:
+        assert not phases[op]["completed"] and phases[op]["ops"] == 0, op
+    assert not os.path.exists(tmp_path / TREE_DIR)
+
+
+def test_tree_is_removed_after_cancel(tmp_path):
+    cancel_event = threading.Event()
+
+    def progress(fraction, message):
+        if message == "metadata stat":
+            cancel_event.set()
+
+    with pytest.raises(OperationCancelled):
+        _benchmark(tmp_path).run(progress, cancel_event)
+    assert not os.path.exists(tmp_path / TREE_DIR)
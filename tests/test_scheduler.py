@@ -0,0 +1,20 @@
+# tests/test_scheduler.py
+
+from core.scheduler import BenchmarkScheduler
+
+
+def _drive_test(drive_letter, progress_callback, cancel_event):
+    return {"drive": drive_letter}
+
+
+def test_failing_result_callback_does_not_drop_results():
+    drives = [{"drive_letter": letter, "disk_id": letter} for letter in ("E:\\", "F:\\", "G:\\")]
+    delivered = []
+
+    def result_callback(drive_letter, result):
+        delivered.append(drive_letter)
+        raise RuntimeError("listener went away")
+
+    results = BenchmarkScheduler(max_concurrent=2, drive_test=_drive_test).run(drives, result_callback=result_callback)
+    assert results == {drive["drive_letter"]: {"drive": drive["drive_letter"]} for drive in drives}
+    assert sorted(delivered) == ["E:\\", "F:\\", "G:\\"]
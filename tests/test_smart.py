@@ -0,0 +1,46 @@
+# tests/test_smart.py
+
+import os
+
+import pytest
+
+from core.smart import SMART_PAGE_SIZE, decode_smart_page, smart_page_from_hex, temperature_from_attributes
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+# The same page captured with each tool: xxd, xxd -p, od -t x1, od -A x -t x1z and hexdump -C
+DUMPS = ("smart_page.xxd", "smart_page.xxd-p", "smart_page.od", "smart_page.od-xz", "smart_page.hexdump-C")
+
+
+def _dump(name):
+    with open(os.path.join(DATA, name)) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", DUMPS)
+def test_dump_formats_give_the_same_page(name):
+    page = smart_page_from_hex(_dump(name))
+    assert page == smart_page_from_hex(_dump("smart_page.xxd-p"))
+    assert len(page) == SMART_PAGE_SIZE
+    assert sum(page) % 256 == 0
+
+
+def test_page_decodes():
+    decoded = decode_smart_page(smart_page_from_hex(_dump("smart_page.xxd")))
+    attributes = decoded["attributes"]
+    assert decoded["revision"] == 0x10
+    assert sorted(attributes) == [1, 5, 9, 12, 194, 197, 198, 199]
+    assert attributes[5]["raw"] == 8 and attributes[5]["prefailure"]
+    assert attributes[9]["raw"] == 7421 and attributes[9]["current"] == 92
+    assert attributes[197]["raw"] == 2
+    assert temperature_from_attributes(attributes) == 36
+
+
+def test_short_dump_is_rejected():
+    lines = _dump("smart_page.xxd").splitlines()
+    with pytest.raises(ValueError):
+        smart_page_from_hex("\n".join(lines[:-1]))
+
+
+def test_garbage_is_rejected():
+    with pytest.raises(ValueError):
+        smart_page_from_hex("SMART Attributes Data Structure revision number: 16")
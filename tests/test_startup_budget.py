@@ -0,0 +1,58 @@
+# tests/test_startup_budget.py
+
+import os
+import textwrap
+
+from ui.startup_budget import DEFERRED_MODULES, ENTRY_MODULE, STARTUP_BUDGET_MS, check_startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Any Qt name is a class whose attributes are stubs too, enough to define the window classes
+_QT_STUB = textwrap.dedent('''
+    class _Meta(type):
+        def __getattr__(cls, name):
+            return _Stub
+
+    class _Stub(metaclass=_Meta):
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __getattr__(self, name):
+            return _Stub
+
+    def pyqtSignal(*args, **kwargs):
+        return _Stub()
+
+    def __getattr__(name):
+        return _Meta(name, (_Stub,), {})
+''')
+
+
+def _stub_packages(tmp_path):
+    """Stand-ins for PyQt5 and, where this tree lacks it, the utils logger; imported ahead of site-packages."""
+    qt = tmp_path / "PyQt5"
+    qt.mkdir()
+    (qt / "__init__.py").write_text("")
+    for name in ("QtCore", "QtGui", "QtWidgets", "QtChart"):
+        (qt / f"{name}.py").write_text(_QT_STUB)
+    if not os.path.isdir(os.path.join(ROOT, "utils")):
+        utils = tmp_path / "utils"
+        utils.mkdir()
+        (utils / "__init__.py").write_text("")
+        (utils / "logger.py").write_text("def log_info(message):\n    pass\n")
+    return str(tmp_path)
+
+
+def test_dashboard_imports_within_budget(tmp_path, monkeypatch):
+    # measure_imports runs a fresh interpreter: the repository root comes first, then the stubs
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("PYTHONPATH", _stub_packages(tmp_path))
+    import_ms, early, ok = check_startup()
+    assert early == [], f"{ENTRY_MODULE} imports deferred modules at startup: {early}"
+    assert import_ms <= STARTUP_BUDGET_MS
+    assert ok
+
+
+def test_deferred_module_imported_early_fails(tmp_path, monkeypatch):
+    timings = {ENTRY_MODULE: (100, 1000), DEFERRED_MODULES[0]: (50, 50)}
+    assert check_startup(timings=timings) == (1.0, [DEFERRED_MODULES[0]], False)
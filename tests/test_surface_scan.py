@@ -0,0 +1,34 @@
+# tests/test_surface_scan.py
+
+from core.surface_scan import SurfaceScan
+
+CHUNK = 64 * 1024
+
+
+def _sparse_image(tmp_path, size):
+    path = tmp_path / "disk.img"
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    return str(path)
+
+
+def test_full_scan_reads_every_byte_when_regions_do_not_divide_the_chunks(tmp_path):
+    # 8191 whole chunks and a partial one: the old layout read only 4096 of them
+    size = 8191 * CHUNK + 3 * 4096
+    scan = SurfaceScan(_sparse_image(tmp_path, size), chunk_size=CHUNK)
+    summary = scan.run()
+    assert summary["bytes_read"] == size
+    assert summary["unscanned_regions"] == 0
+    assert scan.complete
+
+
+def test_regions_cover_all_chunks_once():
+    scan = SurfaceScan("unused", size_bytes=1000 * CHUNK + 512, regions=7, chunk_size=CHUNK)
+    chunks = [chunk for region in range(scan.regions) for chunk in scan.region_chunks(region)]
+    assert chunks == list(range(scan.chunks))
+    assert scan.chunks == 1001
+
+
+def test_sample_scan_reads_one_chunk_per_region(tmp_path):
+    scan = SurfaceScan(_sparse_image(tmp_path, 100 * CHUNK), regions=10, chunk_size=CHUNK, sample=True)
+    assert scan.run()["bytes_read"] == 10 * CHUNK
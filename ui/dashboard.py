@@ -1,14 +1,108 @@
 from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QFrame, QLabel, QScrollArea, QTableWidget, \
-    QTableWidgetItem, QPushButton, QGridLayout,QStatusBar
+    QTableWidgetItem, QPushButton, QGridLayout,QStatusBar, QFileDialog
 from PyQt5.QtGui import QColor, QBrush, QPainter
-from PyQt5.QtChart import QChart, QChartView, QBarSeries, QBarSet, QBarCategoryAxis, QValueAxis
-from core.drive_check import get_removable_and_external_drives_details
-from PyQt5.QtCore import Qt
-
-from core.performance import run_performance_tests
-from core.health import check_drive_health
+from core.registry import drive_registry
+from PyQt5.QtCore import Qt, QTimer
+import threading
+from datetime import datetime
+
+# QtChart and the probe modules (WMI, SQLite, the I/O engine) are imported where first used, so the
+# window can be shown before they load; job wrappers import them on the pool, off the GUI thread
+from core.export import ReportWriter, RECORD_BENCHMARK, RECORD_DRIVE, RECORD_HEALTH, RECORD_SURFACE_SCAN, write_report
+from core.cancellation import check_cancelled
+from ui.workers import JobRunner, JobSignals
 from utils.logger import log_info
 
+
+_session_report = None
+_session_report_lock = threading.Lock()
+
+def session_report():
+    """Report every result of this session is streamed to as it arrives, opened on first use."""
+    global _session_report
+    with _session_report_lock:
+        if _session_report is None:
+            _session_report = ReportWriter(f"driveman_report_{datetime.now():%Y%m%d_%H%M%S}.jsonl")
+            log_info(f"Streaming results to {_session_report.path}")
+        return _session_report
+
+def close_session_report():
+    global _session_report
+    with _session_report_lock:
+        if _session_report is not None:
+            _session_report.close()
+            _session_report = None
+
+# Job wrappers: the registry read happens on the pool too, in case the snapshot has expired
+def scan_drives(progress_callback=None, result_callback=None, cancel_event=None):
+    return drive_registry.get_drives()
+
+def benchmark_drives(result_callback=None, **callbacks):
+    """Benchmark every drive, storing each result and passing it on with the drive's previous run."""
+    import sqlite3
+    from core.history_store import drive_key, get_history_store
+    from core.scheduler import schedule_performance_tests
+
+    drives = drive_registry.get_drives()
+    keys = {drive["drive_letter"]: drive_key(drive) for drive in drives}
+    store = get_history_store()
+
+    def record(drive_letter, result):
+        session_report().write(RECORD_BENCHMARK, drive_letter, result)
+        previous = None
+        try:
+            previous = store.benchmarks(keys[drive_letter], limit=1)
+            store.record_benchmark(keys[drive_letter], drive_letter, result)
+        except sqlite3.Error as e:
+            log_info(f"Could not record benchmark history for {drive_letter}: {e}")
+        if result_callback:
+            result_callback(drive_letter, dict(result, previous=previous[0] if previous else None))
+
+    return schedule_performance_tests(drives, result_callback=record, **callbacks)
+
+def follow_drive_io(progress_callback=None, result_callback=None, cancel_event=None):
+    """Start sampling the I/O counters of every drive's disk (mapping volumes to disks can query WMI)."""
+    from core.io_sampler import get_io_sampler
+
+    get_io_sampler().follow_registry(drive_registry)
+
+def check_health_of_drives(result_callback=None, **callbacks):
+    from core.health import check_drives_health
+
+    def record(drive_letter, health_status):
+        session_report().write(RECORD_HEALTH, drive_letter, health_status)
+        if result_callback:
+            result_callback(drive_letter, health_status)
+
+    return check_drives_health(drive_registry.get_drives(), result_callback=record, **callbacks)
+
+def surface_scan_drives(progress_callback=None, result_callback=None, cancel_event=None):
+    from core.surface_scan import scan_drive_surface
+
+    results = {}
+    for drive in drive_registry.get_drives():
+        check_cancelled(cancel_event)
+        try:
+            results[drive["drive_letter"]] = scan_drive_surface(
+                drive, progress_callback=progress_callback, result_callback=result_callback,
+                cancel_event=cancel_event)
+            session_report().write(RECORD_SURFACE_SCAN, drive["drive_letter"], results[drive["drive_letter"]])
+        except OSError as e:
+            log_info(f"Surface scan of {drive['drive_letter']} failed: {e}")
+            results[drive["drive_letter"]] = {"error": str(e)}
+    return results
+
+def export_results(path, drives, results_by_type, progress_callback=None, result_callback=None, cancel_event=None):
+    """Writes the drive details and latest results to a new report at path."""
+    def records():
+        for details in drives:
+            yield RECORD_DRIVE, details["drive_letter"], details
+        for record_type, results in results_by_type.items():
+            for drive_letter, result in results.items():
+                yield record_type, drive_letter, result
+
+    return write_report(path, records(), compress=path.endswith('.gz'))
+
 class DriveManDashboard(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -21,6 +115,23 @@ class DriveManDashboard(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
 
+        # Every probe runs on this pool; the widgets below start empty and fill in from job signals
+        self.jobs = JobRunner(parent=self)
+        self.benchmark_job = None
+        self.health_job = None
+        self.surface_job = None
+        self.health_monitor = None
+        self.io_sampler = None
+        self.io_timer = None
+        self.health_results = {}
+        # Latest results per drive, kept for export_report
+        self.drives = []
+        self.benchmark_results = {}
+        self.surface_results = {}
+        # Background monitor samples arrive on its own thread; this bridges them to the GUI thread
+        self.monitor_signals = JobSignals()
+        self.monitor_signals.partial.connect(self.on_monitor_sample)
+
         # Main layout
         main_layout = QVBoxLayout()
 
@@ -46,43 +157,54 @@ class DriveManDashboard(QMainWindow):
     def load_initial_data(self):
         """Load data after UI initialization."""
         self.status_bar.showMessage("Loading drive details...")
+        self.jobs.submit(scan_drives, on_finished=self.on_drives_loaded, on_failed=self.on_drives_failed)
+
+    def on_drives_loaded(self, drives):
+        self.drives = drives
+        self.populate_drive_list(drives)
+        self.status_bar.showMessage("Drive details loaded.", 5000)
+        # Keep the shared snapshot current as drives come and go
+        drive_registry.watch()
+        # Keep probing every drive in the background for as long as the dashboard runs
+        from core.health_monitor import get_health_monitor
+        self.health_monitor = get_health_monitor()
+        self.health_monitor.subscribe(self.monitor_signals.partial.emit)
+        self.health_monitor.follow_registry(drive_registry)
+        self.health_monitor.start()
+        # Live disk activity, read from the I/O sampler's ring once a second
+        from core.io_sampler import get_io_sampler
+        self.io_sampler = get_io_sampler()
+        self.jobs.submit(follow_drive_io)
+        self.io_timer = QTimer(self)
+        self.io_timer.timeout.connect(self.update_io_rates)
+        self.io_timer.start(1000)
+        if drives:
+            self.check_health()
+            self.run_benchmark()
 
-        try:
-            # Perform heavy operations like fetching drive details
-            drives = get_removable_and_external_drives_details()
-            self.populate_drive_list(drives)
-            self.status_bar.showMessage("Drive details loaded.", 5000)
-        except Exception as e:
-            self.status_bar.showMessage("Error loading data.", 5000)
-            log_info(f"Error in load_initial_data: {e}")
+    def on_drives_failed(self, error):
+        self.status_bar.showMessage("Error loading data.", 5000)
+        log_info(f"Error in load_initial_data: {error}")
 
     def populate_drive_list(self, drives):
         """Populate drive list panel with the fetched details."""
-        # Update UI with drive information
-        # Placeholder for actual implementation
-        pass
-
-
-    def create_drive_list_panel(self):
-        """Create the drive listing panel with actual drive data."""
-        frame = QFrame()
-        frame.setFrameShape(QFrame.StyledPanel)
-        layout = QVBoxLayout()
-
-        label = QLabel("Connected Drives")
-        label.setStyleSheet("font-size: 16px; font-weight: bold;")
-        layout.addWidget(label)
-
-        drives = get_removable_and_external_drives_details()
+        # Drop the placeholder or previous chart
+        while self.drive_list_layout.count() > 1:
+            widget = self.drive_list_layout.takeAt(1).widget()
+            if widget is not None:
+                widget.deleteLater()
 
         if drives:
+            from PyQt5.QtChart import QChart, QChartView, QBarSeries, QBarSet, QBarCategoryAxis, QValueAxis
+
             # Bar Graph Visualization
             bar_series = QBarSeries()
             categories = []
 
             for drive in drives:
                 bar_set = QBarSet(drive["drive_letter"])
-                bar_set.append(drive["total_gb"])
+                total_gb = drive["total_gb"]
+                bar_set.append(total_gb if isinstance(total_gb, (int, float)) else 0)
                 bar_series.append(bar_set)
                 categories.append(drive["drive_letter"])
 
@@ -106,13 +228,29 @@ class DriveManDashboard(QMainWindow):
             # Chart view
             chart_view = QChartView(chart)
             chart_view.setRenderHint(QPainter.Antialiasing)
-            layout.addWidget(chart_view)
+            self.drive_list_layout.addWidget(chart_view)
         else:
             # Show a message when no devices are found
             no_device_label = QLabel("No device found. Please connect a device.")
             no_device_label.setStyleSheet("font-size: 14px; color: red; padding: 10px;")
-            layout.addWidget(no_device_label)
+            self.drive_list_layout.addWidget(no_device_label)
+
+
+    def create_drive_list_panel(self):
+        """Create the drive listing panel; populate_drive_list fills it once drives are scanned."""
+        frame = QFrame()
+        frame.setFrameShape(QFrame.StyledPanel)
+        layout = QVBoxLayout()
 
+        label = QLabel("Connected Drives")
+        label.setStyleSheet("font-size: 16px; font-weight: bold;")
+        layout.addWidget(label)
+
+        scanning_label = QLabel("Scanning for drives...")
+        scanning_label.setStyleSheet("font-size: 14px; padding: 10px;")
+        layout.addWidget(scanning_label)
+
+        self.drive_list_layout = layout
         frame.setLayout(layout)
         return frame
 
@@ -120,7 +258,7 @@ class DriveManDashboard(QMainWindow):
 
 
     def create_performance_metrics_table(self):
-        """Create the performance metrics table with actual performance data."""
+        """Create the performance metrics table; benchmark results are added as drives finish."""
         frame = QFrame()
         frame.setFrameShape(QFrame.StyledPanel)
         layout = QVBoxLayout()
@@ -129,39 +267,44 @@ class DriveManDashboard(QMainWindow):
         label.setStyleSheet("font-size: 16px; font-weight: bold;")
         layout.addWidget(label)
 
-        table = QTableWidget(8, 3)  # Increased rows to accommodate more metrics
+        table = QTableWidget(0, 3)
         table.setHorizontalHeaderLabels(["Metric", "Read", "Write"])
         table.setColumnWidth(0, 70)
         table.setColumnWidth(1, 70)
         table.setColumnWidth(2, 70)
+        self.performance_table = table
 
-        # Fetch actual drive details and pass them to the performance testing function
-        drives = get_removable_and_external_drives_details()  # Get the actual drives
-        performance_data = run_performance_tests(drives)  # Pass the drives to run performance tests
-
-        for row, data in enumerate(performance_data):
-            metric = data[0] if len(data) > 0 else "Unknown"
-            read = data[1] if len(data) > 1 else "N/A"
-            write = data[2] if len(data) > 2 else "N/A"
+        # Live per-drive activity from the I/O sampler
+        self.io_rates_label = QLabel("")
+        layout.addWidget(self.io_rates_label)
 
-            read_item = QTableWidgetItem(str(read))
-            write_item = QTableWidgetItem(str(write))
-
-            # Set background color based on performance thresholds (optional)
-            # ... (your existing color-coding logic) ...
-
-            table.setItem(row, 0, QTableWidgetItem(metric))
-            table.setItem(row, 1, read_item)
-            table.setItem(row, 2, write_item)
+        # The throughput chart is added below the table by create_throughput_chart on first use
+        self.throughput_chart = None
+        self.performance_layout = layout
 
         layout.addWidget(table)
         frame.setLayout(layout)
         return frame
 
+    def create_throughput_chart(self):
+        """Create the sequential write throughput chart, importing QtChart on first use."""
+        if self.throughput_chart is not None:
+            return self.throughput_chart
+        from PyQt5.QtChart import QChart, QChartView
+
+        # Sampled write throughput per drive, plotted straight from the stored series
+        self.throughput_chart = QChart()
+        self.throughput_chart.setTitle("Sequential Write Throughput (MB/s vs MB written)")
+        throughput_view = QChartView(self.throughput_chart)
+        throughput_view.setRenderHint(QPainter.Antialiasing)
+        throughput_view.setMinimumHeight(150)
+        self.performance_layout.addWidget(throughput_view)
+        return self.throughput_chart
+
 
 
     def create_health_visualization(self):
-        """Create the health visualization grid with actual sector health data."""
+        """Create the health visualization grid; update_health_visualization fills it."""
         frame = QFrame()
         frame.setFrameShape(QFrame.StyledPanel)
         layout = QVBoxLayout()
@@ -170,37 +313,19 @@ class DriveManDashboard(QMainWindow):
         label.setStyleSheet("font-size: 16px; font-weight: bold;")
         layout.addWidget(label)
 
-        # Grid visualization
-        grid = QGridLayout()
-        grid.setSpacing(5)
-
-        # Fetch actual health data (assuming health_data gives a list of health statuses per sector)
-        health_data = [check_drive_health(drive['drive_letter']) for drive in get_removable_and_external_drives_details()]
-
-        # Calculate rows and columns dynamically based on the number of sectors you want to display
-        # Adjust this depending on the total number of sectors per drive and how many you want to visualize
-        total_sectors = len(health_data)
-        rows = (total_sectors // 10) + (1 if total_sectors % 10 else 0)  # 10 sectors per row
-        cols = 10  # Fixed number of columns (can be adjusted)
-
-        # Populate the grid with sector health data
-        for row in range(rows):
-            for col in range(cols):
-                sector_index = row * cols + col
-                if sector_index < total_sectors:
-                    value = health_data[sector_index]
-                    color = (
-                        "green" if value == "Healthy" else
-                        "red" if value == "Unhealthy" else
-                        "orange" if value == "Warning" else
-                        "gray"
-                    )
-                    cell = QLabel()
-                    cell.setFixedSize(30, 30)  # Smaller cells for sector representation
-                    cell.setStyleSheet(f"background-color: {color}; border: 1px solid black;")
-                    grid.addWidget(cell, row, col)
-
-        layout.addLayout(grid)
+        # One cell per drive with its overall health status
+        self.health_status_row = QHBoxLayout()
+        self.health_status_row.setSpacing(5)
+        self.health_status_row.addStretch()
+        layout.addLayout(self.health_status_row)
+
+        # Surface scan map of the drive being scanned
+        self.surface_label = QLabel("Run a surface scan to map the drive's sectors")
+        layout.addWidget(self.surface_label)
+        self.health_grid = QGridLayout()
+        self.health_grid.setSpacing(5)
+
+        layout.addLayout(self.health_grid)
         frame.setLayout(layout)
         return frame
 
@@ -213,15 +338,25 @@ class DriveManDashboard(QMainWindow):
 
         benchmark_button = QPushButton("Run Benchmark")
         health_check_button = QPushButton("Check Health")
+        surface_scan_button = QPushButton("Surface Scan")
+        cancel_button = QPushButton("Cancel")
         export_button = QPushButton("Export Report")
 
         # You can add signals here for actions like clicking the buttons
         benchmark_button.clicked.connect(self.run_benchmark)
         health_check_button.clicked.connect(self.check_health)
+        surface_scan_button.clicked.connect(self.run_surface_scan)
+        cancel_button.clicked.connect(self.jobs.cancel_all)
         export_button.clicked.connect(self.export_report)
 
+        self.benchmark_button = benchmark_button
+        self.health_check_button = health_check_button
+        self.surface_scan_button = surface_scan_button
+
         layout.addWidget(benchmark_button)
         layout.addWidget(health_check_button)
+        layout.addWidget(surface_scan_button)
+        layout.addWidget(cancel_button)
         layout.addWidget(export_button)
 
         frame.setLayout(layout)
@@ -231,80 +366,259 @@ class DriveManDashboard(QMainWindow):
 
     def run_benchmark(self):
         """Action for running the benchmark."""
-        try:
-            drives = get_removable_and_external_drives_details() 
-            performance_results = run_performance_tests(drives) 
-
-            # Update the performance metrics table (assuming you have a method for this)
-            self.update_performance_metrics_table(performance_results) 
-
-            # Optionally, update the status bar with a success message
-            self.status_bar.showMessage("Benchmark completed successfully.", 5000) 
-
-        except Exception as e:
-            # Handle potential errors during benchmarking
-            self.status_bar.showMessage(f"Benchmark failed: {str(e)}", 5000)
-            print(f"Benchmark failed: {e}") 
-            # Log the error 
-            log_info(f"Benchmark failed: {e}")
-
-
-    def update_performance_metrics_table(self, performance_data):
+        if self.benchmark_job is not None:
+            return
+        self.performance_table.setRowCount(0)
+        self.create_throughput_chart().removeAllSeries()
+        self.benchmark_button.setEnabled(False)
+        self.benchmark_job = self.jobs.submit(
+            benchmark_drives,
+            on_progress=self.on_job_progress,
+            on_partial=self.on_benchmark_result,
+            on_finished=self.on_benchmark_finished,
+            on_failed=self.on_benchmark_failed,
+            on_cancelled=self.on_benchmark_cancelled
+        )
+
+    def on_job_progress(self, fraction, message):
+        self.status_bar.showMessage(f"{message} ({fraction:.0%})")
+
+    def on_benchmark_result(self, drive_letter, result):
+        """Adds one drive's results to the table as soon as they arrive."""
+        self.benchmark_results[drive_letter] = result
+        self.update_performance_metrics_table({drive_letter: result}, append=True)
+        series = result.get("sequential", {}).get("write", {}).get("throughput_series")
+        if series:
+            self.plot_throughput_series(drive_letter, series)
+
+    def plot_throughput_series(self, drive_letter, series):
+        """Adds one drive's sampled write throughput curve to the chart."""
+        from PyQt5.QtChart import QLineSeries
+
+        self.create_throughput_chart()
+        line = QLineSeries()
+        line.setName(drive_letter)
+        for position_mb, mb_s in zip(series["position_mb"], series["mb_s"]):
+            line.append(position_mb, mb_s)
+        self.throughput_chart.addSeries(line)
+        self.throughput_chart.createDefaultAxes()
+
+    def on_benchmark_finished(self, performance_results):
+        self.benchmark_job = None
+        self.benchmark_button.setEnabled(True)
+        self.status_bar.showMessage("Benchmark completed successfully.", 5000)
+
+    def on_benchmark_failed(self, error):
+        self.benchmark_job = None
+        self.benchmark_button.setEnabled(True)
+        # Handle potential errors during benchmarking
+        self.status_bar.showMessage(f"Benchmark failed: {error}", 5000)
+        log_info(f"Benchmark failed: {error}")
+
+    def on_benchmark_cancelled(self):
+        self.benchmark_job = None
+        self.benchmark_button.setEnabled(True)
+        self.status_bar.showMessage("Benchmark cancelled.", 5000)
+
+    def performance_rows(self, performance_data):
+        """Flatten per-drive results into (metric, read, write) table rows."""
+        for drive_letter, result in performance_data.items():
+            if "error" in result:
+                yield (f"{drive_letter} error", result["error"], "")
+                continue
+            sequential = result.get("sequential", {})
+            read, write = sequential.get("read", {}), sequential.get("write", {})
+            yield (f"{drive_letter} seq MB/s ({write.get('io_mode', 'N/A')})",
+                   read.get("speed_mb_s", read.get("error", "N/A")), write.get("speed_mb_s", write.get("error", "N/A")))
+            previous = result.get("previous")
+            if previous:
+                previous_sequential = previous["result"].get("sequential", {})
+                ran_at = datetime.fromtimestamp(previous["timestamp"]).strftime("%Y-%m-%d")
+                yield (f"{drive_letter} seq MB/s (previous run, {ran_at})",
+                       previous_sequential.get("read", {}).get("speed_mb_s", "N/A"),
+                       previous_sequential.get("write", {}).get("speed_mb_s", "N/A"))
+            cliff = write.get("cache_cliff")
+            if cliff:
+                yield (f"{drive_letter} cache cliff @ {cliff['position_mb']:.0f} MB", cliff["before_mb_s"], cliff["after_mb_s"])
+            random_io = result.get("random", {})
+            for qd in (1, 32):
+                reads = random_io.get(f"random_read_qd{qd}", {})
+                writes = random_io.get(f"random_write_qd{qd}", {})
+                if reads or writes:
+                    yield (f"{drive_letter} 4K IOPS QD{qd}", reads.get("iops", "N/A"), writes.get("iops", "N/A"))
+            benchmark = result.get("benchmark") or {}
+            yield (f"{drive_letter} counters MB/s", benchmark.get("read_speed", "N/A"), benchmark.get("write_speed", "N/A"))
+
+    def update_performance_metrics_table(self, performance_data, append=False):
         """Updates the performance metrics table with the given data."""
-        table = self.findChild(QTableWidget)  # Assuming the table has a name or you can find it by hierarchy
-        if table is not None:
+        table = self.performance_table
+        if not append:
             # Clear existing data
             table.setRowCount(0)
 
-            # Update table content with new data
-            for row, data in enumerate(performance_data):
-                # Unpack the data safely, with default values if missing
-                metric = data[0] if len(data) > 0 else "Unknown"
-                read = data[1] if len(data) > 1 else "N/A"
-                write = data[2] if len(data) > 2 else "N/A"
-
-                read_item = QTableWidgetItem(str(read))
-                write_item = QTableWidgetItem(str(write))
+        # Update table content with new data
+        for metric, read, write in self.performance_rows(performance_data):
+            row = table.rowCount()
+            read_item = QTableWidgetItem(f"{read:.1f}" if isinstance(read, float) else str(read))
+            write_item = QTableWidgetItem(f"{write:.1f}" if isinstance(write, float) else str(write))
 
-                # Set background color based on performance thresholds (optional)
-                # ... (similar logic as in create_performance_metrics_table)
-
-                table.insertRow(row)
-                table.setItem(row, 0, QTableWidgetItem(metric))
-                table.setItem(row, 1, read_item)
-                table.setItem(row, 2, write_item)
-        else:
-            print("Error: Performance metrics table not found.")
+            table.insertRow(row)
+            table.setItem(row, 0, QTableWidgetItem(metric))
+            table.setItem(row, 1, read_item)
+            table.setItem(row, 2, write_item)
             
 
+    def update_io_rates(self):
+        """Shows each drive's disk throughput, IOPS, queue depth and busy time over the last second."""
+        lines = []
+        for drive_letter, rates in sorted(self.io_sampler.rates().items()):
+            if rates is None:
+                continue
+            busy = f", {rates['busy_percent']:.0f}% busy" if rates["busy_percent"] is not None else ""
+            lines.append(f"{drive_letter}  R {rates['read_mb_s']:.1f} MB/s  W {rates['write_mb_s']:.1f} MB/s  "
+                         f"{rates['read_iops'] + rates['write_iops']:.0f} IOPS  QD {rates['queue_depth']:.1f}{busy}")
+        self.io_rates_label.setText("\n".join(lines))
+
     def check_health(self):
         """Action for checking the health of drives."""
-        try:
-            drives = get_removable_and_external_drives_details()
-            health_results = {}
-
-            for drive in drives:
-                drive_letter = drive['drive_letter']
-                health_status = check_drive_health(drive_letter)
-                health_results[drive_letter] = health_status
-
-            # Update the health visualization in the UI
-            self.update_health_visualization(health_results) 
-
-            # Optionally, update the status bar with a success message
-            self.status_bar.showMessage("Health check completed successfully.", 5000) 
-
-        except Exception as e:
-            # Handle potential errors during health checks
-            self.status_bar.showMessage(f"Health check failed: {str(e)}", 5000)
-            print(f"Health check failed: {e}") 
-            # Log the error 
-            log_info(f"Health check failed: {e}") 
+        if self.health_job is not None:
+            return
+        self.health_results = {}
+        self.health_check_button.setEnabled(False)
+        self.health_job = self.jobs.submit(
+            check_health_of_drives,
+            on_progress=self.on_job_progress,
+            on_partial=self.on_health_result,
+            on_finished=self.on_health_finished,
+            on_failed=self.on_health_failed,
+            on_cancelled=self.on_health_finished
+        )
+
+    def on_health_result(self, drive_letter, health_status):
+        self.health_results[drive_letter] = health_status
+        self.update_health_visualization(self.health_results)
+
+    def on_monitor_sample(self, drive_letter, sample):
+        """Shows full checks from the background monitor in the health status row."""
+        from core.health_monitor import PROBE_HEALTH
+
+        if sample["probe"] == PROBE_HEALTH:
+            self.on_health_result(drive_letter, sample["data"])
+
+    def on_health_finished(self, health_results=None):
+        self.health_job = None
+        self.health_check_button.setEnabled(True)
+        self.status_bar.showMessage("Health check completed successfully." if health_results is not None
+                                    else "Health check cancelled.", 5000)
+
+    def on_health_failed(self, error):
+        self.health_job = None
+        self.health_check_button.setEnabled(True)
+        # Handle potential errors during health checks
+        self.status_bar.showMessage(f"Health check failed: {error}", 5000)
+        log_info(f"Health check failed: {error}")
 
     def update_health_visualization(self, health_results):
-        """Updates the health visualization grid with the given health data."""
-        # ... (Your existing grid population logic from create_health_visualization) ...
+        """Updates the per-drive health status cells with the given health data."""
+        # The trailing stretch stays; every cell before it is replaced
+        while self.health_status_row.count() > 1:
+            widget = self.health_status_row.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+
+        for index, (drive_letter, health_status) in enumerate(health_results.items()):
+            value = health_status.get("status")
+            color = (
+                "green" if value == "Healthy" else
+                "red" if value in ("Unhealthy", "Error") else
+                "orange" if value == "Warning" else
+                "gray"
+            )
+            cell = QLabel()
+            cell.setFixedSize(30, 30)
+            cell.setToolTip(f"{drive_letter}: {value}")
+            cell.setStyleSheet(f"background-color: {color}; border: 1px solid black;")
+            self.health_status_row.insertWidget(index, cell)
+
+    def run_surface_scan(self):
+        """Action for scanning the surface of every drive; the grid follows the drive being scanned."""
+        if self.surface_job is not None:
+            return
+        self.surface_scan_button.setEnabled(False)
+        self.surface_job = self.jobs.submit(
+            surface_scan_drives,
+            on_progress=self.on_job_progress,
+            on_partial=self.update_surface_map,
+            on_finished=self.on_surface_scan_finished,
+            on_failed=self.on_surface_scan_failed,
+            on_cancelled=self.on_surface_scan_finished
+        )
+
+    def update_surface_map(self, drive_letter, cells):
+        """Redraws the grid from a downsampled surface map (a list of region cells)."""
+        from core.surface_scan import REGION_BAD, REGION_GOOD, REGION_SLOW
+
+        surface_colors = {REGION_GOOD: "green", REGION_SLOW: "orange", REGION_BAD: "red"}
+        if self.health_grid.count() != len(cells):
+            while self.health_grid.count():
+                widget = self.health_grid.takeAt(0).widget()
+                if widget is not None:
+                    widget.deleteLater()
+            cols = 10  # Fixed number of columns (can be adjusted)
+            for index in range(len(cells)):
+                cell = QLabel()
+                cell.setFixedSize(15, 15)
+                self.health_grid.addWidget(cell, index // cols, index % cols)
+
+        self.surface_label.setText(f"Surface scan: {drive_letter}")
+        for index, region in enumerate(cells):
+            cell = self.health_grid.itemAt(index).widget()
+            color = surface_colors.get(region["status"], "gray")
+            latency = region["latency_ms"]
+            cell.setToolTip(f"{region['status']}: " +
+                            (f"{latency:.1f} ms worst read" if latency is not None else "not scanned") +
+                            (f", {region['errors']} read errors" if region["errors"] else ""))
+            cell.setStyleSheet(f"background-color: {color}; border: 1px solid black;")
+
+    def on_surface_scan_finished(self, surface_results=None):
+        self.surface_results.update(surface_results or {})
+        self.surface_job = None
+        self.surface_scan_button.setEnabled(True)
+        self.status_bar.showMessage("Surface scan completed." if surface_results is not None
+                                    else "Surface scan cancelled; it resumes where it stopped.", 5000)
+
+    def on_surface_scan_failed(self, error):
+        self.surface_job = None
+        self.surface_scan_button.setEnabled(True)
+        self.status_bar.showMessage(f"Surface scan failed: {error}", 5000)
+        log_info(f"Surface scan failed: {error}")
+
+    def closeEvent(self, event):
+        self.jobs.shutdown()
+        drive_registry.stop_watching()
+        if self.health_monitor is not None:
+            self.health_monitor.stop()
+        if self.io_timer is not None:
+            self.io_timer.stop()
+            self.io_sampler.stop()
+        close_session_report()
+        super().closeEvent(event)
 
     def export_report(self):
         """Action for exporting the report."""
-        print("Exporting Report...")
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Report", f"driveman_report_{datetime.now():%Y%m%d_%H%M%S}.jsonl",
+            "JSON Lines (*.jsonl);;Compressed JSON Lines (*.jsonl.gz)")
+        if not path:
+            return
+        results_by_type = {
+            RECORD_HEALTH: dict(self.health_results),
+            RECORD_BENCHMARK: dict(self.benchmark_results),
+            RECORD_SURFACE_SCAN: dict(self.surface_results),
+        }
+        self.status_bar.showMessage("Exporting report...")
+        self.jobs.submit(
+            export_results, path, list(self.drives), results_by_type,
+            on_finished=lambda path: self.status_bar.showMessage(f"Report exported to {path}", 5000),
+            on_failed=lambda error: self.status_bar.showMessage(f"Export failed: {error}", 5000)
+        )
@@ -0,0 +1,68 @@
+# ui/startup_budget.py
+
+import re
+import subprocess
+import sys
+
+# Window visible within this long of process start on the portable USB deployment
+STARTUP_BUDGET_MS = 500
+ENTRY_MODULE = "ui.dashboard"
+
+# Imported on first use only; any of these at startup delays the first paint
+DEFERRED_MODULES = (
+    "PyQt5.QtChart",
+    "core.drive_check",
+    "core.performance",
+    "core.scheduler",
+    "core.health",
+    "core.health_monitor",
+    "core.history_store",
+    "core.surface_scan",
+    "core.io_engine",
+    "sqlite3",
+    "psutil",
+    "wmi",
+    "pythoncom",
+    "win32api",
+)
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+def measure_imports(module=ENTRY_MODULE):
+    """Import module in a fresh interpreter under -X importtime.
+
+    Returns {name: (self_us, cumulative_us)} for every module it imported,
+    including Python's own startup modules.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr.strip()}")
+    timings = {}
+    for line in process.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            timings[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return timings
+
+
+def check_startup(module=ENTRY_MODULE, budget_ms=STARTUP_BUDGET_MS, timings=None):
+    """Return (import_ms, deferred modules imported anyway, within budget) for module's import."""
+    timings = timings or measure_imports(module)
+    import_ms = timings[module][1] / 1000
+    early = [name for name in DEFERRED_MODULES if name in timings]
+    return import_ms, early, import_ms <= budget_ms and not early
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else ENTRY_MODULE
+    timings = measure_imports(module)
+    print(f"Slowest imports under {module} (cumulative ms):")
+    for name, (_, cumulative) in sorted(timings.items(), key=lambda item: -item[1][1])[:15]:
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+    import_ms, early, ok = check_startup(module, timings=timings)
+    print(f"{module} imports in {import_ms:.0f} ms (budget {STARTUP_BUDGET_MS} ms)")
+    for name in early:
+        print(f"  imported at startup but should be deferred: {name}")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,88 @@
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from core.cancellation import OperationCancelled
+from utils.logger import log_info
+
+
+class JobSignals(QObject):
+    """Signals a Job emits; they are delivered on the GUI thread."""
+    progress = pyqtSignal(float, str)        # fraction complete, message
+    partial = pyqtSignal(str, object)        # key (usually a drive letter), partial result
+    finished = pyqtSignal(object)            # final result
+    failed = pyqtSignal(str)                 # error message
+    cancelled = pyqtSignal()
+
+
+class Job(QRunnable):
+    """Runs fn(*args, progress_callback=, result_callback=, cancel_event=, **kwargs) on the pool."""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self.cancel_event = threading.Event()
+        self.setAutoDelete(False)  # the runner keeps a reference until the job ends
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = self.fn(
+                *self.args,
+                progress_callback=self.signals.progress.emit,
+                result_callback=self.signals.partial.emit,
+                cancel_event=self.cancel_event,
+                **self.kwargs
+            )
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            log_info(f"Job {getattr(self.fn, '__name__', self.fn)} failed: {traceback.format_exc()}")
+            self.signals.failed.emit(str(e))
+        else:
+            if self.cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
+
+class JobRunner(QObject):
+    """Submits blocking core calls to a QThreadPool and tracks them for cancellation."""
+
+    def __init__(self, max_threads=None, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        self._jobs = set()
+
+    def submit(self, fn, *args, on_finished=None, on_progress=None, on_partial=None,
+               on_failed=None, on_cancelled=None, **kwargs):
+        """Run fn on the pool and connect the given slots; returns the Job."""
+        job = Job(fn, *args, **kwargs)
+        for signal, slot in ((job.signals.finished, on_finished), (job.signals.progress, on_progress),
+                             (job.signals.partial, on_partial), (job.signals.failed, on_failed),
+                             (job.signals.cancelled, on_cancelled)):
+            if slot is not None:
+                signal.connect(slot)
+        for signal in (job.signals.finished, job.signals.failed, job.signals.cancelled):
+            signal.connect(lambda *_, job=job: self._jobs.discard(job))
+        self._jobs.add(job)
+        self.pool.start(job)
+        return job
+
+    def cancel_all(self):
+        for job in list(self._jobs):
+            job.cancel()
+
+    def shutdown(self, timeout_ms=5000):
+        """Cancel running jobs and wait for the pool to drain."""
+        self.cancel_all()
+        self.pool.clear()
+        self.pool.waitForDone(timeout_ms)